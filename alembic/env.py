@@ -5,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 from app.models.user_model import Base  # adjust "myapp.models" to the actual location of your Base
+from app.models import avatar_blob_model, broadcast_job_model, email_outbox_model, login_event_model, nickname_pool_model, storage_gc_model  # noqa: F401  register the tables on Base.metadata
 
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,57 @@
+"""add login events
+
+Revision ID: 8b2e4d6f1a90
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-19 11:02:47.209315
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d6f1a90'
+down_revision: Union[str, None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monthly partitions created up front; later months are created at runtime
+# by the login event partition task.
+PARTITION_MONTHS_AHEAD = 2
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.create_table('login_events',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('success', sa.Boolean(), nullable=False),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('user_agent', sa.String(length=512), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'occurred_at'),
+    postgresql_partition_by='RANGE (occurred_at)'
+    )
+    op.create_index('ix_login_events_user_id_occurred_at', 'login_events', ['user_id', 'occurred_at'], unique=False)
+    op.execute("CREATE TABLE IF NOT EXISTS login_events_default PARTITION OF login_events DEFAULT")
+    current_month = datetime.now(timezone.utc).date().replace(day=1)
+    for offset in range(PARTITION_MONTHS_AHEAD + 1):
+        start = _add_months(current_month, offset)
+        end = _add_months(current_month, offset + 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS login_events_{start:%Y_%m} PARTITION OF login_events "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00+00') TO ('{end.isoformat()} 00:00+00')"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_login_events_user_id_occurred_at', table_name='login_events')
+    op.drop_table('login_events')
@@ -0,0 +1,35 @@
+"""add avatar blobs
+
+Revision ID: a7d3c9e5f182
+Revises: f2b8d4a6c913
+Create Date: 2026-10-19 19:41:26.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3c9e5f182'
+down_revision: Union[str, None] = 'f2b8d4a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('avatar_blobs',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('size', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('released_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    op.create_index('ix_avatar_blobs_unreferenced', 'avatar_blobs', ['released_at'], unique=False, postgresql_where=sa.text('refcount = 0'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_avatar_blobs_unreferenced', table_name='avatar_blobs', postgresql_where=sa.text('refcount = 0'))
+    op.drop_table('avatar_blobs')
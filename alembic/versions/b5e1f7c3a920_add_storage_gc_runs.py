@@ -0,0 +1,45 @@
+"""add storage gc runs
+
+Revision ID: b5e1f7c3a920
+Revises: a7d3c9e5f182
+Create Date: 2026-10-19 21:12:48.305716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1f7c3a920'
+down_revision: Union[str, None] = 'a7d3c9e5f182'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('storage_gc_runs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('dry_run', sa.Boolean(), nullable=False),
+    sa.Column('rate_per_second', sa.Float(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'CANCELLED', 'FAILED', name='StorageGCStatus', create_constraint=True), nullable=False),
+    sa.Column('scanned_count', sa.Integer(), nullable=False),
+    sa.Column('orphan_count', sa.Integer(), nullable=False),
+    sa.Column('orphan_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_count', sa.Integer(), nullable=False),
+    sa.Column('failed_count', sa.Integer(), nullable=False),
+    sa.Column('last_key', sa.String(length=1024), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('storage_gc_runs')
+    sa.Enum(name='StorageGCStatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,29 @@
+"""add broadcast job retries
+
+Revision ID: d8c4f2a6b193
+Revises: b5e1f7c3a920
+Create Date: 2026-10-19 18:41:26.905117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8c4f2a6b193'
+down_revision: Union[str, None] = 'b5e1f7c3a920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('broadcast_jobs', sa.Column('sent_ahead_user_ids', postgresql.ARRAY(sa.UUID()), nullable=True))
+    op.add_column('broadcast_jobs', sa.Column('failed_attempts', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('broadcast_jobs', 'failed_attempts')
+    op.drop_column('broadcast_jobs', 'sent_ahead_user_ids')
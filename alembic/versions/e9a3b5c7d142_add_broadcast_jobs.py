@@ -0,0 +1,46 @@
+"""add broadcast jobs
+
+Revision ID: e9a3b5c7d142
+Revises: c4d7e1a95b38
+Create Date: 2026-10-19 16:05:31.447920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a3b5c7d142'
+down_revision: Union[str, None] = 'c4d7e1a95b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('broadcast_jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('segment', sa.Enum('UNVERIFIED', 'LOCKED', 'AUTHENTICATED', name='BroadcastSegment', create_constraint=True), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('rate_per_second', sa.Float(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'CANCELLED', 'FAILED', name='BroadcastStatus', create_constraint=True), nullable=False),
+    sa.Column('total_recipients', sa.Integer(), nullable=False),
+    sa.Column('sent_count', sa.Integer(), nullable=False),
+    sa.Column('failed_count', sa.Integer(), nullable=False),
+    sa.Column('last_user_id', sa.UUID(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('broadcast_jobs')
+    sa.Enum(name='BroadcastStatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='BroadcastSegment').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,112 @@
+"""
+Application-scoped service container.
+
+One ``Container`` per process owns the objects that are expensive to build
+or hold shared state: settings, the template manager and its compiled
+templates, the pooled SMTP transport, the email service, the storage backend
+and its thread pool, and the database engine. The FastAPI lifespan creates it,
+warms everything once with ``start()``, and closes it on shutdown; request
+handlers reach it through ``Depends`` and background workers through
+``get_container()``.
+
+Tests can swap any singleton with ``override()`` or replace the whole
+container through ``app.dependency_overrides[get_container]``.
+"""
+import asyncio
+import logging
+from builtins import len, object
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Iterator, Optional
+from settings.config import Settings, settings
+from app.database import Database
+from app.storage import StorageBackend, get_storage
+from app.services.email_service import EmailService
+from app.utils import image_processing, minio_client
+from app.utils.nickname_gen import ADJECTIVES, ANIMALS, load_word_list
+from app.utils.smtp_connection import SMTPClient
+from app.utils.template_manager import TemplateManager
+
+logger = logging.getLogger(__name__)
+_MISSING = object()
+
+
+class Container:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+    @cached_property
+    def template_manager(self) -> TemplateManager:
+        return TemplateManager()
+
+    @cached_property
+    def smtp_client(self) -> SMTPClient:
+        return SMTPClient.from_settings(self.settings)
+
+    @cached_property
+    def email_service(self) -> EmailService:
+        return EmailService(self.template_manager, self.smtp_client)
+
+    @cached_property
+    def storage(self) -> StorageBackend:
+        return get_storage()
+
+    def start(self):
+        """Create every singleton and fill its caches before the first request."""
+        Database.initialize(
+            self.settings.database_url,
+            self.settings.debug,
+            query_cache_size=self.settings.db_query_cache_size,
+            prepared_statement_cache_size=self.settings.db_prepared_statement_cache_size,
+            pgbouncer_transaction_mode=self.settings.db_pgbouncer_transaction_mode,
+        )
+        templates = self.template_manager.warm()
+        load_word_list(self.settings.nickname_adjectives_file, ADJECTIVES)
+        load_word_list(self.settings.nickname_animals_file, ANIMALS)
+        self.email_service
+        self.storage
+        logger.info(f"Service container started; compiled {len(templates)} email templates.")
+
+    async def close(self):
+        """Release pooled SMTP sessions, storage threads, image workers and database connections."""
+        # QUIT blocks on each pooled session, so it is sent from a worker thread.
+        await asyncio.to_thread(self.smtp_client.close)
+        minio_client.shutdown_executor()
+        image_processing.shutdown_executor()
+        await Database.dispose()
+
+    @contextmanager
+    def override(self, **singletons) -> Iterator["Container"]:
+        """Temporarily replace singletons, e.g. ``container.override(email_service=mock)`` in a test."""
+        previous = {name: self.__dict__.get(name, _MISSING) for name in singletons}
+        self.__dict__.update(singletons)
+        try:
+            yield self
+        finally:
+            for name, value in previous.items():
+                if value is _MISSING:
+                    self.__dict__.pop(name, None)
+                else:
+                    self.__dict__[name] = value
+
+
+_container: Optional[Container] = None
+
+
+def set_container(container: Optional[Container]):
+    """Install the process-wide container; the lifespan does this at startup."""
+    global _container
+    _container = container
+
+
+def get_container() -> Container:
+    """
+    Return the process-wide container.
+
+    Outside a running application (scripts, tests that skip the lifespan) a
+    container is created on first use from the loaded settings.
+    """
+    global _container
+    if _container is None:
+        _container = Container(settings)
+    return _container
@@ -1,3 +1,5 @@
+from uuid import uuid4
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -9,10 +11,38 @@ class Database:
     _session_factory = None
 
     @classmethod
-    def initialize(cls, database_url: str, echo: bool = False):
-        """Initialize the async engine and sessionmaker."""
+    def initialize(
+        cls,
+        database_url: str,
+        echo: bool = False,
+        query_cache_size: int = 500,
+        prepared_statement_cache_size: int = 100,
+        pgbouncer_transaction_mode: bool = False,
+    ):
+        """Initialize the async engine and sessionmaker.
+
+        ``query_cache_size`` sizes SQLAlchemy's compiled-statement cache and
+        ``prepared_statement_cache_size`` the per-connection cache of asyncpg
+        prepared statements. Behind pgbouncer in transaction mode a client may
+        land on a different server connection for every transaction, so named
+        statements must be unique per client: pgbouncer (1.21+, with
+        ``max_prepared_statements`` set) then re-prepares them transparently
+        and the client-side cache stays effective.
+        """
         if cls._engine is None:  # Ensure engine is created once
-            cls._engine = create_async_engine(database_url, echo=echo, future=True)
+            connect_args = {}
+            if make_url(database_url).get_driver_name() == "asyncpg":
+                connect_args["prepared_statement_cache_size"] = prepared_statement_cache_size
+            if connect_args and pgbouncer_transaction_mode:
+                connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+                connect_args["statement_cache_size"] = 0
+            cls._engine = create_async_engine(
+                database_url,
+                echo=echo,
+                future=True,
+                query_cache_size=query_cache_size,
+                connect_args=connect_args,
+            )
             cls._session_factory = sessionmaker(
                 bind=cls._engine, class_=AsyncSession, expire_on_commit=False, future=True
             )
@@ -23,3 +53,18 @@ class Database:
         if cls._session_factory is None:
             raise ValueError("Database not initialized. Call `initialize()` first.")
         return cls._session_factory
+
+    @classmethod
+    def get_engine(cls):
+        """Returns the engine, ensuring it's initialized."""
+        if cls._engine is None:
+            raise ValueError("Database not initialized. Call `initialize()` first.")
+        return cls._engine
+
+    @classmethod
+    async def dispose(cls):
+        """Close the engine's pooled connections and forget it, so `initialize()` can run again."""
+        if cls._engine is not None:
+            await cls._engine.dispose()
+        cls._engine = None
+        cls._session_factory = None
@@ -2,20 +2,20 @@ from builtins import Exception, dict, str
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.container import Container, get_container
 from app.database import Database
-from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
 from app.services.jwt_service import decode_token
-from settings.config import Settings
+from settings.config import Settings, settings
 from fastapi import Depends
 
 def get_settings() -> Settings:
-    """Return application settings."""
-    return Settings()
+    """Return the application settings, parsed once when the process starts."""
+    return settings
 
-def get_email_service() -> EmailService:
-    template_manager = TemplateManager()
-    return EmailService(template_manager=template_manager)
+def get_email_service(container: Container = Depends(get_container)) -> EmailService:
+    """Return the container's shared email service."""
+    return container.email_service
 
 async def get_db() -> AsyncSession:
     """Dependency that provides a database session for each request."""
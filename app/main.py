@@ -1,13 +1,61 @@
 from builtins import Exception
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware  # Import the CORSMiddleware
-from app.database import Database
+from app.container import Container, set_container
 from app.dependencies import get_settings
-from app.utils.minio_client import upload_default_image_if_missing
-from app.routers import user_routes
+from app.utils.minio_client import load_default_image, upload_default_image_if_missing
+from app.routers import admin_routes, user_routes
+from app.services.broadcast_service import broadcast_runner
+from app.services.storage_gc_service import storage_gc_runner
+from app.services.email_outbox_service import email_outbox_monitor, email_outbox_workers
+from app.services.last_login_buffer import last_login_flusher
+from app.services.login_event_service import login_event_flusher, login_event_partitioner
+from app.services.nickname_pool_service import nickname_pool_refiller
 from app.utils.api_description import getDescription
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    container = Container(settings)
+    container.start()
+    set_container(container)
+    app.state.container = container
+    upload_default_image_if_missing()
+    load_default_image()
+    if settings.nickname_pool_enabled:
+        nickname_pool_refiller.start()
+    if settings.last_login_buffered:
+        last_login_flusher.start()
+    if settings.login_events_enabled:
+        login_event_partitioner.start()
+        login_event_flusher.start()
+    if settings.email_outbox_enabled:
+        email_outbox_monitor.start()
+        for worker in email_outbox_workers:
+            worker.start()
+    if settings.broadcast_enabled:
+        broadcast_runner.start()
+    if settings.storage_gc_enabled:
+        storage_gc_runner.start()
+    yield
+    await nickname_pool_refiller.stop()
+    await last_login_flusher.stop()
+    await login_event_partitioner.stop()
+    await login_event_flusher.stop()
+    await email_outbox_monitor.stop()
+    for worker in email_outbox_workers:
+        await worker.stop()
+    await broadcast_runner.stop()
+    await storage_gc_runner.stop()
+    await container.close()
+    set_container(None)
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="User Management",
     description=getDescription(),
     version="0.0.1",
@@ -29,17 +77,12 @@ app.add_middleware(
     allow_headers=["*"],  # Allowed HTTP headers
 )
 
-@app.on_event("startup")
-async def startup_event():
-    settings = get_settings()
-    Database.initialize(settings.database_url, settings.debug)
-    upload_default_image_if_missing()
-
 @app.exception_handler(Exception)
 async def exception_handler(request, exc):
     return JSONResponse(status_code=500, content={"message": "An unexpected error occurred."})
 
 app.include_router(user_routes.router)
+app.include_router(admin_routes.router)
 
 
 
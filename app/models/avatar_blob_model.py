@@ -0,0 +1,37 @@
+from builtins import int, str
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, Index, func, text
+from sqlalchemy.orm import Mapped
+from app.database import Base
+
+class AvatarBlob(Base):
+    """
+    A processed profile picture stored once per distinct upload, in the 'avatar_blobs' table.
+
+    The picture and its renditions are stored under names derived from the
+    SHA-256 of the uploaded file (see ``avatar_blob_name``), so every user who
+    uploads the same file points at the same objects. ``refcount`` counts those
+    users; a blob whose count drops to zero is left for garbage collection.
+
+    Attributes:
+        digest (str): Hex SHA-256 of the uploaded file.
+        refcount (int): Users whose profile picture is this blob.
+        size (int): Bytes stored for the picture and all its renditions.
+        created_at (datetime): When the blob was first stored.
+        released_at (datetime): When a user last stopped using the blob.
+    """
+    __tablename__ = "avatar_blobs"
+
+    digest: Mapped[str] = Column(String(64), primary_key=True)
+    refcount: Mapped[int] = Column(Integer, nullable=False, default=0, server_default="0")
+    size: Mapped[int] = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    released_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Garbage collection only ever looks for unreferenced blobs.
+        Index("ix_avatar_blobs_unreferenced", "released_at", postgresql_where=text("refcount = 0")),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AvatarBlob {self.digest[:12]}, refs: {self.refcount}>"
@@ -0,0 +1,77 @@
+from builtins import float, int, list, str
+from datetime import datetime
+from enum import Enum
+import uuid
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, func, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class BroadcastSegment(Enum):
+    """User segments an admin can email, stored as ENUM in the database."""
+    UNVERIFIED = "UNVERIFIED"
+    LOCKED = "LOCKED"
+    AUTHENTICATED = "AUTHENTICATED"
+
+class BroadcastStatus(Enum):
+    """Lifecycle of a broadcast job, stored as ENUM in the database."""
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    CANCELLED = "CANCELLED"
+    FAILED = "FAILED"
+
+class BroadcastJob(Base):
+    """
+    An email sent by an admin to every user in a segment, stored in the 'broadcast_jobs' table.
+
+    Recipients are streamed from the users table in id order; after each batch
+    the job records the last user id it reached, so a job interrupted by a
+    restart resumes from its checkpoint instead of starting over.
+
+    Attributes:
+        id (UUID): Unique identifier for the job.
+        segment (BroadcastSegment): Which users receive the email.
+        subject (str): Email subject line.
+        body (str): Markdown body with optional per-recipient placeholders.
+        rate_per_second (float): Send rate limit for this job; the configured default when null.
+        status (BroadcastStatus): Where the job is in its lifecycle.
+        total_recipients (int): Users in the segment when the job was created.
+        sent_count (int): Emails accepted by the SMTP server so far.
+        failed_count (int): Emails that could not be sent.
+        last_user_id (UUID): Checkpoint; the id of the last user processed.
+        sent_ahead_user_ids (list): Users past the checkpoint an interrupted batch already emailed; skipped on resume.
+        failed_attempts (int): Runs that stopped on an error; the job fails once it reaches broadcast_max_attempts.
+        lease_expires_at (datetime): Until when the worker running the job owns it.
+        last_error (str): Error from the most recent failed run, if any.
+        created_by (UUID): Admin who created the job.
+        created_at (datetime): When the job was created.
+        started_at (datetime): When a worker first picked the job up.
+        finished_at (datetime): When the job completed, failed or was cancelled.
+    """
+    __tablename__ = "broadcast_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    segment: Mapped[BroadcastSegment] = Column(SQLAlchemyEnum(BroadcastSegment, name='BroadcastSegment', create_constraint=True), nullable=False)
+    subject: Mapped[str] = Column(String(255), nullable=False)
+    body: Mapped[str] = Column(Text, nullable=False)
+    rate_per_second: Mapped[float] = Column(Float, nullable=True)
+    status: Mapped[BroadcastStatus] = Column(
+        SQLAlchemyEnum(BroadcastStatus, name='BroadcastStatus', create_constraint=True),
+        nullable=False, default=BroadcastStatus.PENDING,
+    )
+    total_recipients: Mapped[int] = Column(Integer, nullable=False, default=0)
+    sent_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    failed_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    last_user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=True)
+    sent_ahead_user_ids: Mapped[list] = Column(ARRAY(UUID(as_uuid=True)), nullable=True)
+    failed_attempts: Mapped[int] = Column(Integer, nullable=False, default=0, server_default="0")
+    lease_expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str] = Column(Text, nullable=True)
+    created_by: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<BroadcastJob {self.segment.name}, Status: {self.status.name}>"
@@ -0,0 +1,62 @@
+from builtins import int, str
+from datetime import datetime
+from enum import Enum
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, Index, Text, func, text, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class OutboxStatus(Enum):
+    """Delivery state of an outbox email, stored as ENUM in the database."""
+    PENDING = "PENDING"
+    SENT = "SENT"
+    DEAD = "DEAD"
+
+class EmailOutbox(Base):
+    """
+    An email waiting to be delivered, stored in the 'email_outbox' table.
+
+    Rows are written in the same transaction as the change that triggers the
+    email, so an email is queued if and only if that change commits. Delivery
+    workers claim due rows, render and send them, and either mark them sent,
+    reschedule them with exponential backoff, or dead-letter them after too
+    many attempts.
+
+    Attributes:
+        id (UUID): Unique identifier for the email.
+        email_type (str): Template to render, e.g. 'email_verification'.
+        recipient (str): Address the email is sent to.
+        context (dict): Values the template is rendered with.
+        status (OutboxStatus): Whether the email is pending, sent or dead-lettered.
+        attempts (int): Number of delivery attempts so far.
+        next_attempt_at (datetime): When the email is next due; also the claim lease expiry.
+        last_error (str): Error from the most recent failed attempt.
+        created_at (datetime): When the email was queued.
+        sent_at (datetime): When the email was delivered.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email_type: Mapped[str] = Column(String(50), nullable=False)
+    recipient: Mapped[str] = Column(String(255), nullable=False)
+    context: Mapped[dict] = Column(JSONB, nullable=False)
+    status: Mapped[OutboxStatus] = Column(
+        SQLAlchemyEnum(OutboxStatus, name='OutboxStatus', create_constraint=True),
+        nullable=False, default=OutboxStatus.PENDING,
+    )
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[str] = Column(Text, nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<EmailOutbox {self.email_type} to {self.recipient}, Status: {self.status.name}>"
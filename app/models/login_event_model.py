@@ -0,0 +1,50 @@
+from builtins import bool, str
+from datetime import datetime
+import uuid
+from sqlalchemy import Column, String, Boolean, DateTime, DDL, Index, event, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class LoginEvent(Base):
+    """
+    A login attempt recorded for the security audit trail, stored in the 'login_events' table.
+
+    The table is range-partitioned by month on ``occurred_at``; partitions are
+    created ahead of time by the Alembic migration and the background partition
+    task, and a default partition catches anything outside them.
+
+    Attributes:
+        id (UUID): Unique identifier for the event.
+        occurred_at (datetime): When the attempt happened; the partition key.
+        user_id (UUID): The user the attempt was for, if the email matched one.
+        email (str): The email the attempt was made with.
+        success (bool): Whether the attempt logged the user in.
+        ip_address (str): Client IP address of the attempt.
+        user_agent (str): Client User-Agent header of the attempt.
+    """
+    __tablename__ = "login_events"
+    __table_args__ = (
+        Index("ix_login_events_user_id_occurred_at", "user_id", "occurred_at"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    occurred_at: Mapped[datetime] = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=True)
+    email: Mapped[str] = Column(String(255), nullable=False)
+    success: Mapped[bool] = Column(Boolean, nullable=False)
+    ip_address: Mapped[str] = Column(String(45), nullable=True)
+    user_agent: Mapped[str] = Column(String(512), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<LoginEvent {self.email}, Success: {self.success}>"
+
+
+# A partitioned table rejects rows that match no partition; the default
+# partition keeps inserts working when the table is created from metadata.
+event.listen(
+    LoginEvent.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS login_events_default PARTITION OF login_events DEFAULT"),
+)
@@ -0,0 +1,24 @@
+from builtins import str
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.orm import Mapped
+from app.database import Base
+
+class NicknamePool(Base):
+    """
+    Pre-generated nicknames waiting to be handed out at signup, stored in the 'nickname_pool' table.
+
+    Rows are inserted by the background refill task only if the nickname is not
+    already used by a user, and are claimed (deleted) by ``UserService.create``.
+
+    Attributes:
+        nickname (str): A nickname not yet assigned to any user.
+        created_at (datetime): Timestamp when the nickname was added to the pool.
+    """
+    __tablename__ = "nickname_pool"
+
+    nickname: Mapped[str] = Column(String(50), primary_key=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<NicknamePool {self.nickname}>"
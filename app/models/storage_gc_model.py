@@ -0,0 +1,68 @@
+from builtins import bool, float, int, str
+from datetime import datetime
+from enum import Enum
+import uuid
+from sqlalchemy import BigInteger, Boolean, Column, String, Integer, Float, DateTime, Text, func, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class StorageGCStatus(Enum):
+    """Lifecycle of a storage garbage collection run, stored as ENUM in the database."""
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    CANCELLED = "CANCELLED"
+    FAILED = "FAILED"
+
+class StorageGCRun(Base):
+    """
+    A sweep of the storage bucket for objects no user refers to, stored in the 'storage_gc_runs' table.
+
+    Objects are listed in name order and checked against the database one
+    batch at a time; after each batch the run records the last name it
+    reached, so a run interrupted by a restart resumes from its checkpoint.
+    A dry run only counts what it would remove.
+
+    Attributes:
+        id (UUID): Unique identifier for the run.
+        dry_run (bool): Whether orphans are only counted rather than removed.
+        rate_per_second (float): Objects examined per second; the configured default when null.
+        status (StorageGCStatus): Where the run is in its lifecycle.
+        scanned_count (int): Objects listed so far.
+        orphan_count (int): Objects found to be orphaned.
+        orphan_bytes (int): Total size of the orphaned objects.
+        deleted_count (int): Orphans removed from storage.
+        failed_count (int): Orphans storage refused to remove.
+        last_key (str): Checkpoint; the name of the last object examined.
+        lease_expires_at (datetime): Until when the worker running the sweep owns it.
+        last_error (str): Error that failed the run, if any.
+        created_by (UUID): Admin who requested the run.
+        created_at (datetime): When the run was requested.
+        started_at (datetime): When a worker first picked the run up.
+        finished_at (datetime): When the run completed, failed or was cancelled.
+    """
+    __tablename__ = "storage_gc_runs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dry_run: Mapped[bool] = Column(Boolean, nullable=False, default=True)
+    rate_per_second: Mapped[float] = Column(Float, nullable=True)
+    status: Mapped[StorageGCStatus] = Column(
+        SQLAlchemyEnum(StorageGCStatus, name='StorageGCStatus', create_constraint=True),
+        nullable=False, default=StorageGCStatus.PENDING,
+    )
+    scanned_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    orphan_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    orphan_bytes: Mapped[int] = Column(BigInteger, nullable=False, default=0)
+    deleted_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    failed_count: Mapped[int] = Column(Integer, nullable=False, default=0)
+    last_key: Mapped[str] = Column(String(1024), nullable=True)
+    lease_expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str] = Column(Text, nullable=True)
+    created_by: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<StorageGCRun {'dry run' if self.dry_run else 'live'}, Status: {self.status.name}>"
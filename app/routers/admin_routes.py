@@ -0,0 +1,109 @@
+"""
+Administrative endpoints for operating the service: process metrics,
+broadcast emails, storage garbage collection and other maintenance views
+that are restricted to the ADMIN role.
+"""
+from builtins import ValueError, dict, str
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_db, get_settings, require_role
+from app.schemas.broadcast_schema import BroadcastCreate, BroadcastResponse
+from app.schemas.storage_gc_schema import StorageGCCreate, StorageGCResponse
+from app.services.broadcast_service import BroadcastService
+from app.services.storage_gc_service import StorageGCService
+from app.utils.metrics import Metrics
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("/metrics/", name="get_metrics", tags=["Administration Requires (Admin Role)"])
+async def get_metrics(current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Return this worker's counters and gauges, such as the nickname pool depth.
+    """
+    return Metrics.snapshot()
+
+
+@router.post("/broadcasts/", response_model=BroadcastResponse, status_code=status.HTTP_202_ACCEPTED, name="create_broadcast", tags=["Administration Requires (Admin Role)"])
+async def create_broadcast(broadcast: BroadcastCreate, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Queue an email to every user in a segment. Sending happens in the background; poll the status endpoint for progress.
+
+    - **segment**: UNVERIFIED, LOCKED or AUTHENTICATED users.
+    - **subject**: Email subject line.
+    - **body**: Markdown body; may use {name}, {first_name}, {last_name}, {nickname} and {email}.
+    - **rate_per_second**: Optional send rate limit overriding the configured default.
+    """
+    if not settings.broadcast_enabled:
+        # No worker would ever pick the job up.
+        raise HTTPException(status_code=503, detail="Broadcasts are disabled")
+    try:
+        job = await BroadcastService.create_job(
+            db, broadcast.segment, broadcast.subject, broadcast.body,
+            created_by=UUID(current_user["user_id"]), rate_per_second=broadcast.rate_per_second,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BroadcastResponse.model_validate(job)
+
+
+@router.get("/broadcasts/{job_id}", response_model=BroadcastResponse, name="get_broadcast", tags=["Administration Requires (Admin Role)"])
+async def get_broadcast(job_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Return a broadcast's status and progress: sent and failed counts out of the segment size, and its checkpoint.
+    """
+    job = await BroadcastService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return BroadcastResponse.model_validate(job)
+
+
+@router.post("/broadcasts/{job_id}/cancel", response_model=BroadcastResponse, name="cancel_broadcast", tags=["Administration Requires (Admin Role)"])
+async def cancel_broadcast(job_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Stop a pending or running broadcast. A running job stops after the batch it is sending.
+    """
+    job = await BroadcastService.cancel_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return BroadcastResponse.model_validate(job)
+
+
+@router.post("/storage-gc/", response_model=StorageGCResponse, status_code=status.HTTP_202_ACCEPTED, name="create_storage_gc", tags=["Administration Requires (Admin Role)"])
+async def create_storage_gc(run: StorageGCCreate, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Queue a sweep of the storage bucket for objects no user refers to. It runs in the background; poll the status endpoint for progress.
+
+    - **dry_run**: Only count orphans and their size (the default); set to false to remove them.
+    - **rate_per_second**: Optional limit on objects examined per second, overriding the configured default.
+    """
+    if not settings.storage_gc_enabled:
+        raise HTTPException(status_code=503, detail="Storage garbage collection is disabled")
+    run = await StorageGCService.create_run(
+        db, dry_run=run.dry_run, created_by=UUID(current_user["user_id"]), rate_per_second=run.rate_per_second,
+    )
+    return StorageGCResponse.model_validate(run)
+
+
+@router.get("/storage-gc/{run_id}", response_model=StorageGCResponse, name="get_storage_gc", tags=["Administration Requires (Admin Role)"])
+async def get_storage_gc(run_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Return a sweep's status and progress: objects scanned, orphans found and removed, and its checkpoint.
+    """
+    run = await StorageGCService.get_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Storage GC run not found")
+    return StorageGCResponse.model_validate(run)
+
+
+@router.post("/storage-gc/{run_id}/cancel", response_model=StorageGCResponse, name="cancel_storage_gc", tags=["Administration Requires (Admin Role)"])
+async def cancel_storage_gc(run_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Stop a pending or running sweep. A running sweep stops after the batch it is examining.
+    """
+    run = await StorageGCService.cancel_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Storage GC run not found")
+    return StorageGCResponse.model_validate(run)
@@ -17,31 +17,50 @@ Key Highlights:
 - Implements HATEOAS by generating dynamic links for user-related actions, enhancing API discoverability.
 - Utilizes OAuth2PasswordBearer for securing API endpoints, requiring valid access tokens for operations.
 """
-import io
-from builtins import dict, int, len, str
+from builtins import dict, int, len, str, zip
+import asyncio
 from datetime import timedelta
+from functools import partial
+from typing import Dict, List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Response, status, Request, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Request, Form
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from PIL import Image
 from app.models.user_model import User
 from app.dependencies import get_current_user, get_db, get_email_service, require_role
+from app.schemas.login_event_schema import LoginEventListResponse, LoginEventResponse
 from app.schemas.pagination_schema import EnhancedPagination
 from app.schemas.token_schema import TokenResponse
 from app.schemas.user_schemas import LoginRequest, UserBase, UserCreate, UserListResponse, UserResponse, UserUpdate
+from app.services.login_event_service import LoginEventService
 from app.services.user_service import UserService
 from app.services.jwt_service import create_access_token
+from app.utils.image_processing import InvalidImageError, render_profile_picture
 from app.utils.link_generation import create_user_links, generate_pagination_links
-from app.utils.minio_client import get_image
+from app.utils.uploads import InvalidUploadError, UploadTooLargeError, check_content_length, receive_file
+from app.utils.validators import get_email_validator
+from app.storage import InvalidRangeError, ObjectNotFoundError, get_storage
+from app.utils.minio_client import (
+    DEFAULT_IMAGE_NAME, cached_image, content_version, etag_matches,
+    is_default_image, open_cacheable_image, open_image, presigned_urls, rendition_name, single_byte_range, stat_image,
+)
 from app.dependencies import get_settings
 from app.services.email_service import EmailService
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 settings = get_settings()
 MAX_FILE_SIZE_MB = 2
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
 MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
+
+
+async def check_email_address(email: str):
+    """Reject an address the validator configured by ``email_validation_mode`` does not accept."""
+    check = await get_email_validator().validate_async(email)
+    if not check.valid:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Invalid email address: {check.error}")
 @router.get("/users/{user_id}", response_model=UserResponse, name="get_user", tags=["User Management Requires (Admin or Manager Roles)"])
 async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
@@ -147,6 +166,7 @@ async def create_user(user: UserCreate, request: Request, db: AsyncSession = Dep
     Returns:
     - UserResponse: The newly created user's information along with navigation links.
     """
+    await check_email_address(user.email)
     existing_user = await UserService.get_by_email(db, user.email)
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
@@ -177,6 +197,8 @@ async def list_users(
     request: Request,
     skip: int = 0,
     limit: int = 10,
+    include_avatar_urls: bool = Query(False, description="Embed a short-lived presigned URL for each user's profile picture"),
+    avatar_size: Optional[int] = Query(None, gt=0, description="Display size in pixels the embedded URLs are chosen for"),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))
 ):
@@ -186,6 +208,16 @@ async def list_users(
     user_responses = [
         UserResponse.model_validate(user) for user in users
     ]
+    if include_avatar_urls and get_storage().can_presign:
+        format = _rendition_format(None, request.headers.get("accept"))
+        found = await asyncio.gather(*(
+            presigned_urls.first_existing(
+                _rendition_names(user_response.profile_picture_url or DEFAULT_IMAGE_NAME, avatar_size, format) + [DEFAULT_IMAGE_NAME]
+            )
+            for user_response in user_responses
+        ))
+        for user_response, presigned in zip(user_responses, found):
+            user_response.profile_picture_href = presigned[1] if presigned else None
     
     pagination_links = generate_pagination_links(request, skip, limit, total_users)
     
@@ -199,19 +231,39 @@ async def list_users(
     )
 
 
+@router.get("/users/{user_id}/logins/", response_model=LoginEventListResponse, name="get_user_logins", tags=["Administration Requires (Admin Role)"])
+async def get_user_logins(user_id: UUID, limit: int = Query(20, ge=1, le=100), days: int = Query(30, ge=1, le=365), db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Return a user's most recent login attempts, newest first.
+
+    - **user_id**: UUID of the user whose logins to list.
+    - **limit**: Maximum number of attempts to return.
+    - **days**: How far back to look.
+    """
+    events = await LoginEventService.recent_for_user(db, user_id, limit=limit, days=days)
+    return LoginEventListResponse(items=[LoginEventResponse.model_validate(event) for event in events])
+
+
 @router.post("/register/", response_model=UserResponse, tags=["Login and Registration"])
 async def register(user_data: UserCreate, session: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
+    await check_email_address(user_data.email)
     user = await UserService.register_user(session, user_data.model_dump(), email_service)
     if user:
         return user
     raise HTTPException(status_code=400, detail="Email already exists")
 
 @router.post("/login/", response_model=TokenResponse, tags=["Login and Registration"])
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
     if await UserService.is_account_locked(session, form_data.username):
         raise HTTPException(status_code=400, detail="Account locked due to too many failed login attempts.")
 
-    user = await UserService.login_user(session, form_data.username, form_data.password)
+    user = await UserService.login_user(
+        session,
+        form_data.username,
+        form_data.password,
+        client_ip=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
+    )
     if user:
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
 
@@ -224,11 +276,17 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Async
     raise HTTPException(status_code=401, detail="Incorrect email or password.")
 
 @router.post("/login/", include_in_schema=False, response_model=TokenResponse, tags=["Login and Registration"])
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
     if await UserService.is_account_locked(session, form_data.username):
         raise HTTPException(status_code=400, detail="Account locked due to too many failed login attempts.")
 
-    user = await UserService.login_user(session, form_data.username, form_data.password)
+    user = await UserService.login_user(
+        session,
+        form_data.username,
+        form_data.password,
+        client_ip=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
+    )
     if user:
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
 
@@ -254,57 +312,185 @@ async def verify_email(user_id: UUID, token: str, db: AsyncSession = Depends(get
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired verification token")
 
 
-@router.post("/users/{user_id}/profile-picture/", tags=["Personalize Account"])
+# The upload body is parsed by hand (see receive_file), so it is described here
+# for the OpenAPI schema instead of through a File(...) parameter.
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                },
+            },
+        },
+    },
+}
+
+
+@router.post("/users/{user_id}/profile-picture/", tags=["Personalize Account"], openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_profile_picture(
     user_id: UUID,
-    file: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Endpoint to upload a profile picture for the user.
-    - Caps file size to 2MB.
-    - Resizes image to 236x236 pixels (JPEG format).
+    - Caps file size to 2MB: a larger ``Content-Length`` is rejected before the body is read, and
+      the body is streamed to a temporary file with a running cap otherwise.
+    - Resizes image to every configured rendition size and format (236x236 JPEG is the default).
+    - Stores it under the SHA-256 of the upload, shared by every user who uploads the same file;
+      a file uploaded before is neither processed nor stored again.
+    - Returns the picture's versioned URL.
     """
-    file_data = await file.read()
+    too_large = HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_FILE_SIZE_MB}MB")
+    try:
+        check_content_length(request, MAX_FILE_SIZE)
+    except UploadTooLargeError:
+        raise too_large
 
-    if len(file_data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_FILE_SIZE_MB}MB")
+    if not await UserService.get_by_id(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
 
     try:
-        image = Image.open(io.BytesIO(file_data))
-        image = image.convert("RGB")
-        image = image.resize((236, 236))
-        buffer = io.BytesIO()
-        image.save(buffer, format="JPEG")
-        buffer.seek(0)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image format")
-
-    file_name = f"{user_id}_profile_picture.jpg"
-    user = await UserService.update_profile_picture(db, user_id, buffer.getvalue(), file_name)
+        upload = await receive_file(request, "file", MAX_FILE_SIZE)
+    except UploadTooLargeError:
+        raise too_large
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        user = await UserService.update_profile_picture(db, user_id, upload.sha256, partial(render_profile_picture, upload.path))
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        upload.close()
 
-    return {"profile_picture_url": user.profile_picture_url}
+    url = request.url_for("get_user_profile_picture", user_id=str(user_id)).include_query_params(
+        v=content_version(user.profile_picture_url))
+    return {"profile_picture_url": user.profile_picture_url, "url": str(url)}
 
 @router.get("/users/{user_id}/profile-picture/", response_class=StreamingResponse, tags=["Personalize Account"])
 async def get_user_profile_picture(
     user_id: UUID,
+    request: Request,
+    v: Optional[str] = Query(None, description="Content version of the picture, as returned by the upload"),
+    size: Optional[int] = Query(None, gt=0, description="Display size in pixels; the smallest rendition at least this large is served"),
+    format: Optional[str] = Query(None, pattern="^(jpeg|webp)$", description="Image format; negotiated from Accept when omitted"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Return the actual profile picture file for the user.
+
+    The image is streamed from storage in chunks; a single-range ``Range``
+    header is answered with 206 Partial Content. Responses carry the
+    object's ETag, and a matching ``If-None-Match`` gets 304 without the body
+    being read. When ``v`` matches the stored picture's content hash the
+    response is cacheable for a year, since a new upload changes the URL.
+
+    ``size`` and ``format`` pick one of the renditions generated at upload;
+    without ``format``, WebP is served to clients that accept it. Pictures
+    uploaded before renditions existed are served as stored.
+
+    Behind nginx, ``avatar_proxy_cache_seconds`` lets its cache reuse
+    unversioned responses briefly, and ``avatar_default_accel_redirect``
+    hands the default picture to nginx to send from disk.
+
+    With ``avatar_delivery_mode`` set to ``redirect`` the response is instead
+    a 302 to a presigned MinIO URL, so no image bytes pass through the API;
+    storage backends that cannot presign URLs keep streaming.
     """
     user = await UserService.get_by_id(db, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-
-    try:
-        image_stream = await UserService.get_profile_picture(db, user_id)
-        return StreamingResponse(image_stream, media_type="image/jpeg")
-    except FileNotFoundError:
-        default_stream = get_image("DefaultUser.jpg")
-        return StreamingResponse(default_stream, media_type="image/jpeg")
+    if not user.profile_picture_url:
+        raise HTTPException(status_code=404, detail="Profile picture not found")
+
+    candidates = _rendition_names(user.profile_picture_url, size, _rendition_format(format, request.headers.get("accept")))
+    if candidates[-1] != DEFAULT_IMAGE_NAME:
+        candidates.append(DEFAULT_IMAGE_NAME)
+    headers = {} if format else {"Vary": "Accept"}
+    if settings.avatar_delivery_mode == "redirect" and get_storage().can_presign:
+        # The client downloads straight from MinIO, so only an object that
+        # exists is presigned, falling back like the streaming path below. The
+        # redirect may be reused for as long as its URL stays in the cache.
+        found = await presigned_urls.first_existing(candidates)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Profile picture not found")
+        _, url, max_age = found
+        return RedirectResponse(url, status_code=status.HTTP_302_FOUND, headers={"Cache-Control": f"private, max-age={max_age}", **headers})
+
+    version = content_version(user.profile_picture_url)
+    byte_range = single_byte_range(request.headers.get("range"))
+    if_none_match = request.headers.get("if-none-match")
+    for index, file_name in enumerate(candidates):
+        # Only the requested rendition is immutable; fallbacks may be replaced later.
+        immutable = index == 0 and version and v == version
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        if settings.avatar_proxy_cache_seconds and not immutable:
+            # nginx gives X-Accel-Expires precedence over Cache-Control and strips
+            # it, so only the proxy reuses the response; browsers still revalidate.
+            headers["X-Accel-Expires"] = str(settings.avatar_proxy_cache_seconds)
+        else:
+            headers.pop("X-Accel-Expires", None)
+        try:
+            return await _profile_picture_response(file_name, byte_range, if_none_match, headers)
+        except ObjectNotFoundError:
+            if index == len(candidates) - 1:
+                raise HTTPException(status_code=404, detail="Profile picture not found")
+        except InvalidRangeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{e.size}"},
+            )
+
+
+def _rendition_format(requested: Optional[str], accept: Optional[str]) -> str:
+    formats = settings.avatar_rendition_formats
+    if requested in formats:
+        return requested
+    if "webp" in formats and "image/webp" in (accept or ""):
+        return "webp"
+    return "jpeg" if "jpeg" in formats else formats[0]
+
+
+def _rendition_names(file_name: str, size: Optional[int], format: str) -> List[str]:
+    """Stored names to try for a picture, best match first, ending with the picture as uploaded."""
+    if is_default_image(file_name):
+        return [DEFAULT_IMAGE_NAME]
+    if not content_version(file_name):
+        return [file_name]
+    sizes = sorted(settings.avatar_rendition_sizes)
+    chosen = next((candidate for candidate in sizes if size is not None and candidate >= size), sizes[-1])
+    best = rendition_name(file_name, chosen, format, sizes[-1])
+    return [best, file_name] if best != file_name else [file_name]
+
+
+async def _profile_picture_response(file_name: str, byte_range: Optional[str], if_none_match: Optional[str],
+                                    headers: Dict[str, str]) -> Response:
+    """
+    Serve the image from memory when it is the default or was served recently; otherwise stream
+    it, or answer 304 from its metadata alone when ``If-None-Match`` matches.
+    """
+    if file_name == DEFAULT_IMAGE_NAME and settings.avatar_default_accel_redirect:
+        # nginx serves the file from its own disk, answering Range and If-None-Match itself.
+        return Response(headers={"X-Accel-Redirect": settings.avatar_default_accel_redirect, **headers})
+    image = cached_image(file_name)
+    if image is not None:
+        return image.to_response(if_none_match, headers)
+    if if_none_match:
+        etag = f'"{(await stat_image(file_name)).etag}"'
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **headers})
+    if byte_range:
+        opened = await open_image(file_name, byte_range)
+    else:
+        opened = await open_cacheable_image(file_name)
+    response = opened.to_response()
+    response.headers.update(headers)
+    return response
 
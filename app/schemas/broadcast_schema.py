@@ -0,0 +1,31 @@
+from builtins import float, int, str
+from datetime import datetime
+from typing import Optional
+import uuid
+from pydantic import BaseModel, Field
+from app.models.broadcast_job_model import BroadcastSegment, BroadcastStatus
+
+class BroadcastCreate(BaseModel):
+    segment: BroadcastSegment = Field(..., example=BroadcastSegment.UNVERIFIED)
+    subject: str = Field(..., min_length=1, max_length=255, example="Please verify your account")
+    body: str = Field(..., min_length=1, example="Hello {name},\n\nYour account is still waiting to be verified.")
+    rate_per_second: Optional[float] = Field(None, gt=0, example=25.0)
+
+class BroadcastResponse(BaseModel):
+    id: uuid.UUID = Field(..., example=uuid.uuid4())
+    segment: BroadcastSegment = Field(..., example=BroadcastSegment.UNVERIFIED)
+    subject: str = Field(..., example="Please verify your account")
+    status: BroadcastStatus = Field(..., example=BroadcastStatus.RUNNING)
+    rate_per_second: Optional[float] = Field(None, example=25.0)
+    total_recipients: int = Field(..., example=500000)
+    sent_count: int = Field(..., example=120000)
+    failed_count: int = Field(..., example=12)
+    last_user_id: Optional[uuid.UUID] = Field(None, example=uuid.uuid4())
+    failed_attempts: int = Field(0, example=0)
+    last_error: Optional[str] = Field(None, example=None)
+    created_at: datetime = Field(..., example="2026-10-19T09:30:00Z")
+    started_at: Optional[datetime] = Field(None, example="2026-10-19T09:30:05Z")
+    finished_at: Optional[datetime] = Field(None, example=None)
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,22 @@
+from builtins import bool, str
+from datetime import datetime
+from typing import List, Optional
+import uuid
+from pydantic import BaseModel, Field
+
+class LoginEventResponse(BaseModel):
+    id: uuid.UUID = Field(..., example=uuid.uuid4())
+    occurred_at: datetime = Field(..., example="2026-10-19T09:30:00Z")
+    email: str = Field(..., example="john.doe@example.com")
+    success: bool = Field(..., example=True)
+    ip_address: Optional[str] = Field(None, example="203.0.113.7")
+    user_agent: Optional[str] = Field(None, example="Mozilla/5.0")
+
+    class Config:
+        from_attributes = True
+
+class LoginEventListResponse(BaseModel):
+    items: List[LoginEventResponse] = Field(..., example=[{
+        "id": uuid.uuid4(), "occurred_at": "2026-10-19T09:30:00Z", "email": "john.doe@example.com",
+        "success": True, "ip_address": "203.0.113.7", "user_agent": "Mozilla/5.0"
+    }])
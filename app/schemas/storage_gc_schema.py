@@ -0,0 +1,29 @@
+from builtins import bool, float, int, str
+from datetime import datetime
+from typing import Optional
+import uuid
+from pydantic import BaseModel, Field
+from app.models.storage_gc_model import StorageGCStatus
+
+class StorageGCCreate(BaseModel):
+    dry_run: bool = Field(True, example=True)
+    rate_per_second: Optional[float] = Field(None, gt=0, example=200.0)
+
+class StorageGCResponse(BaseModel):
+    id: uuid.UUID = Field(..., example=uuid.uuid4())
+    dry_run: bool = Field(..., example=True)
+    status: StorageGCStatus = Field(..., example=StorageGCStatus.RUNNING)
+    rate_per_second: Optional[float] = Field(None, example=200.0)
+    scanned_count: int = Field(..., example=84000)
+    orphan_count: int = Field(..., example=1250)
+    orphan_bytes: int = Field(..., example=52428800)
+    deleted_count: int = Field(..., example=0)
+    failed_count: int = Field(..., example=0)
+    last_key: Optional[str] = Field(None, example="avatar_3f2a9c0d5e7b4a1c8d6e2f0a9b7c5d3e1f4a6b8c0d2e4f6a8b0c2d4e6f8a0b2c.jpg")
+    last_error: Optional[str] = Field(None, example=None)
+    created_at: datetime = Field(..., example="2026-10-19T09:30:00Z")
+    started_at: Optional[datetime] = Field(None, example="2026-10-19T09:30:05Z")
+    finished_at: Optional[datetime] = Field(None, example=None)
+
+    class Config:
+        from_attributes = True
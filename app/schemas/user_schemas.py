@@ -61,6 +61,7 @@ class UserResponse(UserBase):
     is_professional: Optional[bool] = Field(default=False, example=True)
     role: UserRole
     profile_picture_url: Optional[str] = Field(None, example="DefaultUser.jpg")
+    profile_picture_href: Optional[str] = Field(None, example="http://localhost:9000/profile-pictures/DefaultUser.jpg?X-Amz-Signature=...")
 
 class LoginRequest(BaseModel):
     email: str = Field(..., example="john.doe@example.com")
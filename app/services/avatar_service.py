@@ -0,0 +1,97 @@
+from builtins import bool, classmethod, int, len, max, str, sum
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.avatar_blob_model import AvatarBlob
+from app.utils.image_processing import RENDITION_FORMATS
+from app.utils.metrics import Metrics
+from app.utils.minio_client import avatar_blob_digest, avatar_blob_name, rendition_name, save_image
+
+Renditions = Dict[Tuple[int, str], bytes]
+
+
+class AvatarService:
+    """
+    Reference-counted, content-addressed profile pictures.
+
+    Every statement runs in the caller's transaction, next to the change to
+    ``users.profile_picture_url``, so a blob's count always matches the users
+    pointing at it. Objects are written before the row is inserted; if the
+    transaction then rolls back they are orphans for garbage collection to
+    remove, never a row without objects.
+    """
+
+    @classmethod
+    async def acquire(cls, session: AsyncSession, digest: str) -> bool:
+        """
+        Add a reference to an already stored blob.
+
+        Returns False when there is no such blob. The row stays locked until
+        the transaction ends, so garbage collection cannot delete it meanwhile.
+        """
+        result = await session.execute(
+            update(AvatarBlob)
+            .where(AvatarBlob.digest == digest)
+            .values(refcount=AvatarBlob.refcount + 1)
+            .returning(AvatarBlob.digest)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar_one_or_none() is not None
+
+    @classmethod
+    async def store(cls, session: AsyncSession, digest: str, renditions: Renditions) -> str:
+        """
+        Write a new blob's renditions and record it with one reference; returns the primary name.
+
+        The primary rendition is the largest JPEG. Two users storing the same
+        new blob at once both write identical objects and both references count.
+        """
+        primary_size = max(size for size, _ in renditions)
+        file_name = avatar_blob_name(digest)
+        await asyncio.gather(*(
+            save_image(data, rendition_name(file_name, size, format, primary_size), RENDITION_FORMATS[format])
+            for (size, format), data in renditions.items()
+        ))
+        size = sum(len(data) for data in renditions.values())
+        await session.execute(
+            insert(AvatarBlob)
+            .values(digest=digest, refcount=1, size=size)
+            .on_conflict_do_update(index_elements=[AvatarBlob.digest], set_={"refcount": AvatarBlob.refcount + 1})
+        )
+        return file_name
+
+    @classmethod
+    async def release(cls, session: AsyncSession, file_name: Optional[str]):
+        """Drop a reference to the blob ``file_name`` names; other names (legacy, default) are ignored."""
+        digest = avatar_blob_digest(file_name)
+        if digest is None:
+            return
+        await session.execute(
+            update(AvatarBlob)
+            .where(AvatarBlob.digest == digest, AvatarBlob.refcount > 0)
+            .values(refcount=AvatarBlob.refcount - 1, released_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    async def replace(cls, session: AsyncSession, current: Optional[str], digest: str,
+                      render: Callable[[], Awaitable[Renditions]]) -> str:
+        """
+        Move a user's picture from ``current`` to the blob for ``digest`` and return its name.
+
+        ``render`` is only awaited when the blob is not stored yet; an
+        identical re-upload costs no image processing and no storage writes.
+        """
+        file_name = avatar_blob_name(digest)
+        if current == file_name:
+            Metrics.increment("avatar_blob_reused")
+            return file_name
+        if await cls.acquire(session, digest):
+            Metrics.increment("avatar_blob_reused")
+        else:
+            await cls.store(session, digest, await render())
+            Metrics.increment("avatar_blob_stored")
+        await cls.release(session, current)
+        return file_name
@@ -0,0 +1,308 @@
+from builtins import Exception, ValueError, classmethod, enumerate, int, isinstance, len, max, min, next, range, set, sorted, str, sum, type, zip
+import asyncio
+import logging
+from datetime import timedelta
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import ARRAY, Interval, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.container import get_container
+from app.dependencies import get_settings
+from app.models.broadcast_job_model import BroadcastJob, BroadcastSegment, BroadcastStatus
+from app.models.user_model import User, UserRole
+from app.services.email_service import EmailService
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+from app.utils.rate_limiter import RateLimiter
+from app.utils.smtp_connection import SMTPBatchError
+from app.utils.template_manager import CompiledTemplate, TemplateManager, template_fields
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SEGMENT_FILTERS = {
+    BroadcastSegment.UNVERIFIED: User.email_verified.is_(False),
+    BroadcastSegment.LOCKED: User.is_locked.is_(True),
+    BroadcastSegment.AUTHENTICATED: User.role == UserRole.AUTHENTICATED,
+}
+# Placeholders a broadcast body may use; each is filled per recipient.
+BROADCAST_FIELDS = frozenset({"name", "first_name", "last_name", "nickname", "email"})
+
+# Picks the oldest unfinished job nobody holds a live lease on. A job whose
+# worker died becomes claimable again once its lease runs out, and resumes
+# from its last checkpoint.
+_CLAIMABLE_JOB = (
+    select(BroadcastJob.id)
+    .where(
+        BroadcastJob.status.in_([BroadcastStatus.PENDING, BroadcastStatus.RUNNING]),
+        or_(BroadcastJob.lease_expires_at.is_(None), BroadcastJob.lease_expires_at < func.now()),
+    )
+    .order_by(BroadcastJob.created_at)
+    .limit(1)
+    .with_for_update(skip_locked=True)
+    .scalar_subquery()
+)
+CLAIM_JOB_QUERY = (
+    update(BroadcastJob)
+    .where(BroadcastJob.id == _CLAIMABLE_JOB)
+    .values(
+        status=BroadcastStatus.RUNNING,
+        lease_expires_at=func.now() + bindparam("lease", type_=Interval()),
+        started_at=func.coalesce(BroadcastJob.started_at, func.now()),
+    )
+    .returning(BroadcastJob)
+    .execution_options(synchronize_session=False, populate_existing=True)
+)
+# Records progress and renews the lease in one statement. It matches nothing
+# once the job has been cancelled, which tells the worker to stop.
+CHECKPOINT_QUERY = (
+    update(BroadcastJob)
+    .execution_options(synchronize_session=False)
+    .where(BroadcastJob.id == bindparam("job_id"), BroadcastJob.status == BroadcastStatus.RUNNING)
+    .values(
+        last_user_id=bindparam("last_user_id"),
+        sent_ahead_user_ids=bindparam("sent_ahead", type_=ARRAY(PostgresUUID(as_uuid=True))),
+        sent_count=BroadcastJob.sent_count + bindparam("sent", type_=BroadcastJob.sent_count.type),
+        failed_count=BroadcastJob.failed_count + bindparam("failed", type_=BroadcastJob.failed_count.type),
+        lease_expires_at=func.now() + bindparam("lease", type_=Interval()),
+    )
+    .returning(BroadcastJob.id)
+)
+# Counts a run that stopped on an error. The lease is left in place, so the
+# job is retried once it expires, which spaces out the retries.
+RECORD_FAILURE_QUERY = (
+    update(BroadcastJob)
+    .execution_options(synchronize_session=False)
+    .where(BroadcastJob.id == bindparam("job_id"), BroadcastJob.status == BroadcastStatus.RUNNING)
+    .values(failed_attempts=BroadcastJob.failed_attempts + 1, last_error=bindparam("error"))
+    .returning(BroadcastJob.failed_attempts)
+)
+
+
+def _chunks(items: Sequence, count: int) -> List[Sequence]:
+    size = -(-len(items) // count)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class BroadcastService:
+    @classmethod
+    async def create_job(cls, session: AsyncSession, segment: BroadcastSegment, subject: str, body: str,
+                         created_by: Optional[UUID] = None, rate_per_second: Optional[float] = None) -> BroadcastJob:
+        """Queue a broadcast; raises ValueError if the body uses an unknown placeholder."""
+        unknown = template_fields(body) - BROADCAST_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown placeholders: {', '.join(sorted(unknown))}")
+        total = (await session.execute(select(func.count()).select_from(User).where(SEGMENT_FILTERS[segment]))).scalar()
+        job = BroadcastJob(segment=segment, subject=subject, body=body, rate_per_second=rate_per_second,
+                           total_recipients=total, created_by=created_by)
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+        broadcast_runner.trigger()
+        return job
+
+    @classmethod
+    async def get_job(cls, session: AsyncSession, job_id: UUID) -> Optional[BroadcastJob]:
+        return await session.get(BroadcastJob, job_id, populate_existing=True)
+
+    @classmethod
+    async def cancel_job(cls, session: AsyncSession, job_id: UUID) -> Optional[BroadcastJob]:
+        """Cancel a pending or running job; the worker stops at its next checkpoint."""
+        job = await cls.get_job(session, job_id)
+        if job and job.status in (BroadcastStatus.PENDING, BroadcastStatus.RUNNING):
+            job.status = BroadcastStatus.CANCELLED
+            job.finished_at = func.now()
+            await session.commit()
+            await session.refresh(job)
+        return job
+
+    @classmethod
+    async def recipients(cls, session: AsyncSession, segment: BroadcastSegment, after_id: Optional[UUID], limit: int) -> List[Row]:
+        """Return the next ``limit`` users of a segment after ``after_id``, in id order."""
+        query = (
+            select(User.id, User.email, User.first_name, User.last_name, User.nickname)
+            .where(SEGMENT_FILTERS[segment])
+            .order_by(User.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        return (await session.execute(query)).all()
+
+    @classmethod
+    async def claim_job(cls, session: AsyncSession) -> Optional[BroadcastJob]:
+        result = await session.execute(CLAIM_JOB_QUERY, {"lease": timedelta(seconds=settings.broadcast_lease_seconds)})
+        job = result.scalar_one_or_none()
+        await session.commit()
+        return job
+
+    @staticmethod
+    def _render(template_manager: TemplateManager, compiled: CompiledTemplate, subject: str,
+                users: Sequence[Row]) -> List[Tuple[str, str, str]]:
+        messages = []
+        for user in users:
+            context = {
+                "name": user.first_name or user.nickname,
+                "first_name": user.first_name or "",
+                "last_name": user.last_name or "",
+                "nickname": user.nickname,
+                "email": user.email,
+            }
+            messages.append((subject, template_manager.render_compiled(compiled, **context), user.email))
+        return messages
+
+    @classmethod
+    async def _send(cls, email_service: EmailService, limiter: RateLimiter, messages: Sequence[Tuple[str, str, str]]) -> int:
+        """
+        Send messages over one SMTP session once the rate limiter allows; returns the number refused.
+
+        Only recipients the server refused count as failed. Connection and
+        transport errors are raised; ``SMTPBatchError`` says how many
+        messages went out before the session failed.
+        """
+        await limiter.acquire(len(messages))
+        refused = await asyncio.to_thread(email_service.smtp_client.send_emails, messages)
+        return len(refused)
+
+    @classmethod
+    async def run_job(cls, session: AsyncSession, job: BroadcastJob, email_service: EmailService) -> BroadcastStatus:
+        """
+        Send a claimed job from its checkpoint to the end of its segment.
+
+        Recipients are read one batch at a time, so memory use does not grow
+        with the segment size. Each batch is split across
+        ``broadcast_concurrency`` SMTP sessions, at most one less than the
+        pool holds, paced by the job's rate limit, and checkpointed once
+        sent.
+
+        If a session fails, the checkpoint only moves up to the first
+        recipient who was not emailed, and recipients past it who were are
+        stored in ``sent_ahead_user_ids`` and skipped when the job resumes.
+        The error is then raised for ``record_failure``.
+        """
+        template_manager = email_service.template_manager
+        try:
+            compiled = template_manager.compile_markdown(job.body)
+        except ValueError as e:
+            await cls.finish_job(session, job.id, BroadcastStatus.FAILED, str(e))
+            return BroadcastStatus.FAILED
+        limiter = RateLimiter(job.rate_per_second or settings.broadcast_rate_per_second)
+        lease = timedelta(seconds=settings.broadcast_lease_seconds)
+        # Leave at least one pooled session free for transactional email.
+        concurrency = max(1, min(settings.broadcast_concurrency, email_service.smtp_client.pool_size - 1))
+        last_user_id = job.last_user_id
+        sent_ahead = set(job.sent_ahead_user_ids or ())
+        while True:
+            users = await cls.recipients(session, job.segment, last_user_id, settings.broadcast_batch_size)
+            if not users:
+                break
+            outgoing = [user for user in users if user.id not in sent_ahead]
+            messages = cls._render(template_manager, compiled, job.subject, outgoing)
+            chunks = _chunks(messages, concurrency) if messages else []
+            results = await asyncio.gather(*(
+                cls._send(email_service, limiter, chunk) for chunk in chunks
+            ), return_exceptions=True)
+
+            delivered, failed, error, start = set(), 0, None, 0
+            for chunk, result in zip(chunks, results):
+                if isinstance(result, SMTPBatchError):
+                    done, failed = result.completed, failed + len(result.refused)
+                elif isinstance(result, Exception):
+                    done = 0
+                else:
+                    done, failed = len(chunk), failed + result
+                delivered.update(user.id for user in outgoing[start:start + done])
+                if done < len(chunk) and error is None:
+                    error = result
+                start += len(chunk)
+            sent_ahead |= delivered
+
+            # The checkpoint may only pass users who were emailed, now or by an
+            # earlier interrupted run.
+            gap = next((index for index, user in enumerate(users) if user.id not in sent_ahead), len(users))
+            if gap:
+                last_user_id = users[gap - 1].id
+            sent_ahead = {user.id for user in users[gap:] if user.id in sent_ahead}
+            result = await session.execute(CHECKPOINT_QUERY, {
+                "job_id": job.id, "last_user_id": last_user_id, "sent_ahead": sorted(sent_ahead) or None,
+                "sent": len(delivered) - failed, "failed": failed, "lease": lease,
+            })
+            checkpointed = result.scalar_one_or_none()
+            await session.commit()
+            Metrics.increment("broadcast_emails_sent", len(delivered) - failed)
+            Metrics.increment("broadcast_emails_failed", failed)
+            if checkpointed is None:
+                logger.info(f"Broadcast {job.id} stopped: no longer running.")
+                return BroadcastStatus.CANCELLED
+            if error is not None:
+                raise error
+        await cls.finish_job(session, job.id, BroadcastStatus.COMPLETED)
+        return BroadcastStatus.COMPLETED
+
+    @classmethod
+    async def record_failure(cls, session: AsyncSession, job_id: UUID, error: str) -> BroadcastStatus:
+        """
+        Count a run that stopped on an error and store the error.
+
+        The job stays RUNNING and is retried from its checkpoint once its
+        lease expires, until ``broadcast_max_attempts`` runs have failed; it
+        is then marked FAILED.
+        """
+        result = await session.execute(RECORD_FAILURE_QUERY, {"job_id": job_id, "error": error})
+        attempts = result.scalar_one_or_none()
+        await session.commit()
+        if attempts is None:
+            return BroadcastStatus.CANCELLED
+        if attempts >= settings.broadcast_max_attempts:
+            await cls.finish_job(session, job_id, BroadcastStatus.FAILED, error)
+            return BroadcastStatus.FAILED
+        return BroadcastStatus.RUNNING
+
+    @classmethod
+    async def finish_job(cls, session: AsyncSession, job_id: UUID, status: BroadcastStatus, error: Optional[str] = None):
+        query = (
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job_id, BroadcastJob.status == BroadcastStatus.RUNNING)
+            .values(status=status, finished_at=func.now(), lease_expires_at=None, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(query)
+        await session.commit()
+
+
+async def run_broadcasts():
+    """Run claimable broadcast jobs one after another until none are left."""
+    email_service = get_container().email_service
+    async with Database.get_session_factory()() as session:
+        while True:
+            job = await BroadcastService.claim_job(session)
+            if job is None:
+                return
+            logger.info(f"Running broadcast {job.id} to {job.segment.name} users from checkpoint {job.last_user_id}.")
+            try:
+                status = await BroadcastService.run_job(session, job, email_service)
+            except Exception as e:
+                # Such as the SMTP server being unreachable.
+                await session.rollback()
+                logger.warning(f"Broadcast {job.id} run failed: {e}")
+                status = await BroadcastService.record_failure(session, job.id, f"{type(e).__name__}: {e}")
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so another worker resumes it right away.
+                await session.rollback()
+                await session.execute(
+                    update(BroadcastJob).where(BroadcastJob.id == job.id).values(lease_expires_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+                raise
+            logger.info(f"Broadcast {job.id} {status.name.lower()}.")
+
+
+broadcast_runner = PeriodicTask(
+    "broadcast-runner",
+    settings.broadcast_poll_interval_seconds,
+    run_broadcasts,
+)
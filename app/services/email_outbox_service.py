@@ -0,0 +1,201 @@
+from builtins import Exception, bool, classmethod, float, int, len, next, range, str
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from itertools import cycle
+from typing import List, Tuple
+from sqlalchemy import Interval, bindparam, func, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.container import get_container
+from app.dependencies import get_settings
+from app.models.email_outbox_model import EmailOutbox, OutboxStatus
+from app.services.email_service import EmailService
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+from app.utils.smtp_connection import SMTPBatchError
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Claiming pushes next_attempt_at out by the lease instead of holding row
+# locks while SMTP runs: the claim transaction commits straight away, and if
+# the worker dies mid-send the rows become due again when the lease expires.
+# SKIP LOCKED lets concurrent workers claim disjoint batches without waiting.
+_DUE_EMAILS = (
+    select(EmailOutbox.id)
+    .where(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.next_attempt_at <= func.now())
+    .order_by(EmailOutbox.next_attempt_at)
+    .limit(bindparam("batch_size"))
+    .with_for_update(skip_locked=True)
+)
+CLAIM_EMAILS_QUERY = (
+    update(EmailOutbox)
+    .execution_options(synchronize_session=False)
+    .where(EmailOutbox.id.in_(_DUE_EMAILS))
+    .values(
+        attempts=EmailOutbox.attempts + 1,
+        next_attempt_at=func.now() + bindparam("lease", type_=Interval()),
+    )
+    .returning(EmailOutbox.id, EmailOutbox.email_type, EmailOutbox.recipient, EmailOutbox.context, EmailOutbox.attempts)
+)
+_outbox = EmailOutbox.__table__
+MARK_FAILED_QUERY = (
+    update(_outbox)
+    .where(_outbox.c.id == bindparam("email_id"))
+    .values(
+        status=bindparam("new_status"),
+        next_attempt_at=bindparam("retry_at"),
+        last_error=bindparam("error"),
+    )
+)
+PENDING_STATS_QUERY = (
+    select(func.count(), func.min(EmailOutbox.created_at))
+    .where(EmailOutbox.status == OutboxStatus.PENDING)
+)
+
+
+def retry_delay(attempts: int, base: float, maximum: float) -> float:
+    """Seconds to wait after the ``attempts``-th failed attempt: doubles each time, capped at ``maximum``."""
+    return min(base * 2 ** (attempts - 1), maximum)
+
+
+class EmailOutboxService:
+    @classmethod
+    async def claim(cls, session: AsyncSession, batch_size: int, lease_seconds: float) -> List[Row]:
+        """Lease up to ``batch_size`` due emails to the caller and return them."""
+        result = await session.execute(
+            CLAIM_EMAILS_QUERY, {"batch_size": batch_size, "lease": timedelta(seconds=lease_seconds)}
+        )
+        emails = result.all()
+        await session.commit()
+        return emails
+
+    @classmethod
+    async def mark_sent(cls, session: AsyncSession, email_ids: List) -> None:
+        if not email_ids:
+            return
+        query = (
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(email_ids))
+            .values(status=OutboxStatus.SENT, sent_at=func.now(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(query)
+        Metrics.increment("email_outbox_sent", len(email_ids))
+
+    @classmethod
+    async def mark_failed(cls, session: AsyncSession, failures: List[Tuple[Row, str, bool]]) -> None:
+        """
+        Reschedule failed emails with exponential backoff.
+
+        An email is dead-lettered instead when it has used up
+        ``email_outbox_max_attempts`` or its failure cannot succeed on retry.
+        """
+        if not failures:
+            return
+        now = datetime.now(timezone.utc)
+        rows = []
+        for email, error, retryable in failures:
+            if retryable and email.attempts < settings.email_outbox_max_attempts:
+                delay = retry_delay(email.attempts, settings.email_outbox_retry_base_seconds, settings.email_outbox_retry_max_seconds)
+                rows.append({"email_id": email.id, "new_status": OutboxStatus.PENDING,
+                             "retry_at": now + timedelta(seconds=delay), "error": error})
+                Metrics.increment("email_outbox_retried")
+            else:
+                rows.append({"email_id": email.id, "new_status": OutboxStatus.DEAD, "retry_at": now, "error": error})
+                Metrics.increment("email_outbox_dead_lettered")
+                logger.error(f"Dead-lettered {email.email_type} email {email.id} after {email.attempts} attempts: {error}")
+        await session.execute(MARK_FAILED_QUERY, rows)
+
+    @classmethod
+    async def deliver_batch(cls, session: AsyncSession, email_service: EmailService, batch_size: int) -> int:
+        """
+        Claim one batch of due emails and send it over a single SMTP session.
+
+        Returns the number of emails claimed, so callers can keep going while
+        full batches come back.
+        """
+        emails = await cls.claim(session, batch_size, settings.email_outbox_lease_seconds)
+        if not emails:
+            return 0
+        failures = []
+        outgoing = []
+        for email in emails:
+            try:
+                subject, html_content = email_service.render_user_email(email.context, email.email_type)
+            except Exception as e:
+                failures.append((email, f"Failed to render email: {e}", False))
+                continue
+            outgoing.append((email, (subject, html_content, email.recipient)))
+
+        sent = []
+        if outgoing:
+            try:
+                # smtplib blocks, so the batch is sent from a worker thread.
+                refused = await asyncio.to_thread(email_service.smtp_client.send_emails, [message for _, message in outgoing])
+            except SMTPBatchError as e:
+                # The server already answered the first emails; only the rest
+                # are retried, so nobody receives the same email twice.
+                refused = e.refused
+                failures.extend((email, str(e.error), True) for email, _ in outgoing[e.completed:])
+                outgoing = outgoing[:e.completed]
+            except Exception as e:
+                refused = []
+                failures.extend((email, str(e), True) for email, _ in outgoing)
+                outgoing = []
+            # Refusals are reported per recipient, so every email to a
+            # refused address in this batch is retried.
+            errors = {recipient: str(error) for recipient, error in refused}
+            for email, _ in outgoing:
+                if email.recipient in errors:
+                    failures.append((email, errors[email.recipient], True))
+                else:
+                    sent.append(email.id)
+
+        await cls.mark_sent(session, sent)
+        await cls.mark_failed(session, failures)
+        await session.commit()
+        return len(emails)
+
+    @classmethod
+    async def pending_stats(cls, session: AsyncSession) -> Tuple[int, float]:
+        """Return the number of pending emails and the age in seconds of the oldest one."""
+        depth, oldest = (await session.execute(PENDING_STATS_QUERY)).one()
+        age = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+        Metrics.set_gauge("email_outbox_depth", depth)
+        Metrics.set_gauge("email_outbox_oldest_age_seconds", age)
+        return depth, age
+
+
+async def deliver_pending_emails():
+    """Deliver due emails in batches until a batch comes back short."""
+    email_service = get_container().email_service
+    batch_size = settings.email_outbox_batch_size
+    async with Database.get_session_factory()() as session:
+        while await EmailOutboxService.deliver_batch(session, email_service, batch_size) == batch_size:
+            pass
+
+
+async def record_outbox_stats():
+    async with Database.get_session_factory()() as session:
+        await EmailOutboxService.pending_stats(session)
+
+
+email_outbox_workers = [
+    PeriodicTask(f"email-outbox-{number}", settings.email_outbox_poll_interval_seconds, deliver_pending_emails)
+    for number in range(settings.email_outbox_workers)
+]
+email_outbox_monitor = PeriodicTask(
+    "email-outbox-stats",
+    settings.email_outbox_stats_interval_seconds,
+    record_outbox_stats,
+)
+_next_worker = cycle(email_outbox_workers)
+
+
+def wake_email_outbox_worker():
+    """Wake one delivery worker after an email has been committed to the outbox."""
+    if email_outbox_workers:
+        next(_next_worker).trigger()
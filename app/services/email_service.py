@@ -1,37 +1,69 @@
 # email_service.py
 from builtins import ValueError, dict, str
+import asyncio
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from settings.config import settings
+from app.utils.security import VERIFY_EMAIL_PURPOSE, generate_signed_token
 from app.utils.smtp_connection import SMTPClient
 from app.utils.template_manager import TemplateManager
+from app.models.email_outbox_model import EmailOutbox
 from app.models.user_model import User
 
+EMAIL_SUBJECTS = {
+    'email_verification': "Verify Your Account",
+    'password_reset': "Password Reset Instructions",
+    'account_locked': "Account Locked Notification"
+}
+
 class EmailService:
-    def __init__(self, template_manager: TemplateManager):
-        self.smtp_client = SMTPClient(
-            server=settings.smtp_server,
-            port=settings.smtp_port,
-            username=settings.smtp_username,
-            password=settings.smtp_password
-        )
+    def __init__(self, template_manager: TemplateManager, smtp_client: Optional[SMTPClient] = None):
+        # The application passes the container's shared client; a client of
+        # its own is only built for standalone use such as scripts.
+        self.smtp_client = smtp_client or SMTPClient.from_settings(settings)
         self.template_manager = template_manager
 
+    def render_user_email(self, user_data: dict, email_type: str) -> Tuple[str, str]:
+        """Return the ``(subject, html_content)`` of an email."""
+        if email_type not in EMAIL_SUBJECTS:
+            raise ValueError("Invalid email type")
+        return EMAIL_SUBJECTS[email_type], self.template_manager.render_template(email_type, **user_data)
+
     async def send_user_email(self, user_data: dict, email_type: str):
-        subject_map = {
-            'email_verification': "Verify Your Account",
-            'password_reset': "Password Reset Instructions",
-            'account_locked': "Account Locked Notification"
-        }
+        subject, html_content = self.render_user_email(user_data, email_type)
+        # Waiting for a pooled session and the SMTP exchange both block, so they run off the event loop.
+        await asyncio.to_thread(self.smtp_client.send_email, subject, html_content, user_data['email'])
 
-        if email_type not in subject_map:
-            raise ValueError("Invalid email type")
+    async def enqueue_user_email(self, session: AsyncSession, user_data: dict, email_type: str) -> EmailOutbox:
+        """
+        Queue an email in the outbox as part of the caller's transaction.
 
-        html_content = self.template_manager.render_template(email_type, **user_data)
-        self.smtp_client.send_email(subject_map[email_type], html_content, user_data['email'])
+        Nothing is sent here: the row becomes visible to the delivery workers
+        when the caller commits, and disappears if it rolls back.
+        """
+        if email_type not in EMAIL_SUBJECTS:
+            raise ValueError("Invalid email type")
+        email = EmailOutbox(email_type=email_type, recipient=user_data['email'], context=user_data)
+        session.add(email)
+        return email
 
-    async def send_verification_email(self, user: User):
-        verification_url = f"{settings.server_base_url}verify-email/{user.id}/{user.verification_token}"
-        await self.send_user_email({
+    @staticmethod
+    def _verification_email_data(user: User) -> dict:
+        if settings.signed_tokens_enabled:
+            token = generate_signed_token(
+                settings.secret_key, VERIFY_EMAIL_PURPOSE, user.id, user.token_version,
+                settings.verification_token_expire_hours * 3600,
+            )
+        else:
+            token = user.verification_token
+        return {
             "name": user.first_name,
-            "verification_url": verification_url,
+            "verification_url": f"{settings.server_base_url}verify-email/{user.id}/{token}",
             "email": user.email
-        }, 'email_verification')
\ No newline at end of file
+        }
+
+    async def send_verification_email(self, user: User):
+        await self.send_user_email(self._verification_email_data(user), 'email_verification')
+
+    async def enqueue_verification_email(self, session: AsyncSession, user: User) -> EmailOutbox:
+        return await self.enqueue_user_email(session, self._verification_email_data(user), 'email_verification')
\ No newline at end of file
@@ -0,0 +1,116 @@
+from builtins import Exception, bool, int, len, list
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+from uuid import UUID
+from sqlalchemy import DateTime, column, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.dependencies import get_settings
+from app.models.user_model import User
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """
+    Per-worker buffer of successful logins waiting to be written to ``users.last_login_at``.
+
+    Repeated logins by the same user coalesce into one entry holding the
+    latest timestamp. The buffer is bounded: once ``max_size`` distinct users
+    are pending, ``add`` refuses new users and the caller writes synchronously.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._pending: Dict[UUID, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, user_id: UUID) -> bool:
+        return user_id in self._pending
+
+    def add(self, user_id: UUID, logged_in_at: datetime) -> bool:
+        """Buffer a login; returns False if the buffer is full."""
+        current = self._pending.get(user_id)
+        if current is None:
+            if len(self._pending) >= self.max_size:
+                Metrics.increment("last_login_buffer_rejected")
+                return False
+            self._pending[user_id] = logged_in_at
+        elif logged_in_at > current:
+            self._pending[user_id] = logged_in_at
+        if len(self._pending) >= self.max_size // 2:
+            last_login_flusher.trigger()
+        return True
+
+    def _restore(self, pending: List[Tuple[UUID, datetime]]):
+        """
+        Put back the entries of a failed flush.
+
+        Unlike ``add`` this never wakes the flusher: while the database is
+        down, waking it would only retry the failed flush straight away.
+        """
+        for user_id, logged_in_at in pending:
+            current = self._pending.get(user_id)
+            if current is None and len(self._pending) >= self.max_size:
+                Metrics.increment("last_login_buffer_rejected")
+            elif current is None or logged_in_at > current:
+                self._pending[user_id] = logged_in_at
+
+    def drain(self) -> List[Tuple[UUID, datetime]]:
+        """Remove and return every pending ``(user_id, last_login_at)`` pair."""
+        pending = list(self._pending.items())
+        self._pending.clear()
+        return pending
+
+    async def flush(self, session: AsyncSession) -> int:
+        """Write all pending logins with one UPDATE ... FROM (VALUES ...) statement."""
+        pending = self.drain()
+        if not pending:
+            return 0
+        logins = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("last_login_at", DateTime(timezone=True)),
+            name="logins",
+        ).data(pending)
+        query = (
+            update(User)
+            .where(User.id == logins.c.id)
+            .values(last_login_at=logins.c.last_login_at)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            await session.execute(query)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            self._restore(pending)
+            raise
+        Metrics.increment("last_login_flushed", len(pending))
+        return len(pending)
+
+
+last_login_buffer = LastLoginBuffer(settings.last_login_buffer_size)
+
+
+async def flush_last_logins():
+    """Flush the worker's buffer in a session of its own."""
+    if not len(last_login_buffer):
+        return
+    async with Database.get_session_factory()() as session:
+        flushed = await last_login_buffer.flush(session)
+    logger.info(f"Flushed last_login_at for {flushed} users.")
+
+
+last_login_flusher = PeriodicTask(
+    "last-login-flush",
+    settings.last_login_flush_interval_seconds,
+    flush_last_logins,
+    run_on_stop=True,
+)
@@ -0,0 +1,206 @@
+from builtins import Exception, bool, classmethod, int, len, range, str
+import logging
+from collections import deque
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Deque, Dict, List, Optional
+from uuid import UUID, uuid4
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.dependencies import get_settings
+from app.models.login_event_model import LoginEvent
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+INSERT_LOGIN_EVENTS_QUERY = insert(LoginEvent.__table__)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class LoginEventRecorder:
+    """
+    Per-worker queue of login attempts waiting to be written to ``login_events``.
+
+    ``record`` only appends to memory, so logging in never waits on the audit
+    insert. The queue is bounded; when it is full new events are dropped and
+    counted in the ``login_events_dropped`` metric.
+    """
+
+    def __init__(self, max_size: int, batch_size: int):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self._queue: Deque[Dict] = deque()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def record(self, email: str, success: bool, user_id: Optional[UUID] = None,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None):
+        if len(self._queue) >= self.max_size:
+            Metrics.increment("login_events_dropped")
+            return
+        self._queue.append({
+            "id": uuid4(),
+            "occurred_at": datetime.now(timezone.utc),
+            "user_id": user_id,
+            # Bounded to the column widths: a row that cannot be inserted is dropped at flush.
+            "email": email[:255],
+            "success": success,
+            "ip_address": ip_address,
+            "user_agent": user_agent[:512] if user_agent else None,
+        })
+
+    async def flush(self, session: AsyncSession) -> int:
+        """
+        Insert queued events in multi-row INSERT batches of ``batch_size``.
+
+        A batch the database rejects is never put back on the queue, where it
+        would fail every later flush too: it is retried one row at a time,
+        and rows that still fail are dropped and counted in the
+        ``login_events_failed`` metric.
+        """
+        flushed = 0
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                await session.execute(INSERT_LOGIN_EVENTS_QUERY, batch)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"Login event batch of {len(batch)} failed, retrying row by row: {e}")
+                flushed += await self._insert_rows(session, batch)
+                continue
+            flushed += len(batch)
+        Metrics.increment("login_events_written", flushed)
+        return flushed
+
+    async def _insert_rows(self, session: AsyncSession, rows: List[Dict]) -> int:
+        written = 0
+        for row in rows:
+            try:
+                await session.execute(INSERT_LOGIN_EVENTS_QUERY, [row])
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                Metrics.increment("login_events_failed")
+                logger.error(f"Dropped login event for {row.get('email')!r}: {e}")
+                continue
+            written += 1
+        return written
+
+
+login_event_recorder = LoginEventRecorder(settings.login_event_queue_size, settings.login_event_batch_size)
+
+
+class LoginEventService:
+    @classmethod
+    async def recent_for_user(cls, session: AsyncSession, user_id: UUID, limit: int = 20, days: int = 30) -> List[LoginEvent]:
+        """
+        Return a user's most recent login attempts, newest first.
+
+        The ``occurred_at`` lower bound lets PostgreSQL prune partitions older
+        than ``days``; within the remaining ones the (user_id, occurred_at)
+        index serves the lookup and ordering.
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        query = (
+            select(LoginEvent)
+            .where(LoginEvent.user_id == user_id, LoginEvent.occurred_at >= since)
+            .order_by(LoginEvent.occurred_at.desc())
+            .limit(limit)
+        )
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def ensure_partitions(cls, session: AsyncSession, months_ahead: int) -> List[str]:
+        """
+        Create the monthly partitions from the current month to ``months_ahead`` months out.
+
+        Months are UTC months, whatever the server's local time zone, so a
+        login is never filed under the wrong month near a month boundary.
+
+        Each month is created in a transaction of its own, so one that fails
+        does not stop the months after it; the names that exist afterwards are
+        returned.
+        """
+        current_month = datetime.now(timezone.utc).date().replace(day=1)
+        names = []
+        for offset in range(months_ahead + 1):
+            start = _add_months(current_month, offset)
+            end = _add_months(current_month, offset + 1)
+            name = f"login_events_{start:%Y_%m}"
+            try:
+                await cls._create_partition(session, name, start, end)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Could not create login event partition {name}: {e}")
+                continue
+            names.append(name)
+        return names
+
+    @classmethod
+    async def _create_partition(cls, session: AsyncSession, name: str, start: date, end: date):
+        """
+        Create one monthly partition in the caller's transaction.
+
+        PostgreSQL refuses a new partition while the default partition holds
+        rows in its range, so those rows are moved over: the default partition
+        is detached, the month created and filled from it, and the default
+        attached again.
+        """
+        if (await session.execute(text("SELECT to_regclass(:name)"), {"name": name})).scalar() is not None:
+            return
+        bounds = {"start": datetime.combine(start, time(), timezone.utc), "end": datetime.combine(end, time(), timezone.utc)}
+        in_default = False
+        if (await session.execute(text("SELECT to_regclass('login_events_default')"))).scalar() is not None:
+            in_default = (await session.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM login_events_default WHERE occurred_at >= :start AND occurred_at < :end)"
+            ), bounds)).scalar()
+        if in_default:
+            await session.execute(text("ALTER TABLE login_events DETACH PARTITION login_events_default"))
+        await session.execute(text(
+            f"CREATE TABLE {name} PARTITION OF login_events "
+            f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        ))
+        if in_default:
+            await session.execute(text(
+                f"WITH moved AS (DELETE FROM login_events_default WHERE occurred_at >= :start AND occurred_at < :end "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            await session.execute(text("ALTER TABLE login_events ATTACH PARTITION login_events_default DEFAULT"))
+            logger.info(f"Moved login events for {start:%Y-%m} out of the default partition into {name}.")
+
+
+async def flush_login_events():
+    """Flush the worker's queued login events in a session of its own."""
+    if not len(login_event_recorder):
+        return
+    async with Database.get_session_factory()() as session:
+        flushed = await login_event_recorder.flush(session)
+    logger.info(f"Wrote {flushed} login events.")
+
+
+async def maintain_login_event_partitions():
+    async with Database.get_session_factory()() as session:
+        await LoginEventService.ensure_partitions(session, settings.login_event_partition_months_ahead)
+
+
+login_event_flusher = PeriodicTask(
+    "login-event-flush",
+    settings.login_event_flush_interval_seconds,
+    flush_login_events,
+    run_on_stop=True,
+)
+login_event_partitioner = PeriodicTask(
+    "login-event-partitions",
+    settings.login_event_partition_interval_seconds,
+    maintain_login_event_partitions,
+)
@@ -0,0 +1,123 @@
+from builtins import classmethod, int, len, set, str
+import logging
+from typing import Optional
+from sqlalchemy import delete, exists, func, lambda_stmt, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.dependencies import get_settings
+from app.models.nickname_pool_model import NicknamePool
+from app.models.user_model import User
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+from app.utils.nickname_gen import ADJECTIVES, ANIMALS, generate_nickname_batch, load_word_list
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# DELETE ... RETURNING on one row picked with SKIP LOCKED, so concurrent
+# signups never wait on each other or receive the same nickname. The claim is
+# part of the signup transaction and is undone if that transaction rolls back.
+# Names a user took after they were pooled (by hand, or as a fallback racing a
+# refill) are skipped rather than handed out a second time.
+CLAIM_NICKNAME_QUERY = (
+    delete(NicknamePool)
+    .execution_options(synchronize_session=False)
+    .where(
+        NicknamePool.nickname == select(NicknamePool.nickname)
+        .where(~exists().where(User.nickname == NicknamePool.nickname))
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    .returning(NicknamePool.nickname)
+)
+# Names a user took after they were pooled can never be claimed; left in
+# place they would count towards the pool depth and keep refills from running.
+PURGE_TAKEN_NICKNAMES_QUERY = (
+    delete(NicknamePool)
+    .execution_options(synchronize_session=False)
+    .where(exists().where(User.nickname == NicknamePool.nickname))
+)
+POOL_DEPTH_QUERY = select(func.count()).select_from(NicknamePool)
+INSERT_NICKNAMES_QUERY = (
+    insert(NicknamePool.__table__)
+    .on_conflict_do_nothing(index_elements=["nickname"])
+    .returning(NicknamePool.__table__.c.nickname)
+)
+
+
+class NicknamePoolService:
+    @classmethod
+    async def claim(cls, session: AsyncSession) -> Optional[str]:
+        """Take one nickname out of the pool, or return None if it is empty."""
+        result = await session.execute(CLAIM_NICKNAME_QUERY)
+        nickname = result.scalar_one_or_none()
+        if nickname is None:
+            Metrics.increment("nickname_pool_empty")
+            nickname_pool_refiller.trigger()
+        else:
+            Metrics.increment("nickname_pool_claims")
+        return nickname
+
+    @classmethod
+    async def depth(cls, session: AsyncSession) -> int:
+        result = await session.execute(POOL_DEPTH_QUERY)
+        depth = result.scalar()
+        Metrics.set_gauge("nickname_pool_depth", depth)
+        return depth
+
+    @classmethod
+    async def purge_taken(cls, session: AsyncSession) -> int:
+        """Delete pooled nicknames that a user has taken since; returns how many were removed."""
+        result = await session.execute(PURGE_TAKEN_NICKNAMES_QUERY)
+        await session.commit()
+        if result.rowcount:
+            Metrics.increment("nickname_pool_purged", result.rowcount)
+        return result.rowcount
+
+    @classmethod
+    async def refill(cls, session: AsyncSession, count: int) -> int:
+        """
+        Add up to ``count`` freshly generated nicknames that no user has taken.
+
+        Returns the number of rows actually inserted; candidates already in
+        the pool are skipped by ON CONFLICT DO NOTHING.
+        """
+        adjectives = load_word_list(settings.nickname_adjectives_file, ADJECTIVES)
+        animals = load_word_list(settings.nickname_animals_file, ANIMALS)
+        candidates = generate_nickname_batch(count, adjectives, animals, settings.nickname_max_number)
+        query = lambda_stmt(lambda: select(User.nickname).where(User.nickname.in_(candidates)))
+        taken = set((await session.execute(query)).scalars())
+        rows = [{"nickname": nickname} for nickname in candidates if nickname not in taken]
+        if not rows:
+            return 0
+        result = await session.execute(INSERT_NICKNAMES_QUERY, rows)
+        inserted = len(result.all())
+        await session.commit()
+        Metrics.increment("nickname_pool_refilled", inserted)
+        return inserted
+
+    @classmethod
+    async def refill_if_low(cls):
+        """Top the pool up to its target size once it drops below the low watermark."""
+        async with Database.get_session_factory()() as session:
+            await cls.purge_taken(session)
+            depth = await cls.depth(session)
+            if depth >= settings.nickname_pool_low_watermark:
+                return
+            missing = settings.nickname_pool_target_size - depth
+            while missing > 0:
+                inserted = await cls.refill(session, min(missing, settings.nickname_pool_refill_batch_size))
+                if inserted == 0:
+                    break
+                missing -= inserted
+            depth = await cls.depth(session)
+            logger.info(f"Nickname pool refilled to {depth} entries.")
+
+
+nickname_pool_refiller = PeriodicTask(
+    "nickname-pool-refill",
+    settings.nickname_pool_refill_interval_seconds,
+    NicknamePoolService.refill_if_low,
+)
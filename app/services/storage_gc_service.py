@@ -0,0 +1,286 @@
+from builtins import bool, classmethod, dict, float, int, len, list, set, str, sum
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy import ARRAY, Interval, String, any_, bindparam, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.dependencies import get_settings
+from app.models.avatar_blob_model import AvatarBlob
+from app.models.storage_gc_model import StorageGCRun, StorageGCStatus
+from app.models.user_model import User
+from app.storage import ObjectInfo, get_storage
+from app.utils.background import PeriodicTask
+from app.utils.metrics import Metrics
+from app.utils.minio_client import run_blocking
+from app.utils.rate_limiter import RateLimiter
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# The object names garbage collection knows how to attribute: a user's own
+# pictures (``<user_id>_...``) and shared avatar blobs with their renditions
+# (``avatar_<digest>.jpg``, ``avatar_<digest>_<size>.<ext>``). Anything else,
+# such as the default picture, is never collected.
+_USER_OBJECT = re.compile(r"([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_.+")
+_BLOB_OBJECT = re.compile(r"avatar_([0-9a-f]{64})(?:_\d+)?\.[a-z]+")
+
+# Batches are looked up with ``= ANY(:array)`` rather than ``IN (...)``, so
+# every batch runs the same statement whatever its size.
+USER_PICTURES_QUERY = (
+    select(User.id, User.profile_picture_url)
+    .where(User.id == any_(bindparam("ids", type_=ARRAY(PostgresUUID(as_uuid=True)))))
+)
+_RECENTLY_RELEASED = (
+    func.coalesce(AvatarBlob.released_at, AvatarBlob.created_at) > func.now() - bindparam("grace", type_=Interval())
+)
+AVATAR_BLOBS_QUERY = (
+    select(AvatarBlob.digest, or_(AvatarBlob.refcount > 0, _RECENTLY_RELEASED).label("live"))
+    .where(AvatarBlob.digest == any_(bindparam("digests", type_=ARRAY(String))))
+)
+# Re-checks the count under the row lock: a blob re-acquired since it was
+# looked up is kept, and an upload acquiring it now waits for this
+# transaction, by which time its objects are gone and it stores them anew.
+DELETE_AVATAR_BLOBS_QUERY = (
+    delete(AvatarBlob)
+    .where(
+        AvatarBlob.digest == any_(bindparam("digests", type_=ARRAY(String))),
+        AvatarBlob.refcount == 0,
+        ~_RECENTLY_RELEASED,
+    )
+    .returning(AvatarBlob.digest)
+    .execution_options(synchronize_session=False)
+)
+
+# Same lease protocol as broadcast jobs: the oldest unfinished run nobody
+# holds a live lease on, resumed from its checkpoint.
+_CLAIMABLE_RUN = (
+    select(StorageGCRun.id)
+    .where(
+        StorageGCRun.status.in_([StorageGCStatus.PENDING, StorageGCStatus.RUNNING]),
+        or_(StorageGCRun.lease_expires_at.is_(None), StorageGCRun.lease_expires_at < func.now()),
+    )
+    .order_by(StorageGCRun.created_at)
+    .limit(1)
+    .with_for_update(skip_locked=True)
+    .scalar_subquery()
+)
+CLAIM_RUN_QUERY = (
+    update(StorageGCRun)
+    .where(StorageGCRun.id == _CLAIMABLE_RUN)
+    .values(
+        status=StorageGCStatus.RUNNING,
+        lease_expires_at=func.now() + bindparam("lease", type_=Interval()),
+        started_at=func.coalesce(StorageGCRun.started_at, func.now()),
+    )
+    .returning(StorageGCRun)
+    .execution_options(synchronize_session=False, populate_existing=True)
+)
+CHECKPOINT_QUERY = (
+    update(StorageGCRun)
+    .execution_options(synchronize_session=False)
+    .where(StorageGCRun.id == bindparam("run_id"), StorageGCRun.status == StorageGCStatus.RUNNING)
+    .values(
+        last_key=bindparam("last_key"),
+        scanned_count=StorageGCRun.scanned_count + bindparam("scanned", type_=StorageGCRun.scanned_count.type),
+        orphan_count=StorageGCRun.orphan_count + bindparam("orphans", type_=StorageGCRun.orphan_count.type),
+        orphan_bytes=StorageGCRun.orphan_bytes + bindparam("orphan_bytes", type_=StorageGCRun.orphan_bytes.type),
+        deleted_count=StorageGCRun.deleted_count + bindparam("deleted", type_=StorageGCRun.deleted_count.type),
+        failed_count=StorageGCRun.failed_count + bindparam("failed", type_=StorageGCRun.failed_count.type),
+        lease_expires_at=func.now() + bindparam("lease", type_=Interval()),
+    )
+    .returning(StorageGCRun.id)
+)
+
+
+def _take(objects: Iterator[ObjectInfo], count: int) -> List[ObjectInfo]:
+    return list(islice(objects, count))
+
+
+def _refers_to(profile_picture_url: Optional[str], name: str) -> bool:
+    """Whether ``name`` is the picture ``profile_picture_url`` names or one of its renditions."""
+    if not profile_picture_url:
+        return False
+    return name == profile_picture_url or name.startswith(os.path.splitext(profile_picture_url)[0] + "_")
+
+
+class StorageGCService:
+    """
+    Finds and removes stored objects no user refers to any more.
+
+    Objects younger than ``storage_gc_grace_seconds`` are never touched:
+    uploads write their objects before the transaction that points a user
+    at them commits, and those objects must survive until it does.
+    """
+
+    @classmethod
+    async def create_run(cls, session: AsyncSession, dry_run: bool = True, created_by: Optional[UUID] = None,
+                         rate_per_second: Optional[float] = None) -> StorageGCRun:
+        run = StorageGCRun(dry_run=dry_run, rate_per_second=rate_per_second, created_by=created_by)
+        session.add(run)
+        await session.commit()
+        await session.refresh(run)
+        storage_gc_runner.trigger()
+        return run
+
+    @classmethod
+    async def get_run(cls, session: AsyncSession, run_id: UUID) -> Optional[StorageGCRun]:
+        return await session.get(StorageGCRun, run_id, populate_existing=True)
+
+    @classmethod
+    async def cancel_run(cls, session: AsyncSession, run_id: UUID) -> Optional[StorageGCRun]:
+        """Cancel a pending or running sweep; the worker stops at its next checkpoint."""
+        run = await cls.get_run(session, run_id)
+        if run and run.status in (StorageGCStatus.PENDING, StorageGCStatus.RUNNING):
+            run.status = StorageGCStatus.CANCELLED
+            run.finished_at = func.now()
+            await session.commit()
+            await session.refresh(run)
+        return run
+
+    @classmethod
+    async def claim_run(cls, session: AsyncSession) -> Optional[StorageGCRun]:
+        result = await session.execute(CLAIM_RUN_QUERY, {"lease": timedelta(seconds=settings.storage_gc_lease_seconds)})
+        run = result.scalar_one_or_none()
+        await session.commit()
+        return run
+
+    @classmethod
+    async def find_orphans(cls, session: AsyncSession, objects: Sequence[ObjectInfo], grace: timedelta,
+                           dry_run: bool = True) -> List[ObjectInfo]:
+        """
+        Return the objects in ``objects`` nothing refers to.
+
+        A user's own object is an orphan once the user is gone or points at
+        another picture. A blob's objects are orphans once its row is gone or
+        it has had no references for the grace period; unless ``dry_run``,
+        such rows are deleted here, in the caller's transaction, which must
+        remove the objects before it commits.
+        """
+        cutoff = datetime.now(timezone.utc) - grace
+        users: Dict[UUID, List[ObjectInfo]] = {}
+        blobs: Dict[str, List[ObjectInfo]] = {}
+        for info in objects:
+            if info.last_modified is None or info.last_modified > cutoff:
+                continue
+            match = _USER_OBJECT.fullmatch(info.name)
+            if match:
+                users.setdefault(UUID(match.group(1)), []).append(info)
+                continue
+            match = _BLOB_OBJECT.fullmatch(info.name)
+            if match:
+                blobs.setdefault(match.group(1), []).append(info)
+
+        orphans = []
+        if users:
+            pictures = dict((await session.execute(USER_PICTURES_QUERY, {"ids": list(users)})).all())
+            for user_id, infos in users.items():
+                orphans.extend(info for info in infos if not _refers_to(pictures.get(user_id), info.name))
+        if blobs:
+            rows = dict((await session.execute(AVATAR_BLOBS_QUERY, {"digests": list(blobs), "grace": grace})).all())
+            unreferenced = [digest for digest, live in rows.items() if not live]
+            if unreferenced and not dry_run:
+                result = await session.execute(DELETE_AVATAR_BLOBS_QUERY, {"digests": unreferenced, "grace": grace})
+                unreferenced = result.scalars().all()
+            # Objects with no row at all are left over from uploads that rolled
+            # back. Unlike rows they cannot be locked, so an upload of the very
+            # same file between this listing and the delete would lose them.
+            for digest in set(blobs).difference(rows).union(unreferenced):
+                orphans.extend(blobs[digest])
+        return orphans
+
+    @classmethod
+    async def run(cls, session: AsyncSession, run: StorageGCRun) -> StorageGCStatus:
+        """
+        Sweep the bucket for a claimed run, from its checkpoint to the last object.
+
+        The listing is consumed one batch at a time, so memory use does not
+        grow with the bucket. Each batch is paced by the run's rate limit,
+        checked against the database, its orphans removed with one bulk
+        delete, and checkpointed; a batch interrupted before its checkpoint is
+        examined again when the run resumes.
+        """
+        storage = get_storage()
+        limiter = RateLimiter(run.rate_per_second or settings.storage_gc_rate_per_second)
+        lease = timedelta(seconds=settings.storage_gc_lease_seconds)
+        grace = timedelta(seconds=settings.storage_gc_grace_seconds)
+        objects = storage.list_objects(run.last_key)
+        while True:
+            batch = await run_blocking(_take, objects, settings.storage_gc_batch_size)
+            if not batch:
+                break
+            await limiter.acquire(len(batch))
+            orphans = await cls.find_orphans(session, batch, grace, run.dry_run)
+            failed = []
+            if run.dry_run:
+                for info in orphans:
+                    logger.debug(f"Storage GC dry run {run.id} would remove {info.name} ({info.size} bytes).")
+            elif orphans:
+                failed = await run_blocking(storage.delete_many, [info.name for info in orphans])
+            deleted = 0 if run.dry_run else len(orphans) - len(failed)
+            result = await session.execute(CHECKPOINT_QUERY, {
+                "run_id": run.id, "last_key": batch[-1].name, "scanned": len(batch), "orphans": len(orphans),
+                "orphan_bytes": sum(info.size for info in orphans), "deleted": deleted, "failed": len(failed),
+                "lease": lease,
+            })
+            checkpointed = result.scalar_one_or_none()
+            await session.commit()
+            Metrics.increment("storage_gc_objects_scanned", len(batch))
+            Metrics.increment("storage_gc_objects_deleted", deleted)
+            if checkpointed is None:
+                logger.info(f"Storage GC {run.id} stopped: no longer running.")
+                return StorageGCStatus.CANCELLED
+        await cls.finish_run(session, run.id, StorageGCStatus.COMPLETED)
+        return StorageGCStatus.COMPLETED
+
+    @classmethod
+    async def finish_run(cls, session: AsyncSession, run_id: UUID, status: StorageGCStatus, error: Optional[str] = None):
+        query = (
+            update(StorageGCRun)
+            .where(StorageGCRun.id == run_id, StorageGCRun.status == StorageGCStatus.RUNNING)
+            .values(status=status, finished_at=func.now(), lease_expires_at=None, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(query)
+        await session.commit()
+
+
+async def run_storage_gc():
+    """Run claimable garbage collection sweeps one after another until none are left."""
+    async with Database.get_session_factory()() as session:
+        while True:
+            run = await StorageGCService.claim_run(session)
+            if run is None:
+                return
+            mode = "dry run" if run.dry_run else "sweep"
+            logger.info(f"Running storage GC {mode} {run.id} from checkpoint {run.last_key!r}.")
+            # An error leaves the run RUNNING; it resumes from its checkpoint
+            # once the lease expires.
+            try:
+                status = await StorageGCService.run(session, run)
+            except asyncio.CancelledError:
+                # Shutting down: hand the run back so another worker resumes it right away.
+                await session.rollback()
+                await session.execute(
+                    update(StorageGCRun).where(StorageGCRun.id == run.id).values(lease_expires_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+                raise
+            run = await StorageGCService.get_run(session, run.id)
+            logger.info(f"Storage GC {mode} {run.id} {status.name.lower()}: {run.orphan_count} of {run.scanned_count} "
+                        f"objects orphaned ({run.orphan_bytes} bytes), {run.deleted_count} removed, "
+                        f"{run.failed_count} failed.")
+
+
+storage_gc_runner = PeriodicTask(
+    "storage-gc-runner",
+    settings.storage_gc_poll_interval_seconds,
+    run_storage_gc,
+)
@@ -0,0 +1,85 @@
+"""
+Raw asyncpg fast path for the login hot queries.
+
+Login and the account-lock check only need a handful of columns, but the ORM
+path builds a full ``User`` instance, registers it in the identity map and
+instruments every attribute. When ``settings.user_fast_path_enabled`` is on,
+``UserService`` reads those rows straight from the session's asyncpg
+connection into a ``UserRecord`` and writes the outcome back with a single
+UPDATE by primary key.
+"""
+from builtins import bool, int, str
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user_model import User, UserRole
+
+USER_RECORD_BY_EMAIL_SQL = (
+    "SELECT id, email, nickname, role, hashed_password, email_verified, "
+    "is_locked, failed_login_attempts, last_login_at "
+    "FROM users WHERE email = $1"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    """Read-only subset of a user row used by the login path."""
+    id: UUID
+    email: str
+    nickname: str
+    role: UserRole
+    hashed_password: str
+    email_verified: bool
+    is_locked: bool
+    failed_login_attempts: int
+    last_login_at: Optional[datetime]
+
+
+def is_available(session: AsyncSession) -> bool:
+    """Return True if the session is bound to an asyncpg engine."""
+    bind = session.bind
+    return bind is not None and bind.dialect.driver == "asyncpg"
+
+
+async def fetch_user_record(session: AsyncSession, email: str) -> Optional[UserRecord]:
+    """Fetch the login columns for ``email`` on the session's own connection."""
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    row = await raw_connection.driver_connection.fetchrow(USER_RECORD_BY_EMAIL_SQL, email)
+    if row is None:
+        return None
+    return UserRecord(
+        id=row["id"],
+        email=row["email"],
+        nickname=row["nickname"],
+        role=UserRole(row["role"]),
+        hashed_password=row["hashed_password"],
+        email_verified=row["email_verified"],
+        is_locked=row["is_locked"],
+        failed_login_attempts=row["failed_login_attempts"],
+        last_login_at=row["last_login_at"],
+    )
+
+
+async def record_login_success(session: AsyncSession, record: UserRecord) -> UserRecord:
+    """Reset the failure counter and stamp ``last_login_at`` for ``record``."""
+    now = datetime.now(timezone.utc)
+    await session.execute(
+        update(User).where(User.id == record.id).values(failed_login_attempts=0, last_login_at=now)
+    )
+    await session.commit()
+    return replace(record, failed_login_attempts=0, last_login_at=now)
+
+
+async def record_login_failure(session: AsyncSession, record: UserRecord, max_login_attempts: int):
+    """Increment the failure counter and lock the account once it reaches the limit."""
+    await session.execute(
+        update(User).where(User.id == record.id).values(
+            failed_login_attempts=User.failed_login_attempts + 1,
+            is_locked=or_(User.is_locked.is_(True), User.failed_login_attempts + 1 >= max_login_attempts),
+        )
+    )
+    await session.commit()
@@ -1,25 +1,44 @@
-from builtins import Exception, bool, classmethod, int, str
+from builtins import Exception, bool, classmethod, int, range, set, str
+from dataclasses import replace
 from datetime import datetime, timezone
 from fastapi import UploadFile, HTTPException
 import secrets
-from typing import Optional, Dict, List
+from typing import Awaitable, Callable, Optional, Dict, List, Tuple, Union
 from pydantic import ValidationError
-from sqlalchemy import func, null, update, select
+from sqlalchemy import func, lambda_stmt, null, union_all, update, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from app.dependencies import get_email_service, get_settings
+from app.models.nickname_pool_model import NicknamePool
 from app.models.user_model import User, UserRole
 from app.schemas.user_schemas import UserCreate, UserUpdate
-from app.utils.nickname_gen import generate_nickname
-from app.utils.security import generate_verification_token, hash_password, verify_password
-from app.utils.minio_client import save_image, get_image
-from uuid import UUID
+from app.utils.nickname_gen import ADJECTIVES, ANIMALS, generate_nickname_batch, load_word_list, nickname_with_suffix
+from app.utils.security import (
+    RESET_PASSWORD_PURPOSE, VERIFY_EMAIL_PURPOSE, generate_signed_token, generate_verification_token,
+    hash_password, read_signed_token, verify_password,
+)
+from uuid import UUID, uuid4
+from app.services.avatar_service import AvatarService
 from app.services.email_service import EmailService
+from app.services.email_outbox_service import wake_email_outbox_worker
+from app.services.last_login_buffer import last_login_buffer, last_login_flusher
+from app.services.login_event_service import login_event_recorder
+from app.services.nickname_pool_service import NicknamePoolService
+from app.services import user_fast_path
+from app.services.user_fast_path import UserRecord
 import logging
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Built once at import time; SQLAlchemy compiles it on first use and serves it
+# from the engine's compiled cache afterwards.
+COUNT_USERS_QUERY = select(func.count()).select_from(User)
+# Id-derived nicknames tried once every random batch is taken. They differ only
+# in the adjective and animal, so a few attempts are plenty.
+NICKNAME_SUFFIX_ATTEMPTS = 5
+
 class UserService:
     @classmethod
     async def _execute_query(cls, session: AsyncSession, query):
@@ -34,7 +53,17 @@ class UserService:
 
     @classmethod
     async def _fetch_user(cls, session: AsyncSession, **filters) -> Optional[User]:
-        query = select(User).filter_by(**filters)
+        # Lambda statements are cached by their code location, so the select()
+        # construct is only built and compiled once per filtered column; the
+        # filter values are extracted as bound parameters on every call.
+        # Several filters build a plain select(): lambdas created in a loop
+        # would all close over the loop variables' last values.
+        if len(filters) == 1:
+            (name, value), = filters.items()
+            column = getattr(User, name)
+            query = lambda_stmt(lambda: select(User).where(column == value))
+        else:
+            query = select(User).where(*(getattr(User, name) == value for name, value in filters.items()))
         result = await cls._execute_query(session, query)
         return result.scalars().first() if result else None
 
@@ -50,6 +79,48 @@ class UserService:
     async def get_by_email(cls, session: AsyncSession, email: str) -> Optional[User]:
         return await cls._fetch_user(session, email=email)
     
+    @classmethod
+    async def _allocate_nickname(cls, session: AsyncSession, user_id: UUID) -> Optional[str]:
+        """
+        Pick an unused nickname, claiming it from the nickname pool when enabled.
+
+        Without the pool, or when it is empty, each batch of candidates is
+        checked in one query. After ``nickname_max_batches`` batches without a
+        free candidate the nickname is derived from the user's id. Every
+        candidate, the id-derived ones included, must be unused by users and
+        absent from the pool, so a pooled nickname is never handed out twice;
+        None is returned if even the id-derived ones are all taken, and
+        ``create`` answers that with 503.
+        """
+        if settings.nickname_pool_enabled:
+            nickname = await NicknamePoolService.claim(session)
+            if nickname is not None:
+                return nickname
+        adjectives = load_word_list(settings.nickname_adjectives_file, ADJECTIVES)
+        animals = load_word_list(settings.nickname_animals_file, ANIMALS)
+        for _ in range(settings.nickname_max_batches):
+            candidates = generate_nickname_batch(settings.nickname_batch_size, adjectives, animals, settings.nickname_max_number)
+            nickname = await cls._first_unused_nickname(session, candidates)
+            if nickname is not None:
+                return nickname
+        logger.warning("No free nickname after %d batches, using id suffix.", settings.nickname_max_batches)
+        candidates = [nickname_with_suffix(user_id, adjectives, animals) for _ in range(NICKNAME_SUFFIX_ATTEMPTS)]
+        return await cls._first_unused_nickname(session, candidates)
+
+    @classmethod
+    async def _first_unused_nickname(cls, session: AsyncSession, candidates: List[str]) -> Optional[str]:
+        """Return the first candidate neither used by a user nor waiting in the nickname pool."""
+        query = union_all(
+            select(User.nickname).where(User.nickname.in_(candidates)),
+            select(NicknamePool.nickname).where(NicknamePool.nickname.in_(candidates)),
+        )
+        result = await session.execute(query)
+        taken = set(result.scalars())
+        for candidate in candidates:
+            if candidate not in taken:
+                return candidate
+        return None
+
     @classmethod
     async def create(cls, session: AsyncSession, user_data: Dict[str, str], email_service: EmailService) -> Optional[User]:
         try:
@@ -61,23 +132,30 @@ class UserService:
                 return None
             validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
             new_user = User(**validated_data)
-            new_nickname = generate_nickname()
-            while await cls.get_by_nickname(session, new_nickname):
-                new_nickname = generate_nickname()
-            new_user.nickname = new_nickname
+            new_user.id = uuid4()
+            new_user.nickname = await cls._allocate_nickname(session, new_user.id)
+            if new_user.nickname is None:
+                logger.error("No free nickname for the new user.")
+                raise HTTPException(status_code=503, detail="No nickname available, please try again later")
             new_user.profile_picture_url = profile_picture_url
             logger.info(f"User Role: {new_user.role}")
             user_count = await cls.count(session)
-            new_user.role = UserRole.ADMIN if user_count == 0 else UserRole.ANONYMOUS            
+            new_user.role = UserRole.ADMIN if user_count == 0 else UserRole.ANONYMOUS
+            new_user.token_version = 0
+            needs_verification = new_user.role != UserRole.ADMIN
+            if needs_verification and not settings.signed_tokens_enabled:
+                new_user.verification_token = generate_verification_token()
             session.add(new_user)
+            if needs_verification and settings.email_outbox_enabled:
+                # Queued in the signup transaction; delivery happens in the background.
+                await email_service.enqueue_verification_email(session, new_user)
             await session.commit()
             await session.refresh(new_user)
             if new_user.role == UserRole.ADMIN:
                 new_user.email_verified = True
-
+            elif settings.email_outbox_enabled:
+                wake_email_outbox_worker()
             else:
-                new_user.verification_token = generate_verification_token()
-                await session.commit()
                 await email_service.send_verification_email(new_user)
 
             return new_user
@@ -113,13 +191,14 @@ class UserService:
         if not user:
             logger.info(f"User with ID {user_id} not found.")
             return False
+        await AvatarService.release(session, user.profile_picture_url)
         await session.delete(user)
         await session.commit()
         return True
 
     @classmethod
     async def list_users(cls, session: AsyncSession, skip: int = 0, limit: int = 10) -> List[User]:
-        query = select(User).offset(skip).limit(limit)
+        query = lambda_stmt(lambda: select(User).offset(skip).limit(limit))
         result = await cls._execute_query(session, query)
         return result.scalars().all() if result else []
 
@@ -129,16 +208,64 @@ class UserService:
     
 
     @classmethod
-    async def login_user(cls, session: AsyncSession, email: str, password: str) -> Optional[User]:
-        user = await cls.get_by_email(session, email)
+    async def _get_login_user(cls, session: AsyncSession, email: str) -> Optional[Union[User, UserRecord]]:
+        """Fetch the user for the login path, through the asyncpg fast path when enabled."""
+        if settings.user_fast_path_enabled and user_fast_path.is_available(session):
+            return await user_fast_path.fetch_user_record(session, email)
+        return await cls.get_by_email(session, email)
+
+    @classmethod
+    def _buffer_last_login(cls, user: Union[User, UserRecord], logged_in_at: datetime) -> bool:
+        """
+        Queue the ``last_login_at`` write for the background flusher.
+
+        Only done when the failure counter is already zero, since resetting it
+        must stay synchronous; returns False when the caller has to write now.
+        """
+        if not settings.last_login_buffered or not last_login_flusher.running:
+            return False
+        if user.failed_login_attempts:
+            return False
+        return last_login_buffer.add(user.id, logged_in_at)
+
+    @classmethod
+    async def login_user(cls, session: AsyncSession, email: str, password: str, client_ip: Optional[str] = None,
+                         user_agent: Optional[str] = None) -> Optional[Union[User, UserRecord]]:
+        user = await cls._get_login_user(session, email)
+        logged_in_user = await cls._check_credentials(session, user, password)
+        if settings.login_events_enabled:
+            login_event_recorder.record(
+                email=email,
+                success=logged_in_user is not None,
+                user_id=user.id if user else None,
+                ip_address=client_ip,
+                user_agent=user_agent,
+            )
+        return logged_in_user
+
+    @classmethod
+    async def _check_credentials(cls, session: AsyncSession, user: Optional[Union[User, UserRecord]],
+                                 password: str) -> Optional[Union[User, UserRecord]]:
         if user:
             if user.email_verified is False:
                 return None
             if user.is_locked:
                 return None
+            if isinstance(user, UserRecord):
+                if verify_password(password, user.hashed_password):
+                    logged_in_at = datetime.now(timezone.utc)
+                    if cls._buffer_last_login(user, logged_in_at):
+                        return replace(user, last_login_at=logged_in_at)
+                    return await user_fast_path.record_login_success(session, user)
+                await user_fast_path.record_login_failure(session, user, settings.max_login_attempts)
+                return None
             if verify_password(password, user.hashed_password):
+                logged_in_at = datetime.now(timezone.utc)
+                if cls._buffer_last_login(user, logged_in_at):
+                    set_committed_value(user, "last_login_at", logged_in_at)
+                    return user
                 user.failed_login_attempts = 0
-                user.last_login_at = datetime.now(timezone.utc)
+                user.last_login_at = logged_in_at
                 session.add(user)
                 await session.commit()
                 return user
@@ -152,7 +279,7 @@ class UserService:
 
     @classmethod
     async def is_account_locked(cls, session: AsyncSession, email: str) -> bool:
-        user = await cls.get_by_email(session, email)
+        user = await cls._get_login_user(session, email)
         return user.is_locked if user else False
 
 
@@ -169,8 +296,54 @@ class UserService:
             return True
         return False
 
+    @classmethod
+    def create_password_reset_token(cls, user: User) -> str:
+        """Issue a signed password reset token; it is revoked by any later reset or verification."""
+        return generate_signed_token(
+            settings.secret_key, RESET_PASSWORD_PURPOSE, user.id, user.token_version,
+            settings.password_reset_token_expire_minutes * 60,
+        )
+
+    @classmethod
+    async def _consume_signed_token(cls, session: AsyncSession, purpose: str, token: str,
+                                    user_id: Optional[UUID] = None, **values) -> bool:
+        """
+        Apply ``values`` to the token's user if the token is still current.
+
+        Forged, expired or mismatched tokens are rejected without a query.
+        Otherwise a single UPDATE matches the token version and bumps it, so
+        the token, and every other one issued before it, can be used once.
+        """
+        claims = read_signed_token(settings.secret_key, purpose, token)
+        if claims is None or (user_id is not None and claims.user_id != user_id):
+            return False
+        query = (
+            update(User)
+            .where(User.id == claims.user_id, User.token_version == claims.version)
+            .values(token_version=User.token_version + 1, **values)
+            .returning(User.id)
+        )
+        result = await cls._execute_query(session, query)
+        return result is not None and result.first() is not None
+
+    @classmethod
+    async def reset_password_with_token(cls, session: AsyncSession, token: str, new_password: str) -> bool:
+        # Reject bad tokens before paying for the bcrypt hash.
+        if read_signed_token(settings.secret_key, RESET_PASSWORD_PURPOSE, token) is None:
+            return False
+        return await cls._consume_signed_token(
+            session, RESET_PASSWORD_PURPOSE, token,
+            hashed_password=hash_password(new_password), failed_login_attempts=0, is_locked=False,
+        )
+
     @classmethod
     async def verify_email_with_token(cls, session: AsyncSession, user_id: UUID, token: str) -> bool:
+        if "." in token:
+            # Signed tokens; stored tokens are URL-safe base64 and never contain a dot.
+            return await cls._consume_signed_token(
+                session, VERIFY_EMAIL_PURPOSE, token, user_id,
+                email_verified=True, verification_token=None, role=UserRole.AUTHENTICATED,
+            )
         user = await cls.get_by_id(session, user_id)
         if user and user.verification_token == token:
             user.email_verified = True
@@ -189,8 +362,7 @@ class UserService:
         :param session: The AsyncSession instance for database access.
         :return: The count of users.
         """
-        query = select(func.count()).select_from(User)
-        result = await session.execute(query)
+        result = await session.execute(COUNT_USERS_QUERY)
         count = result.scalar()
         return count
     
@@ -206,7 +378,15 @@ class UserService:
         return False
     
     @staticmethod
-    async def update_profile_picture(db: AsyncSession, user_id: UUID, file_data: bytes, file_name: str):
+    async def update_profile_picture(db: AsyncSession, user_id: UUID, digest: str,
+                                     render: Callable[[], Awaitable[Dict[Tuple[int, str], bytes]]]):
+        """
+        Point the user at the shared picture for an upload with SHA-256 ``digest``.
+
+        ``render`` produces the renditions, keyed by ``(size, format)``; it is
+        only called when no user has uploaded the same file before. The user's
+        previous picture loses a reference in the same transaction.
+        """
         stmt = select(User).where(User.id == user_id)
         result = await db.execute(stmt)
         user = result.scalar_one_or_none()
@@ -214,21 +394,9 @@ class UserService:
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
     
-        profile_picture_url = await save_image(file_data, file_name)
-    
-        user.profile_picture_url = profile_picture_url
+        user.profile_picture_url = await AvatarService.replace(db, user.profile_picture_url, digest, render)
         db.add(user)
         await db.commit()
         await db.refresh(user)
     
         return user
-
-    @staticmethod
-    async def get_profile_picture(db: AsyncSession, user_id: UUID):
-        user = await db.execute(select(User).where(User.id == user_id))
-        user = user.scalars().first()
-        if not user or not user.profile_picture_url:
-            raise HTTPException(status_code=404, detail="Profile picture not found")
-        
-        image_stream = get_image(user.profile_picture_url)
-        return image_stream
\ No newline at end of file
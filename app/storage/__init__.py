@@ -0,0 +1,44 @@
+"""
+Blob storage behind a common interface, selected by ``settings.storage_backend``:
+
+- ``minio``: MinIO or another S3-compatible object store (the default);
+- ``filesystem``: a directory under ``settings.storage_root``, for single-node deployments;
+- ``memory``: a per-process dict, for tests and benchmarks.
+"""
+from typing import Optional
+from settings.config import Settings, settings
+from app.storage.base import (
+    FileObjectReader, InvalidRangeError, ObjectInfo, ObjectNotFoundError, ObjectReader, StorageBackend, StorageError,
+    parse_byte_range,
+)
+from app.storage.filesystem import FilesystemStorage
+from app.storage.memory import MemoryStorage
+from app.storage.minio_storage import BUCKET_NAME, MinioStorage, create_minio_client
+
+
+def create_storage(settings: Settings) -> StorageBackend:
+    if settings.storage_backend == "minio":
+        return MinioStorage(settings)
+    if settings.storage_backend == "filesystem":
+        return FilesystemStorage(settings.storage_root)
+    if settings.storage_backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend!r}")
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend configured from settings."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage(settings)
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]):
+    """Replace the process-wide backend, e.g. with a ``MemoryStorage`` in tests; None reverts to settings."""
+    global _storage
+    _storage = storage
+
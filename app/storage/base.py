@@ -0,0 +1,183 @@
+"""
+The interface every storage backend implements.
+
+Backends are blocking, like the MinIO SDK they started from; callers on the
+event loop run them through ``app.utils.minio_client.run_blocking``. Errors
+are reported with the backend-neutral exceptions below, so callers never see
+``S3Error`` or ``OSError`` for an ordinary missing object.
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class StorageError(Exception):
+    """Base class for storage failures."""
+
+
+class ObjectNotFoundError(StorageError):
+    def __init__(self, name: str):
+        super().__init__(f"No such object: {name}")
+        self.name = name
+
+
+class InvalidRangeError(StorageError):
+    """A ``Range`` header that cannot be satisfied for an object of ``size`` bytes."""
+
+    def __init__(self, name: str, size: int):
+        super().__init__(f"Range not satisfiable for {name} ({size} bytes)")
+        self.name = name
+        self.size = size
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """Metadata of a stored object; ``etag`` is unquoted, as MinIO reports it."""
+    name: str
+    size: int
+    etag: str
+    content_type: str = "application/octet-stream"
+    last_modified: Optional[datetime] = None
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": self.content_type, "Content-Length": str(self.size), "ETag": f'"{self.etag}"'}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+def parse_byte_range(header: str, name: str, size: int) -> Tuple[int, int]:
+    """
+    Resolve a single ``bytes=`` range against an object's size, as inclusive ``(start, end)``.
+
+    Raises ``InvalidRangeError`` when the range starts past the end or is malformed.
+    """
+    match = _BYTE_RANGE.fullmatch(header.strip())
+    if not match or match.groups() == ("", ""):
+        raise InvalidRangeError(name, size)
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise InvalidRangeError(name, size)
+    return start, end
+
+
+class ObjectReader:
+    """
+    An open object, or the requested range of it, read sequentially.
+
+    ``status`` is 206 for a range and 200 otherwise; ``headers`` carries
+    Content-Type, Content-Length, ETag, Last-Modified and, for a range,
+    Content-Range. ``close()`` must be called once reading is done.
+    """
+    status: int
+    headers: Dict[str, str]
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class FileObjectReader(ObjectReader):
+    """An ``ObjectReader`` over a seekable file object, for backends that hold objects locally."""
+
+    def __init__(self, file: BinaryIO, info: ObjectInfo, byte_range: Optional[str] = None):
+        self._file = file
+        self.headers = info.headers()
+        self.status = 200
+        self._remaining = info.size
+        if byte_range:
+            try:
+                start, end = parse_byte_range(byte_range, info.name, info.size)
+            except InvalidRangeError:
+                file.close()
+                raise
+            file.seek(start)
+            self._remaining = end - start + 1
+            self.status = 206
+            self.headers["Content-Length"] = str(self._remaining)
+            self.headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        amt = self._remaining if amt is None else min(amt, self._remaining)
+        data = self._file.read(amt)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class StorageBackend:
+    """
+    Where profile pictures and other blobs are kept, addressed by flat object names.
+
+    Subclasses implement ``put``, ``open``, ``stat``, ``delete`` and
+    ``list_objects``; the rest have defaults built on those.
+    """
+    # Whether presigned_url() returns URLs clients can download from directly.
+    can_presign = False
+
+    def setup(self):
+        """Prepare the backend (create the bucket or directory); called once at startup."""
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        raise NotImplementedError
+
+    def put_file(self, name: str, path: str, content_type: str = "application/octet-stream") -> ObjectInfo:
+        with open(path, "rb") as file:
+            return self.put(name, file.read(), content_type)
+
+    def open(self, name: str, byte_range: Optional[str] = None) -> ObjectReader:
+        """Open ``name`` for reading; raises ``ObjectNotFoundError`` or ``InvalidRangeError``."""
+        raise NotImplementedError
+
+    def read(self, name: str) -> bytes:
+        reader = self.open(name)
+        try:
+            return reader.read()
+        finally:
+            reader.close()
+
+    def stat(self, name: str) -> ObjectInfo:
+        """Return ``name``'s metadata; raises ``ObjectNotFoundError``."""
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.stat(name)
+        except ObjectNotFoundError:
+            return False
+        return True
+
+    def delete(self, name: str):
+        """Remove ``name``; removing a missing object is not an error."""
+        raise NotImplementedError
+
+    def delete_many(self, names: List[str]) -> List[str]:
+        """Remove several objects at once; returns the names that could not be removed."""
+        for name in names:
+            self.delete(name)
+        return []
+
+    def list_objects(self, start_after: Optional[str] = None) -> Iterator[ObjectInfo]:
+        """
+        Yield every object in name order, starting after ``start_after``.
+
+        Listing is lazy where the backend allows it, so a caller can stop,
+        remember the last name and resume from it later.
+        """
+        raise NotImplementedError
+
+    def presigned_url(self, name: str, expires: timedelta) -> Optional[str]:
+        """A URL clients can download ``name`` from directly, or None when the backend cannot sign one."""
+        return None
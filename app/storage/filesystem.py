@@ -0,0 +1,90 @@
+"""
+Local-filesystem storage, for single-node deployments without an object store.
+
+Objects are spread over two levels of directories named after a hash of the
+object name (``ab/cd/<name>``), so no directory grows past a few thousand
+entries. Writes go to a temporary file in the target directory that is
+fsynced and then renamed over the object, so readers see the old object or
+the new one, never a partial write. Content types are not stored; they
+are guessed from the name's extension.
+
+Listing walks every shard and sorts the names, so it holds all names in
+memory at once; that is fine at the scale this backend is meant for.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from app.storage.base import FileObjectReader, ObjectInfo, ObjectNotFoundError, ObjectReader, StorageBackend, StorageError
+
+_TEMP_PREFIX = ".tmp-"
+
+
+class FilesystemStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def setup(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        """Where ``name`` is kept on disk."""
+        if not name or name.startswith(".") or "/" in name or "\\" in name or "\0" in name:
+            raise StorageError(f"Invalid object name: {name!r}")
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], name)
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=_TEMP_PREFIX, delete=False) as file:
+            try:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            except BaseException:
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, path)
+        return self.stat(name)
+
+    def _info(self, name: str, stat: os.stat_result) -> ObjectInfo:
+        # Like nginx, derive the ETag from mtime and size rather than hashing the file on every stat.
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        return ObjectInfo(name, stat.st_size, f"{stat.st_mtime_ns:x}-{stat.st_size:x}", content_type, last_modified)
+
+    def open(self, name: str, byte_range: Optional[str] = None) -> ObjectReader:
+        try:
+            file = open(self.path(name), "rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError(name) from None
+        return FileObjectReader(file, self._info(name, os.fstat(file.fileno())), byte_range)
+
+    def stat(self, name: str) -> ObjectInfo:
+        try:
+            return self._info(name, os.stat(self.path(name)))
+        except FileNotFoundError:
+            raise ObjectNotFoundError(name) from None
+
+    def delete(self, name: str):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def list_objects(self, start_after: Optional[str] = None) -> Iterator[ObjectInfo]:
+        names = sorted(
+            name
+            for _, _, files in os.walk(self.root)
+            for name in files
+            if not name.startswith(_TEMP_PREFIX) and (start_after is None or name > start_after)
+        )
+        for name in names:
+            try:
+                yield self.stat(name)
+            except ObjectNotFoundError:
+                continue
@@ -0,0 +1,52 @@
+"""
+In-memory storage, for tests and for benchmarking the avatar pipeline without an object store.
+
+Objects live in a dict for the life of the process and are not shared
+between worker processes.
+"""
+import hashlib
+import io
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+from app.storage.base import FileObjectReader, ObjectInfo, ObjectNotFoundError, ObjectReader, StorageBackend
+
+
+class MemoryStorage(StorageBackend):
+    def __init__(self):
+        self._objects: Dict[str, Tuple[bytes, ObjectInfo]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        data = bytes(data)
+        info = ObjectInfo(name, len(data), hashlib.md5(data).hexdigest(), content_type,
+                          datetime.now(timezone.utc).replace(microsecond=0))
+        with self._lock:
+            self._objects[name] = (data, info)
+        return info
+
+    def _get(self, name: str) -> Tuple[bytes, ObjectInfo]:
+        with self._lock:
+            entry = self._objects.get(name)
+        if entry is None:
+            raise ObjectNotFoundError(name)
+        return entry
+
+    def open(self, name: str, byte_range: Optional[str] = None) -> ObjectReader:
+        data, info = self._get(name)
+        return FileObjectReader(io.BytesIO(data), info, byte_range)
+
+    def stat(self, name: str) -> ObjectInfo:
+        return self._get(name)[1]
+
+    def delete(self, name: str):
+        with self._lock:
+            self._objects.pop(name, None)
+
+    def list_objects(self, start_after: Optional[str] = None) -> Iterator[ObjectInfo]:
+        with self._lock:
+            infos = sorted((info for _, info in self._objects.values()), key=lambda info: info.name)
+        return (info for info in infos if start_after is None or info.name > start_after)
+
+    def __len__(self) -> int:
+        return len(self._objects)
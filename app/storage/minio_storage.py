@@ -0,0 +1,150 @@
+"""
+MinIO (or any S3-compatible) storage.
+
+The clients are created on first use rather than at import, so importing
+the application never needs MinIO credentials or a reachable endpoint.
+"""
+import io
+import os
+from datetime import timedelta
+from functools import cached_property
+from typing import Iterator, List, Optional
+import certifi
+import urllib3
+from minio import Minio
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from settings.config import Settings
+from app.storage.base import InvalidRangeError, ObjectInfo, ObjectNotFoundError, ObjectReader, StorageBackend
+
+BUCKET_NAME = "profile-pictures"
+
+
+def create_minio_client(settings: Settings, public: bool = False) -> Minio:
+    """
+    Build a MinIO client whose connection pool, timeouts and retries come from settings.
+
+    With ``public`` the client targets the endpoint browsers use, since a
+    presigned URL is only valid for the host it was signed for.
+    """
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=settings.minio_connect_timeout_seconds, read=settings.minio_read_timeout_seconds),
+        maxsize=settings.minio_max_connections,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=settings.minio_retries, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
+    endpoint, secure = settings.minio_endpoint, settings.minio_secure
+    if public:
+        endpoint = settings.minio_public_endpoint or endpoint
+        secure = secure if settings.minio_public_secure is None else settings.minio_public_secure
+    return Minio(
+        endpoint,
+        access_key=settings.minio_access_key,
+        secret_key=settings.minio_secret_key,
+        secure=secure,
+        region=settings.minio_region,
+        http_client=http_client,
+    )
+
+
+class MinioObjectReader(ObjectReader):
+    """A MinIO response; ``close()`` also returns its connection to the pool."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status
+        self.headers = {name: response.headers[name] for name in
+                        ("Content-Type", "Content-Length", "Content-Range", "ETag", "Last-Modified")
+                        if name in response.headers}
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._response.read(amt)
+
+    def close(self):
+        self._response.close()
+        self._response.release_conn()
+
+
+class MinioStorage(StorageBackend):
+    can_presign = True
+
+    def __init__(self, settings: Settings, bucket: str = BUCKET_NAME):
+        self.settings = settings
+        self.bucket = bucket
+
+    @cached_property
+    def client(self) -> Minio:
+        return create_minio_client(self.settings)
+
+    @cached_property
+    def presign_client(self) -> Minio:
+        # Only used to sign URLs, which is a local computation: with the region
+        # set it never opens a connection.
+        return create_minio_client(self.settings, public=True)
+
+    def setup(self):
+        """
+        Ensure the bucket exists in MinIO. Create it if it doesn't.
+
+        Called once at startup; uploads only call it again if MinIO reports the
+        bucket missing.
+        """
+        if not self.client.bucket_exists(self.bucket):
+            self.client.make_bucket(self.bucket)
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> ObjectInfo:
+        def put():
+            return self.client.put_object(self.bucket, name, data=io.BytesIO(data), length=len(data),
+                                          content_type=content_type)
+        try:
+            result = put()
+        except S3Error as e:
+            if e.code != "NoSuchBucket":
+                raise
+            self.setup()
+            result = put()
+        return ObjectInfo(name, len(data), getattr(result, "etag", None) or "", content_type)
+
+    def put_file(self, name: str, path: str, content_type: str = "application/octet-stream") -> ObjectInfo:
+        self.client.fput_object(self.bucket, name, path, content_type=content_type)
+        return self.stat(name)
+
+    def open(self, name: str, byte_range: Optional[str] = None) -> ObjectReader:
+        headers = {"Range": byte_range} if byte_range else None
+        try:
+            response = self.client.get_object(self.bucket, name, request_headers=headers)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                raise ObjectNotFoundError(name) from e
+            if e.code == "InvalidRange":
+                raise InvalidRangeError(name, self.stat(name).size) from e
+            raise
+        return MinioObjectReader(response)
+
+    def stat(self, name: str) -> ObjectInfo:
+        try:
+            stat = self.client.stat_object(self.bucket, name)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                raise ObjectNotFoundError(name) from e
+            raise
+        return ObjectInfo(name, stat.size, stat.etag, stat.content_type or "application/octet-stream", stat.last_modified)
+
+    def delete(self, name: str):
+        self.client.remove_object(self.bucket, name)
+
+    def delete_many(self, names: List[str]) -> List[str]:
+        # One DeleteObjects request per 1000 names; the errors iterator is
+        # lazy and must be consumed for the requests to be sent at all.
+        errors = self.client.remove_objects(self.bucket, [DeleteObject(name) for name in names])
+        return [error.name for error in errors]
+
+    def list_objects(self, start_after: Optional[str] = None) -> Iterator[ObjectInfo]:
+        # S3 lists keys in UTF-8 binary order, a page of up to 1000 at a time.
+        for item in self.client.list_objects(self.bucket, recursive=True, start_after=start_after):
+            yield ObjectInfo(item.object_name, item.size, (item.etag or "").strip('"'),
+                             item.content_type or "application/octet-stream", item.last_modified)
+
+    def presigned_url(self, name: str, expires: timedelta) -> Optional[str]:
+        return self.presign_client.presigned_get_object(self.bucket, name, expires=expires)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from builtins import Exception, bool, float, str
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs an async callable every ``interval`` seconds on the event loop.
+
+    Used for the application's background maintenance jobs. Exceptions raised
+    by the callable are logged and the loop keeps running; ``trigger()`` wakes
+    the loop early, and ``stop()`` can run the callable one last time so
+    buffered work is not lost on shutdown.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]], run_on_stop: bool = False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_stop = run_on_stop
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the loop on the running event loop; calling it twice is a no-op."""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=self.name)
+        logger.info(f"Started background task {self.name}")
+
+    def trigger(self):
+        """Run the callable as soon as possible instead of waiting for the interval."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        """Cancel the loop and, if configured, run the callable a final time."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info(f"Stopped background task {self.name}")
+        if self.run_on_stop:
+            await self._run_once()
+
+    async def _run_once(self):
+        try:
+            await self.func()
+        except Exception as e:
+            logger.error(f"Background task {self.name} failed: {e}")
+
+    async def _run(self):
+        while True:
+            await self._run_once()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
@@ -0,0 +1,104 @@
+"""
+Profile picture decoding and resizing, run in a process pool.
+
+Decoding and re-encoding a photo is CPU-bound and holds the GIL, so even a
+thread would slow the event loop down; worker processes keep it free.
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple, Union
+from PIL import Image, UnidentifiedImageError
+from settings.config import settings
+
+PROFILE_PICTURE_SIZE = (236, 236)
+# Pillow encoder names and the content types they are served with.
+RENDITION_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+class InvalidImageError(ValueError):
+    """The upload is not an image Pillow can decode, or it is too large to decode safely."""
+
+
+def render_renditions(file_data: Union[bytes, str], sizes: Sequence[int], formats: Sequence[str],
+                      max_pixels: int = 40_000_000) -> Dict[Tuple[int, str], bytes]:
+    """
+    Decode an upload once and encode a square RGB rendition for every size and format.
+
+    ``file_data`` is the upload's bytes or the path of the temporary file it
+    was received into; a path is read by the worker itself, so the upload is
+    never copied into the worker's arguments.
+
+    Only the header is read before the pixel count is checked, so a
+    decompression bomb is rejected without being decoded. JPEG ``draft`` mode
+    lets libjpeg decode at 1/2, 1/4 or 1/8 scale when that is still at least
+    the largest size, which skips most of the work for large photos.
+    """
+    largest = max(sizes)
+    try:
+        image = Image.open(io.BytesIO(file_data) if isinstance(file_data, bytes) else file_data)
+        if image.width * image.height > max_pixels:
+            raise InvalidImageError(f"Image has more than {max_pixels} pixels")
+        image.draft("RGB", (largest, largest))
+        image = image.convert("RGB")
+        renditions = {}
+        for size in sorted(set(sizes), reverse=True):
+            # Each smaller size is scaled from the previous one, not the original.
+            image = image.resize((size, size))
+            for format in formats:
+                buffer = io.BytesIO()
+                image.save(buffer, format=format.upper())
+                renditions[(size, format)] = buffer.getvalue()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise InvalidImageError("Invalid image format") from e
+    return renditions
+
+
+def process_profile_picture(file_data: Union[bytes, str], size: Tuple[int, int] = PROFILE_PICTURE_SIZE,
+                            max_pixels: int = 40_000_000) -> bytes:
+    """Decode an upload and return it as a single square RGB JPEG of ``size``."""
+    return render_renditions(file_data, [size[0]], ["jpeg"], max_pixels)[(size[0], "jpeg")]
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.image_process_workers)
+    return _executor
+
+
+async def _run(func, *args):
+    if settings.image_process_workers <= 0:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+async def resize_profile_picture(file_data: Union[bytes, str]) -> bytes:
+    """Run ``process_profile_picture`` in the process pool, or in a thread when the pool is disabled."""
+    return await _run(process_profile_picture, file_data, PROFILE_PICTURE_SIZE, settings.image_max_pixels)
+
+
+async def render_profile_picture(file_data: Union[bytes, str]) -> Dict[Tuple[int, str], bytes]:
+    """
+    Run ``render_renditions`` for the configured avatar sizes and formats, like ``resize_profile_picture``.
+
+    JPEG is always included: the largest JPEG is the picture the others are derived from.
+    """
+    formats = list(dict.fromkeys(["jpeg", *settings.avatar_rendition_formats]))
+    return await _run(render_renditions, file_data, settings.avatar_rendition_sizes, formats, settings.image_max_pixels)
+
+
+def shutdown_executor(wait: bool = False):
+    """
+    Stop the worker processes; the pool is recreated on the next upload.
+
+    Pass ``wait=True`` when the interpreter is about to exit, so the workers
+    are joined before their pipes are closed underneath them.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,30 @@
+from builtins import classmethod, dict, float, int, str
+from typing import Dict
+
+
+class Metrics:
+    """
+    Process-local counters and gauges.
+
+    Each worker process keeps its own values; they are exposed on the admin
+    ``/metrics/`` endpoint for dashboards and alerting to scrape.
+    """
+    _counters: Dict[str, int] = {}
+    _gauges: Dict[str, float] = {}
+
+    @classmethod
+    def increment(cls, name: str, amount: int = 1):
+        cls._counters[name] = cls._counters.get(name, 0) + amount
+
+    @classmethod
+    def set_gauge(cls, name: str, value: float):
+        cls._gauges[name] = value
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, float]]:
+        return {"counters": dict(cls._counters), "gauges": dict(cls._gauges)}
+
+    @classmethod
+    def reset(cls):
+        cls._counters.clear()
+        cls._gauges.clear()
@@ -1,65 +1,373 @@
-import io
+import asyncio
+import hashlib
 import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import AsyncIterator, Dict, Optional, Sequence, Tuple, Union
 from fastapi import UploadFile
-from minio import Minio
-from minio.error import S3Error
-
-minio_client = Minio(
-    "minio:9000",
-    access_key="minioadmin",
-    secret_key="minioadmin123",
-    secure=False
-)
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from settings.config import settings
+from app.storage import ObjectInfo, ObjectNotFoundError, ObjectReader, get_storage
+
 
-BUCKET_NAME = "profile-pictures"
 DEFAULT_IMAGE_NAME = "DefaultUser.jpg"
 DEFAULT_IMAGE_PATH = "settings/DefaultUser.jpg"
+STREAM_CHUNK_SIZE = 64 * 1024
+_SINGLE_BYTE_RANGE = re.compile(r"bytes=(\d+-\d*|-\d+)")
+_CONTENT_VERSION = re.compile(r"_([0-9a-f]{64}|[0-9a-f]{16})\.jpg$")
+_AVATAR_BLOB = re.compile(r"avatar_([0-9a-f]{64})\.jpg")
+
+# Storage backends are blocking (the minio SDK, file I/O), so every call made
+# from a request runs on this pool instead of the event loop. It is separate
+# from asyncio's default executor so slow storage cannot starve other
+# to_thread() users.
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.minio_thread_pool_size, thread_name_prefix="storage")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking storage call on the storage thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """Stop the storage thread pool; it is recreated on the next call."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def save_image(file_data: bytes, file_name: str, content_type: str = "image/jpeg") -> str:
+    await run_blocking(get_storage().put, file_name, file_data, content_type)
+    return f"{file_name}"
 
-def ensure_bucket():
+
+def avatar_blob_name(digest: str) -> str:
     """
-    Ensure the bucket exists in MinIO. Create it if it doesn't.
+    Name of the shared picture for an upload with SHA-256 ``digest``, e.g. ``avatar_<digest>.jpg``.
+
+    It carries no user id: everyone who uploads the same file gets the same
+    objects, tracked by an ``AvatarBlob`` row. Renditions follow ``rendition_name``.
     """
-    if not minio_client.bucket_exists(BUCKET_NAME):
-        minio_client.make_bucket(BUCKET_NAME)
+    return f"avatar_{digest}.jpg"
 
-async def save_image(file_data: bytes, file_name: str) -> str:
-    ensure_bucket()
-    minio_client.put_object(
-        BUCKET_NAME,
-        file_name,
-        data=io.BytesIO(file_data),
-        length=len(file_data),
-        content_type="image/jpeg"
-    )
-    return f"{file_name}"
 
-def get_image(file_name: str) -> io.BytesIO:
+def avatar_blob_digest(file_name: Optional[str]) -> Optional[str]:
+    """The digest in a name made by ``avatar_blob_name``, or None for any other name."""
+    match = _AVATAR_BLOB.fullmatch(file_name or "")
+    return match.group(1) if match else None
+
+
+def content_version(file_name: Optional[str]) -> Optional[str]:
+    """
+    Return the content hash embedded in an upload's name, or None for other names.
+
+    Both ``avatar_blob_name`` names and the older per-user
+    ``<user_id>_<hash>.jpg`` names, which existing rows may still hold, carry one.
+    """
+    match = _CONTENT_VERSION.search(file_name or "")
+    return match.group(1) if match else None
+
+
+def rendition_name(file_name: str, size: int, format: str, primary_size: int) -> str:
     """
-    Retrieve an image file from MinIO and return it as a byte stream.
+    Name of a stored rendition of ``file_name``, e.g. ``<user_id>_<hash>_32.webp``.
+
+    The primary rendition, a JPEG of ``primary_size``, is ``file_name`` itself.
     """
-    try:
-        image_data = minio_client.get_object(BUCKET_NAME, file_name)
-        return io.BytesIO(image_data.read())
-    except S3Error as e:
-        raise e
+    if size == primary_size and format == "jpeg":
+        return file_name
+    extension = "jpg" if format == "jpeg" else format
+    return f"{os.path.splitext(file_name)[0]}_{size}.{extension}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against a quoted ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in (c.removeprefix("W/") for c in candidates)
+
+
+def single_byte_range(header: Optional[str]) -> Optional[str]:
+    """
+    Return a ``Range`` header worth forwarding to storage, or None to serve the whole object.
+
+    Only a single ``bytes=`` range is honoured; multi-range and malformed
+    headers are ignored, which RFC 9110 allows.
+    """
+    if header and _SINGLE_BYTE_RANGE.fullmatch(header.strip()):
+        return header.strip()
+    return None
+
+
+class ImageStream:
+    """
+    An open stored object, read in fixed-size chunks off the event loop.
+
+    Memory use is one chunk regardless of the object's size. The reader (for
+    MinIO, a pooled connection) is released when the body is exhausted or, if
+    the client disconnects first, when the response's background task calls
+    ``close()``.
+    """
+
+    def __init__(self, reader: ObjectReader, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._reader = reader
+        self._closed = False
+        self.chunk_size = chunk_size
+        self.status_code = reader.status
+        self.media_type = reader.headers.get("Content-Type", "image/jpeg")
+        self.headers: Dict[str, str] = {"Accept-Ranges": "bytes"}
+        for name in ("Content-Length", "Content-Range", "ETag", "Last-Modified"):
+            if name in reader.headers:
+                self.headers[name] = reader.headers[name]
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await run_blocking(self._reader.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._reader.close()
+
+    async def read(self) -> bytes:
+        """Read the rest of the object at once and release the connection."""
+        try:
+            return await run_blocking(self._reader.read)
+        finally:
+            self.close()
+
+    def to_response(self) -> StreamingResponse:
+        return StreamingResponse(
+            self.chunks(),
+            status_code=self.status_code,
+            headers=self.headers,
+            media_type=self.media_type,
+            background=BackgroundTask(self.close),
+        )
+
+
+async def open_image(file_name: str, byte_range: Optional[str] = None) -> ImageStream:
+    """
+    Start reading an image from storage without buffering it.
+
+    With ``byte_range`` the stream has status 206 and the matching
+    ``Content-Range``. A missing image raises ``ObjectNotFoundError`` and an
+    unsatisfiable range ``InvalidRangeError``.
+    """
+    return ImageStream(await run_blocking(get_storage().open, file_name, byte_range))
+
+
+async def stat_image(file_name: str) -> ObjectInfo:
+    """Fetch an image's metadata (size, ETag, Last-Modified) without its body."""
+    return await run_blocking(get_storage().stat, file_name)
+
+
+class PresignedUrlCache:
+    """
+    Presigned GET URLs per object, reused until shortly before they expire.
+
+    An entry is re-signed once less than ``refresh`` seconds of its ``ttl``
+    remain, so a URL handed out always has at least that long to be used.
+    Names found missing by ``first_existing`` are remembered for ``ttl`` too.
+    """
+
+    def __init__(self, ttl: int = 900, refresh: int = 120, max_size: int = 10000):
+        self.ttl = ttl
+        self.refresh = refresh
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+
+    async def first_existing(self, file_names: Sequence[str]) -> Optional[Tuple[str, str, int]]:
+        """
+        Presign the first of ``file_names`` that exists in storage, like the streaming path's fallbacks.
+
+        Returns ``(file_name, url, max_age)``, or None when none exists. A
+        name is only looked up in storage the first time; a signed entry
+        proves it exists and a miss is remembered, so later requests cost
+        no round trip.
+        """
+        now = time.monotonic()
+        for file_name in file_names:
+            if file_name not in self._entries:
+                expires = self._missing.get(file_name)
+                if expires is not None and expires > now:
+                    continue
+                if not await run_blocking(get_storage().exists, file_name):
+                    self._missing[file_name] = now + self.ttl
+                    self._missing.move_to_end(file_name)
+                    while len(self._missing) > self.max_size:
+                        self._missing.popitem(last=False)
+                    continue
+                self._missing.pop(file_name, None)
+            url, max_age = self.get(file_name)
+            return file_name, url, max_age
+        return None
+
+    def get(self, file_name: str) -> Tuple[str, int]:
+        """
+        Return a presigned URL for ``file_name`` and the seconds it may still be reused for.
+
+        Only valid when the storage backend ``can_presign``.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(file_name)
+        if entry is None or entry[1] - self.refresh <= now:
+            url = get_storage().presigned_url(file_name, timedelta(seconds=self.ttl))
+            entry = (url, now + self.ttl)
+            self._entries[file_name] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(file_name)
+        return entry[0], max(0, int(entry[1] - self.refresh - now))
+
+
+presigned_urls = PresignedUrlCache(
+    settings.avatar_presigned_url_ttl_seconds,
+    settings.avatar_presigned_url_refresh_seconds,
+    settings.avatar_presigned_url_cache_size,
+)
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    """An image held in memory with the ETag MinIO reports for it."""
+    data: bytes
+    etag: str
+    media_type: str = "image/jpeg"
+
+    def to_response(self, if_none_match: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> Response:
+        # Range is not honoured from memory; a full 200 is a valid answer to it.
+        headers = {"ETag": self.etag, **(headers or {})}
+        if etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(self.data, media_type=self.media_type, headers=headers)
+
+
+class AvatarCache:
+    """
+    LRU of recently served images, bounded by the total size of their bodies.
+
+    Objects larger than ``max_item_bytes`` are never cached, so one large
+    legacy upload cannot push out hundreds of avatars. Entries are per
+    worker process. Uploads are stored under content-addressed names that
+    never change content, so entries never go stale and nothing has to be
+    invalidated when a user uploads a new picture.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 256 * 1024):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+
+    def fits(self, content_length: Optional[str]) -> bool:
+        return bool(content_length and content_length.isdigit()) and int(content_length) <= min(self.max_item_bytes, self.max_bytes)
+
+    def get(self, file_name: str) -> Optional[CachedImage]:
+        image = self._entries.get(file_name)
+        if image is not None:
+            self._entries.move_to_end(file_name)
+        return image
+
+    def put(self, file_name: str, image: CachedImage):
+        if len(image.data) > min(self.max_item_bytes, self.max_bytes):
+            return
+        self._discard(file_name)
+        self._entries[file_name] = image
+        self.size += len(image.data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.data)
+
+    def _discard(self, file_name: str):
+        image = self._entries.pop(file_name, None)
+        if image is not None:
+            self.size -= len(image.data)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+avatar_cache = AvatarCache(settings.avatar_cache_max_bytes, settings.avatar_cache_max_item_bytes)
+# Loaded from disk at startup by load_default_image().
+default_image: Optional[CachedImage] = None
+
+
+def is_default_image(file_name: Optional[str]) -> bool:
+    """Whether a stored ``profile_picture_url`` refers to the default picture, including the legacy local path."""
+    return not file_name or file_name in (DEFAULT_IMAGE_NAME, DEFAULT_IMAGE_PATH)
+
+
+def load_default_image() -> Optional[CachedImage]:
+    """
+    Read the default profile picture into memory, so it is served without a storage round trip.
+
+    Its ETag is the MD5 of the file, which is what MinIO (and the memory
+    backend) report for the copy ``upload_default_image_if_missing`` stores. Without the file the
+    default picture keeps being served from MinIO.
+    """
+    global default_image
+    if not os.path.exists(DEFAULT_IMAGE_PATH):
+        return None
+    with open(DEFAULT_IMAGE_PATH, "rb") as file:
+        data = file.read()
+    default_image = CachedImage(data, f'"{hashlib.md5(data).hexdigest()}"')
+    return default_image
+
+
+def cached_image(file_name: str) -> Optional[CachedImage]:
+    """Return ``file_name`` from memory if it is the default picture or was served recently."""
+    if file_name == DEFAULT_IMAGE_NAME and default_image is not None:
+        return default_image
+    return avatar_cache.get(file_name)
+
+
+async def open_cacheable_image(file_name: str) -> Union[CachedImage, ImageStream]:
+    """
+    Open an image for a full (non-range) response, caching it when it is small enough.
+
+    Small objects are read whole and kept in ``avatar_cache``; anything
+    larger is returned as a stream.
+    """
+    stream = await open_image(file_name)
+    if not avatar_cache.fits(stream.headers.get("Content-Length")):
+        return stream
+    image = CachedImage(await stream.read(), stream.headers.get("ETag", ""), stream.media_type)
+    avatar_cache.put(file_name, image)
+    return image
+
 
 def upload_default_image_if_missing():
     """
-    Upload the default profile picture to MinIO if it's not already there.
+    Upload the default profile picture to storage if it's not already there.
     """
-    ensure_bucket()
+    storage = get_storage()
+    storage.setup()
     try:
-        minio_client.stat_object(BUCKET_NAME, DEFAULT_IMAGE_NAME)
-    except S3Error as e:
-        if e.code == "NoSuchKey":
-            if not os.path.exists(DEFAULT_IMAGE_PATH):
-                raise FileNotFoundError(f"Default profile image not found at {DEFAULT_IMAGE_PATH}")
-            minio_client.fput_object(
-                BUCKET_NAME,
-                DEFAULT_IMAGE_NAME,
-                DEFAULT_IMAGE_PATH,
-                content_type="image/jpeg"
-            )
-        else:
-            raise
-
+        storage.stat(DEFAULT_IMAGE_NAME)
+    except ObjectNotFoundError:
+        if not os.path.exists(DEFAULT_IMAGE_PATH):
+            raise FileNotFoundError(f"Default profile image not found at {DEFAULT_IMAGE_PATH}")
+        storage.put_file(DEFAULT_IMAGE_NAME, DEFAULT_IMAGE_PATH, content_type="image/jpeg")
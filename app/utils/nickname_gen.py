@@ -1,10 +1,110 @@
-from builtins import str
+from builtins import int, len, open, range, set, str
+from functools import lru_cache
 import random
+import re
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
 
+ADJECTIVES: Tuple[str, ...] = (
+    "agile", "amber", "ancient", "arctic", "azure", "bold", "bouncy", "brave", "breezy", "bright",
+    "brisk", "calm", "candid", "cheerful", "chill", "clever", "cosmic", "cozy", "crafty", "crimson",
+    "crisp", "curious", "daring", "dapper", "dashing", "dazzling", "eager", "earnest", "electric", "elegant",
+    "epic", "fancy", "fearless", "fierce", "fluffy", "frosty", "funky", "gentle", "giddy", "gleaming",
+    "glossy", "golden", "graceful", "grand", "happy", "hardy", "hazy", "humble", "icy", "jazzy",
+    "jolly", "jovial", "keen", "kind", "lively", "lucky", "lunar", "mellow", "merry", "mighty",
+    "misty", "modest", "nimble", "noble", "peppy", "placid", "plucky", "polite", "proud", "quick",
+    "quiet", "quirky", "radiant", "rapid", "rosy", "rustic", "serene", "shiny", "silent", "silver",
+    "sleek", "sly", "smooth", "snappy", "snowy", "solar", "speedy", "spry", "steady", "stellar",
+    "stormy", "sturdy", "sunny", "swift", "tidy", "trusty", "upbeat", "valiant", "vivid", "witty",
+    "zany", "zesty",
+)
 
-def generate_nickname() -> str:
+ANIMALS: Tuple[str, ...] = (
+    "albatross", "alpaca", "antelope", "armadillo", "badger", "beaver", "bison", "bobcat", "buffalo", "camel",
+    "capybara", "caribou", "cheetah", "chipmunk", "cobra", "condor", "cougar", "coyote", "crane", "dingo",
+    "dolphin", "donkey", "eagle", "egret", "falcon", "ferret", "finch", "flamingo", "fox", "gazelle",
+    "gecko", "gibbon", "giraffe", "gopher", "gorilla", "grizzly", "hamster", "hare", "hawk", "hedgehog",
+    "heron", "hippo", "hyena", "ibex", "iguana", "impala", "jackal", "jaguar", "kestrel", "kiwi",
+    "koala", "lemur", "leopard", "lion", "llama", "lobster", "lynx", "macaw", "magpie", "manatee",
+    "marmot", "meerkat", "mink", "mole", "mongoose", "moose", "narwhal", "newt", "ocelot", "octopus",
+    "orca", "osprey", "otter", "owl", "panda", "panther", "parrot", "pelican", "penguin", "puffin",
+    "puma", "quail", "quokka", "rabbit", "raccoon", "raven", "reindeer", "robin", "salmon", "seal",
+    "shark", "sloth", "sparrow", "squirrel", "stork", "swan", "tapir", "tiger", "toucan", "turtle",
+    "walrus", "weasel", "whale", "wolf", "wombat", "yak", "zebra",
+)
+
+MAX_NUMBER = 9999
+MAX_WORD_LENGTH = 10
+_WORD_PATTERN = re.compile(r"^[a-z]+$")
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def generate_nickname(
+    adjectives: Sequence[str] = ADJECTIVES,
+    animals: Sequence[str] = ANIMALS,
+    max_number: int = MAX_NUMBER,
+) -> str:
     """Generate a URL-safe nickname using adjectives and animal names."""
-    adjectives = ["clever", "jolly", "brave", "sly", "gentle"]
-    animals = ["panda", "fox", "raccoon", "koala", "lion"]
-    number = random.randint(0, 999)
+    number = random.randint(0, max_number)
     return f"{random.choice(adjectives)}_{random.choice(animals)}_{number}"
+
+
+def generate_nickname_batch(
+    count: int,
+    adjectives: Sequence[str] = ADJECTIVES,
+    animals: Sequence[str] = ANIMALS,
+    max_number: int = MAX_NUMBER,
+) -> List[str]:
+    """Generate up to ``count`` distinct nicknames, to be checked for uniqueness in one query."""
+    candidates = {generate_nickname(adjectives, animals, max_number) for _ in range(count)}
+    return list(candidates)
+
+
+def nickname_with_suffix(
+    user_id: UUID,
+    adjectives: Sequence[str] = ADJECTIVES,
+    animals: Sequence[str] = ANIMALS,
+) -> str:
+    """
+    Generate a nickname that is very unlikely to collide with another user's.
+
+    The numeric part is replaced by the user's primary key in base 36. A user
+    may still have picked the same name by hand, or it may be waiting in the
+    nickname pool, so callers must check it like any other candidate.
+    """
+    value = user_id.int
+    digits = []
+    while value:
+        value, remainder = divmod(value, 36)
+        digits.append(_BASE36_DIGITS[remainder])
+    suffix = "".join(reversed(digits)) or "0"
+    return f"{random.choice(adjectives)}_{random.choice(animals)}_{suffix}"
+
+
+def namespace_size(
+    adjectives: Sequence[str] = ADJECTIVES,
+    animals: Sequence[str] = ANIMALS,
+    max_number: int = MAX_NUMBER,
+) -> int:
+    """Return the number of distinct nicknames the generator can produce."""
+    return len(set(adjectives)) * len(set(animals)) * (max_number + 1)
+
+
+@lru_cache(maxsize=None)
+def load_word_list(path: Optional[str], default: Tuple[str, ...] = ()) -> Tuple[str, ...]:
+    """
+    Load a word list with one lowercase word per line, falling back to ``default``.
+
+    Words are limited to ``MAX_WORD_LENGTH`` characters so that suffixed
+    nicknames always fit in the 50-character ``users.nickname`` column.
+    """
+    if not path:
+        return default
+    with open(path, "r", encoding="utf-8") as file:
+        words = tuple(dict.fromkeys(line.strip().lower() for line in file if line.strip()))
+    for word in words:
+        if not _WORD_PATTERN.match(word) or len(word) > MAX_WORD_LENGTH:
+            raise ValueError(f"Invalid nickname word {word!r} in {path}")
+    if not words:
+        raise ValueError(f"Nickname word list {path} is empty")
+    return words
@@ -1,6 +1,12 @@
 # app/security.py
 from builtins import Exception, ValueError, bool, int, str
+import base64
+import hashlib
+import hmac
 import secrets
+import time
+import uuid
+from typing import NamedTuple, Optional
 import bcrypt
 from logging import getLogger
 
@@ -50,4 +56,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         raise ValueError("Authentication process encountered an unexpected error") from e
 
 def generate_verification_token():
-    return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
\ No newline at end of file
+    return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
+
+
+VERIFY_EMAIL_PURPOSE = "verify-email"
+RESET_PASSWORD_PURPOSE = "reset-password"
+
+
+class SignedToken(NamedTuple):
+    user_id: uuid.UUID
+    version: int
+    expires_at: int
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _token_signature(secret_key: str, purpose: str, payload: bytes) -> bytes:
+    # The purpose is part of the MAC input, so a token issued for one purpose
+    # never verifies for another.
+    return hmac.new(secret_key.encode("utf-8"), purpose.encode("utf-8") + b"." + payload, hashlib.sha256).digest()
+
+
+def generate_signed_token(secret_key: str, purpose: str, user_id: uuid.UUID, version: int, expires_in_seconds: float) -> str:
+    """
+    Issue a stateless token for ``purpose`` that binds the user id and their token version.
+
+    Nothing is stored: the token carries ``user_id``, ``version`` and its
+    expiry, authenticated with an HMAC-SHA256 over ``secret_key``. Bumping the
+    user's ``token_version`` revokes every token issued before.
+    """
+    expires_at = int(time.time() + expires_in_seconds)
+    payload = f"{user_id.hex}.{version}.{expires_at}".encode("ascii")
+    return f"{_b64encode(payload)}.{_b64encode(_token_signature(secret_key, purpose, payload))}"
+
+
+def read_signed_token(secret_key: str, purpose: str, token: str) -> Optional[SignedToken]:
+    """Return the claims of a token issued for ``purpose``, or None if it is malformed, forged or expired."""
+    try:
+        encoded_payload, encoded_signature = token.split(".")
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+        if not hmac.compare_digest(signature, _token_signature(secret_key, purpose, payload)):
+            return None
+        user_id, version, expires_at = payload.decode("ascii").split(".")
+        claims = SignedToken(uuid.UUID(hex=user_id), int(version), int(expires_at))
+    except ValueError:
+        return None
+    if claims.expires_at < time.time():
+        return None
+    return claims
@@ -1,31 +1,217 @@
 # smtp_client.py
-from builtins import Exception, int, str
+from builtins import Exception, bool, float, int, len, str
+import queue
 import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Iterable, Iterator, List, Tuple
 from settings.config import settings
 import logging
 
+# Errors after which a pooled session is assumed dead and is replaced once.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPPoolTimeout(smtplib.SMTPException):
+    """Every pooled session stayed busy for longer than the client's timeout."""
+
+
+class SMTPBatchError(smtplib.SMTPException):
+    """
+    ``send_emails`` stopped partway through a batch.
+
+    The first ``completed`` messages were answered by the server: accepted,
+    or listed in ``refused``. The rest were not delivered. ``error`` is the
+    exception that stopped the batch.
+    """
+
+    def __init__(self, error: Exception, completed: int, refused: List[Tuple[str, Exception]]):
+        super().__init__(f"{error} (after {completed} messages)")
+        self.error = error
+        self.completed = completed
+        self.refused = refused
+
+
+@dataclass
+class _PooledConnection:
+    smtp: smtplib.SMTP
+    last_used: float = field(default_factory=time.monotonic)
+
+
 class SMTPClient:
-    def __init__(self, server: str, port: int, username: str, password: str):
+    """
+    Sends email through a small pool of authenticated SMTP sessions.
+
+    Connecting, STARTTLS and LOGIN happen once per session instead of once per
+    message. Idle sessions are checked with NOOP before reuse, closed after
+    ``idle_timeout`` seconds, and replaced when the server has dropped them.
+    The client is thread-safe so it can be shared by request handlers and
+    background delivery workers.
+    """
+
+    def __init__(self, server: str, port: int, username: str, password: str, use_tls: bool = True,
+                 pool_size: int = 4, idle_timeout: float = 60.0, health_check_interval: float = 15.0,
+                 timeout: float = 30.0):
         self.server = server
         self.port = port
         self.username = username
         self.password = password
+        self.use_tls = use_tls
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @classmethod
+    def from_settings(cls, settings) -> "SMTPClient":
+        return cls(
+            server=settings.smtp_server,
+            port=settings.smtp_port,
+            username=settings.smtp_username,
+            password=settings.smtp_password,
+            use_tls=settings.smtp_use_tls,
+            pool_size=settings.smtp_pool_size,
+            idle_timeout=settings.smtp_idle_timeout_seconds,
+            health_check_interval=settings.smtp_health_check_seconds,
+            timeout=settings.smtp_timeout_seconds,
+        )
+
+    def _connect(self) -> _PooledConnection:
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()  # Use TLS
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._close(smtp)
+            raise
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _is_usable(self, connection: _PooledConnection) -> bool:
+        idle_for = time.monotonic() - connection.last_used
+        if idle_for > self.idle_timeout:
+            return False
+        if idle_for > self.health_check_interval:
+            try:
+                return connection.smtp.noop()[0] == 250
+            except Exception:
+                return False
+        return True
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_usable(connection):
+                return connection
+            self._close(connection.smtp)
+
+    @contextmanager
+    def session(self) -> Iterator[smtplib.SMTP]:
+        """
+        Borrow an authenticated session; it is returned to the pool unless it failed.
+
+        Waiting for a free session blocks the calling thread for up to
+        ``timeout`` seconds, so async code must call in through a thread
+        (``asyncio.to_thread``), never directly on the event loop.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SMTPPoolTimeout(f"No SMTP session free after {self.timeout:g}s")
+        try:
+            connection = self._checkout()
+            try:
+                yield connection.smtp
+            except Exception:
+                self._close(connection.smtp)
+                raise
+            connection.last_used = time.monotonic()
+            self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def _build_message(self, subject: str, html_content: str, recipient: str) -> str:
+        message = MIMEMultipart('alternative')
+        message['Subject'] = subject
+        message['From'] = self.username
+        message['To'] = recipient
+        message.attach(MIMEText(html_content, 'html'))
+        return message.as_string()
+
+    def _sendmail(self, recipient: str, message: str):
+        try:
+            with self.session() as smtp:
+                smtp.sendmail(self.username, recipient, message)
+        except RECONNECT_ERRORS:
+            # The pooled session went stale between the health check and the send.
+            with self.session() as smtp:
+                smtp.sendmail(self.username, recipient, message)
 
     def send_email(self, subject: str, html_content: str, recipient: str):
         try:
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = self.username
-            message['To'] = recipient
-            message.attach(MIMEText(html_content, 'html'))
-
-            with smtplib.SMTP(self.server, self.port) as server:
-                server.starttls()  # Use TLS
-                server.login(self.username, self.password)
-                server.sendmail(self.username, recipient, message.as_string())
+            self._sendmail(recipient, self._build_message(subject, html_content, recipient))
             logging.info(f"Email sent to {recipient}")
         except Exception as e:
             logging.error(f"Failed to send email: {str(e)}")
             raise
+
+    def send_emails(self, messages: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, Exception]]:
+        """
+        Send ``(subject, html_content, recipient)`` messages over one pooled session.
+
+        Returns the ``(recipient, error)`` pairs the server refused. If the
+        session drops mid-batch the message in flight is sent again on a
+        fresh session. If it drops the session a second time, or no session
+        can be opened at all, ``SMTPBatchError`` is raised with the number of
+        messages the server had already answered, so the caller retries only
+        the rest.
+        """
+        pending = deque(messages)
+        total = len(pending)
+        failures = []
+        dropped_at = None
+        while pending:
+            in_session = False
+            try:
+                with self.session() as smtp:
+                    in_session = True
+                    while pending:
+                        subject, html_content, recipient = pending[0]
+                        try:
+                            smtp.sendmail(self.username, recipient, self._build_message(subject, html_content, recipient))
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                            failures.append((recipient, e))
+                        pending.popleft()
+            except Exception as e:
+                position = total - len(pending)
+                if not isinstance(e, RECONNECT_ERRORS) or not in_session or dropped_at == position:
+                    logging.error(f"Failed to send email: {str(e)}")
+                    raise SMTPBatchError(e, position, failures) from e
+                dropped_at = position
+        logging.info(f"Sent {total - len(failures)} of {total} emails")
+        return failures
+
+    def close(self):
+        """Close every idle session in the pool."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection.smtp)
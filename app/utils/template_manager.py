@@ -1,7 +1,45 @@
+import html
+import os
+import re
+import secrets
 import markdown2
+from dataclasses import dataclass
 from pathlib import Path
+from string import Formatter
+from typing import ClassVar, Dict, List, Optional, Set, Tuple
+
+_formatter = Formatter()
+
+
+def template_fields(body: str) -> Set[str]:
+    """Return the placeholder names used in a template body, e.g. ``{'name'}`` for ``"Hi {name}"``."""
+    return {field_name for _, field_name, _, _ in _formatter.parse(body) if field_name is not None}
+
+
+@dataclass(frozen=True)
+class _Field:
+    name: str
+    conversion: Optional[str]
+    format_spec: str
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    A template rendered to styled HTML once, split around its placeholders.
+
+    ``segments`` is a list of ``(literal_html, field)`` pairs; rendering
+    appends each literal followed by the HTML-escaped value of its field.
+    """
+    mtimes: Tuple[int, ...]
+    segments: Tuple[Tuple[str, Optional[_Field]], ...]
+
 
 class TemplateManager:
+    # Compiled templates are shared by every instance, keyed by templates
+    # directory and template name.
+    _compiled: ClassVar[Dict[Tuple[Path, str], CompiledTemplate]] = {}
+
     def __init__(self):
         # Dynamically determine the root path of the project
         self.root_dir = Path(__file__).resolve().parent.parent.parent  # Adjust this depending on the structure
@@ -32,15 +70,77 @@ class TemplateManager:
                 styled_html = styled_html.replace(f'<{tag}>', f'<{tag} style="{style}">')
         return styled_html
 
-    def render_template(self, template_name: str, **context) -> str:
-        """Render a markdown template with given context, applying advanced email styles."""
+    def _template_files(self, template_name: str) -> List[str]:
+        return ['header.md', f'{template_name}.md', 'footer.md']
+
+    def _mtimes(self, filenames: List[str]) -> Tuple[int, ...]:
+        return tuple(os.stat(self.templates_dir / filename).st_mtime_ns for filename in filenames)
+
+    def _compile(self, body: str, mtimes: Tuple[int, ...] = ()) -> CompiledTemplate:
+        """
+        Convert a body, wrapped in the header and footer, to styled HTML with its placeholders left open.
+
+        Each ``{field}`` in the body is swapped for a random alphanumeric
+        marker that markdown passes through untouched, the document is
+        converted and styled once, and the result is split on the markers.
+        """
         header = self._read_template('header.md')
         footer = self._read_template('footer.md')
 
-        # Read main template and format it with provided context
-        main_template = self._read_template(f'{template_name}.md')
-        main_content = main_template.format(**context)
+        marker = f"tplfield{secrets.token_hex(8)}x"
+        fields = []
+        marked_body = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(body):
+            marked_body.append(literal)
+            if field_name is not None:
+                marked_body.append(f"{marker}{len(fields)}x")
+                fields.append(_Field(field_name, conversion, format_spec or ""))
+
+        styled = self._apply_email_styles(markdown2.markdown(f"{header}\n{''.join(marked_body)}\n{footer}"))
+        pieces = re.split(rf"{marker}(\d+)x", styled)
+        if sorted(int(index) for index in pieces[1::2]) != list(range(len(fields))):
+            raise ValueError("Template placeholders did not survive markdown conversion")
+        segments = [(pieces[i], fields[int(pieces[i + 1])]) for i in range(0, len(pieces) - 1, 2)]
+        segments.append((pieces[-1], None))
+        return CompiledTemplate(mtimes, tuple(segments))
+
+    def compile_template(self, template_name: str) -> CompiledTemplate:
+        """Compile ``<template_name>.md`` from the templates directory."""
+        mtimes = self._mtimes(self._template_files(template_name))
+        return self._compile(self._read_template(f'{template_name}.md'), mtimes)
+
+    def compile_markdown(self, body: str) -> CompiledTemplate:
+        """Compile a markdown body that is not stored as a template file, such as a broadcast message."""
+        return self._compile(body)
+
+    def get_compiled(self, template_name: str) -> CompiledTemplate:
+        """Return the cached compiled template, recompiling it if any of its files changed."""
+        key = (self.templates_dir, template_name)
+        compiled = self._compiled.get(key)
+        if compiled is None or compiled.mtimes != self._mtimes(self._template_files(template_name)):
+            compiled = self.compile_template(template_name)
+            self._compiled[key] = compiled
+        return compiled
+
+    def warm(self) -> List[str]:
+        """Compile every template in the templates directory ahead of the first email; returns their names."""
+        names = sorted(path.stem for path in self.templates_dir.glob('*.md') if path.name not in ('header.md', 'footer.md'))
+        for name in names:
+            self.get_compiled(name)
+        return names
+
+    def render_template(self, template_name: str, **context) -> str:
+        """Render a markdown template with given context, applying advanced email styles."""
+        return self.render_compiled(self.get_compiled(template_name), **context)
 
-        full_markdown = f"{header}\n{main_content}\n{footer}"
-        html_content = markdown2.markdown(full_markdown)
-        return self._apply_email_styles(html_content)
+    @staticmethod
+    def render_compiled(compiled: CompiledTemplate, **context) -> str:
+        """Fill a compiled template's placeholders with HTML-escaped values from ``context``."""
+        parts = []
+        for literal, field in compiled.segments:
+            parts.append(literal)
+            if field is not None:
+                value = _formatter.get_field(field.name, (), context)[0]
+                value = _formatter.format_field(_formatter.convert_field(value, field.conversion), field.format_spec)
+                parts.append(html.escape(value))
+        return "".join(parts)
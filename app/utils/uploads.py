@@ -0,0 +1,154 @@
+"""
+Streaming reception of a single file from a multipart/form-data request.
+
+FastAPI reads a whole form before the handler runs, so a ``File(...)``
+parameter cannot reject an oversized upload early. ``receive_file`` instead
+parses ``request.stream()`` chunk by chunk, writes the file part straight to
+a named temporary file, and aborts as soon as the body passes the cap. The
+temporary file's path can be handed to another process, so the file is never
+held in memory as a whole.
+"""
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from typing import List, Optional
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Room for the multipart boundaries and part headers on top of the file itself.
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """The request body, or the file in it, is larger than allowed."""
+
+
+class InvalidUploadError(ValueError):
+    """The request is not multipart/form-data or has no file in the expected field."""
+
+
+@dataclass
+class ReceivedFile:
+    file: "tempfile._TemporaryFileWrapper"
+    filename: str
+    content_type: Optional[str]
+    size: int
+    # Hex SHA-256 of the file, computed while it was written.
+    sha256: str
+
+    @property
+    def path(self) -> str:
+        return self.file.name
+
+    def close(self):
+        """Delete the temporary file."""
+        self.file.close()
+
+
+def check_content_length(request: Request, max_size: int):
+    """Reject a request whose declared ``Content-Length`` cannot fit a ``max_size`` file, before reading it."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+
+
+@dataclass
+class _PartState:
+    headers: List[tuple] = field(default_factory=list)
+    header_name: bytes = b""
+    header_value: bytes = b""
+    is_target: bool = False
+
+
+async def receive_file(request: Request, field_name: str, max_size: int) -> ReceivedFile:
+    """
+    Stream the file in ``field_name`` of a multipart request to a temporary file.
+
+    Other form fields are skipped. Raises ``UploadTooLargeError`` as soon as
+    the body or the file passes its cap, and ``InvalidUploadError`` if the
+    request is malformed or the field is missing. The caller owns the
+    returned file and must ``close()`` it.
+    """
+    check_content_length(request, max_size)
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidUploadError("Expected a multipart/form-data upload")
+
+    target = tempfile.NamedTemporaryFile(prefix="upload-")
+    hasher = hashlib.sha256()
+    part = _PartState()
+    pending: List[bytes] = []
+    received = {"filename": None, "content_type": None, "size": 0, "done": False}
+
+    def on_part_begin():
+        part.__init__()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part.header_name += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part.header_value += data[start:end]
+
+    def on_header_end():
+        part.headers.append((part.header_name.lower(), part.header_value))
+        part.header_name = part.header_value = b""
+
+    def on_headers_finished():
+        headers = dict(part.headers)
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") == field_name and b"filename" in options and not received["done"]:
+            part.is_target = True
+            received["filename"] = options[b"filename"].decode("utf-8", errors="replace")
+            received["content_type"] = headers.get(b"content-type", b"").decode("latin-1") or None
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part.is_target:
+            received["size"] += end - start
+            if received["size"] > max_size:
+                raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+            pending.append(data[start:end])
+
+    def write(chunks: List[bytes]):
+        for chunk in chunks:
+            hasher.update(chunk)
+            target.write(chunk)
+
+    def on_part_end():
+        if part.is_target:
+            received["done"] = True
+            part.is_target = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    body_size = 0
+    try:
+        async for chunk in request.stream():
+            body_size += len(chunk)
+            if body_size > max_size + MULTIPART_OVERHEAD:
+                raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+            parser.write(chunk)
+            if pending:
+                await asyncio.to_thread(write, pending)
+                pending.clear()
+        parser.finalize()
+        if pending:
+            await asyncio.to_thread(write, pending)
+        if not received["done"]:
+            raise InvalidUploadError(f"No file in form field '{field_name}'")
+        await asyncio.to_thread(target.flush)
+    except MultipartParseError as e:
+        target.close()
+        raise InvalidUploadError("Malformed multipart body") from e
+    except BaseException:
+        target.close()
+        raise
+    return ReceivedFile(target, received["filename"], received["content_type"], received["size"], hasher.hexdigest())
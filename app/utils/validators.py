@@ -1,21 +1,210 @@
-from builtins import bool, str
-from email_validator import validate_email, EmailNotValidError
+import asyncio
+import logging
+import threading
+import time
+from builtins import bool, int, len, list, str
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable, List, Optional, Tuple
+import dns.resolver
+from email_validator import EmailNotValidError, validate_email
+from email_validator.deliverability import validate_email_deliverability
+from email_validator.exceptions_types import EmailUndeliverableError
+from settings.config import Settings, settings
 
-def validate_email_address(email: str) -> bool:
+logger = logging.getLogger(__name__)
+
+
+class ValidationMode(str, Enum):
+    OFFLINE = "offline"
+    CACHED = "cached"
+
+
+@dataclass(frozen=True)
+class DomainResult:
+    """Outcome of a domain's MX lookup; ``error`` is set when the domain does not accept email."""
+    mx: Tuple[str, ...]
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class EmailCheck:
+    email: str
+    normalized: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+
+class MXCache:
+    """
+    LRU of domain lookup results with a TTL.
+
+    Domains that do not accept email are cached too (negative caching), with
+    their own, usually shorter, TTL.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0, negative_ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, DomainResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, domain: str) -> Optional[DomainResult]:
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[domain]
+                return None
+            self._entries.move_to_end(domain)
+            return result
+
+    def set(self, domain: str, result: DomainResult):
+        ttl = self.ttl if result.error is None else self.negative_ttl
+        with self._lock:
+            self._entries[domain] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EmailValidator:
+    """
+    Validates email addresses without a network round trip per call.
+
+    In ``OFFLINE`` mode only the syntax is checked. In ``CACHED`` mode the
+    domain's MX records are looked up as well, at most once per TTL per
+    domain. ``resolver`` is any object with dnspython's
+    ``resolve(name, rdtype)`` method, so tests can pass a stub.
+    """
+
+    def __init__(self, mode: ValidationMode = ValidationMode.CACHED, resolver=None,
+                 cache: Optional[MXCache] = None, timeout: float = 5.0):
+        self.mode = ValidationMode(mode)
+        self.cache = cache if cache is not None else MXCache()
+        self.timeout = timeout
+        self._resolver = resolver
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "EmailValidator":
+        return cls(
+            mode=settings.email_validation_mode,
+            cache=MXCache(
+                settings.email_mx_cache_size,
+                settings.email_mx_cache_ttl_seconds,
+                settings.email_mx_negative_ttl_seconds,
+            ),
+            timeout=settings.email_dns_timeout_seconds,
+        )
+
+    @property
+    def resolver(self):
+        if self._resolver is None:
+            resolver = dns.resolver.Resolver()
+            resolver.lifetime = self.timeout
+            self._resolver = resolver
+        return self._resolver
+
+    def lookup_domain(self, domain: str) -> DomainResult:
+        """Return the cached MX result for an ASCII domain, resolving it on a miss."""
+        result = self.cache.get(domain)
+        if result is not None:
+            return result
+        try:
+            info = validate_email_deliverability(domain, domain, dns_resolver=self.resolver)
+        except EmailUndeliverableError as e:
+            result = DomainResult((), str(e))
+        except dns.resolver.NoResolverConfiguration:
+            logger.warning(f"No DNS resolver configured; accepting {domain} without an MX check")
+            return DomainResult(())
+        else:
+            if "unknown-deliverability" in info:
+                # Timeouts and unreachable nameservers are not the domain's fault:
+                # accept the address but do not cache the answer.
+                logger.warning(f"MX lookup for {domain} was inconclusive: {info['unknown-deliverability']}")
+                return DomainResult(())
+            result = DomainResult(tuple(host for _, host in info["mx"]))
+        self.cache.set(domain, result)
+        return result
+
+    def _check_syntax(self, email: str):
+        try:
+            return validate_email(email, check_deliverability=False), None
+        except EmailNotValidError as e:
+            return None, str(e)
+
+    def validate(self, email: str) -> EmailCheck:
+        return self.validate_many([email])[0]
+
+    def validate_many(self, emails: Iterable[str]) -> List[EmailCheck]:
+        """
+        Validate a batch of addresses, e.g. for a bulk import.
+
+        Syntax is checked per address; in ``CACHED`` mode each distinct
+        domain is looked up once for the whole batch.
+        """
+        parsed = [(email, *self._check_syntax(email)) for email in emails]
+        domains = {}
+        if self.mode is ValidationMode.CACHED:
+            for domain in {info.ascii_domain for _, info, _ in parsed if info is not None}:
+                domains[domain] = self.lookup_domain(domain)
+
+        checks = []
+        for email, info, error in parsed:
+            if info is None:
+                checks.append(EmailCheck(email, error=error))
+                continue
+            domain_error = domains[info.ascii_domain].error if domains else None
+            checks.append(EmailCheck(email, info.normalized, domain_error))
+        return checks
+
+    async def validate_async(self, email: str) -> EmailCheck:
+        return (await self.validate_many_async([email]))[0]
+
+    async def validate_many_async(self, emails: Iterable[str]) -> List[EmailCheck]:
+        """``validate_many`` for the event loop: in ``CACHED`` mode it runs in a worker thread, as a cache miss resolves DNS."""
+        emails = list(emails)
+        if self.mode is ValidationMode.OFFLINE:
+            return self.validate_many(emails)
+        return await asyncio.to_thread(self.validate_many, emails)
+
+    def is_valid(self, email: str) -> bool:
+        return self.validate(email).valid
+
+
+_default_validator: Optional[EmailValidator] = None
+
+
+def get_email_validator() -> EmailValidator:
+    """Return the process-wide validator configured from settings."""
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = EmailValidator.from_settings(settings)
+    return _default_validator
+
+
+def validate_email_address(email: str, validator: Optional[EmailValidator] = None) -> bool:
     """
     Validate the email address using the email-validator library.
-    
+
     Args:
         email (str): Email address to validate.
-    
+        validator (EmailValidator): Validator to use; defaults to the one configured from settings.
+
     Returns:
         bool: True if the email is valid, otherwise False.
     """
-    try:
-        # Validate and get info
-        validate_email(email)
-        return True
-    except EmailNotValidError as e:
-        # Email not valid, return False
-        print(f"Invalid email: {e}")
-        return False
\ No newline at end of file
+    check = (validator or get_email_validator()).validate(email)
+    if not check.valid:
+        logger.info(f"Invalid email: {check.error}")
+    return check.valid
@@ -0,0 +1,75 @@
+"""
+Profile picture serving latency, default picture and a hot avatar.
+
+Storage is the in-memory backend with a configurable round trip (default
+2 ms, a same-datacenter MinIO request) added to ``open`` and ``stat``.
+For each case it reports p50 and p99 of building the response and reading
+its body, for:
+
+- storage: every request streams the object from MinIO, as before;
+- memory: the default picture loaded at startup, and avatars served from
+  ``avatar_cache`` after their first request.
+
+Usage:
+    python -m benchmarks.bench_avatars [requests] [round_trip_ms]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from unittest.mock import patch
+from app.routers.user_routes import _profile_picture_response
+from app.storage import MemoryStorage, set_storage
+from app.utils import minio_client
+from app.utils.minio_client import DEFAULT_IMAGE_NAME, AvatarCache, load_default_image
+
+
+class RemoteMemoryStorage(MemoryStorage):
+    """``MemoryStorage`` that pays a network round trip per request, like MinIO."""
+
+    def __init__(self, round_trip: float):
+        super().__init__()
+        self.round_trip = round_trip
+
+    def open(self, name, byte_range=None):
+        time.sleep(self.round_trip)
+        return super().open(name, byte_range)
+
+    def stat(self, name):
+        time.sleep(self.round_trip)
+        return super().stat(name)
+
+
+async def latencies_ms(file_name: str, requests: int):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await _profile_picture_response(file_name, None, None, {})
+        if hasattr(response, "body_iterator"):
+            async for _ in response.body_iterator:
+                pass
+            await response.background()
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main(requests: int = 500, round_trip_ms: float = 2.0):
+    default = load_default_image()
+    storage = RemoteMemoryStorage(round_trip_ms / 1e3)
+    for name in (DEFAULT_IMAGE_NAME, "hot_0123456789abcdef.jpg"):
+        storage.put(name, default.data, "image/jpeg")
+    set_storage(storage)
+    print(f"{'case':<16}{'storage p50':>13}{'p99':>8}{'memory p50':>13}{'p99':>8}")
+    for case, file_name in (("default", DEFAULT_IMAGE_NAME), ("hot avatar", "hot_0123456789abcdef.jpg")):
+        with patch.object(minio_client, "default_image", None), \
+                patch.object(minio_client, "avatar_cache", AvatarCache(max_item_bytes=0)):
+            uncached = asyncio.run(latencies_ms(file_name, requests))
+        cached = asyncio.run(latencies_ms(file_name, requests))
+        print(f"{case:<16}{uncached[0]:>13.3f}{uncached[1]:>8.3f}{cached[0]:>13.3f}{cached[1]:>8.3f}")
+    set_storage(None)
+    minio_client.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:3])))
@@ -0,0 +1,82 @@
+"""
+Profile picture throughput through the running docker-compose stack.
+
+Sends ``requests`` GETs for one URL over ``concurrency`` keep-alive
+connections and reports requests per second, p50 and p99 latency, and how
+nginx's cache answered (the ``X-Cache-Status`` header). Run it once against
+each variant:
+
+    docker compose -f docker-compose.yml up -d
+    python -m benchmarks.bench_http_avatars --user-id <id>
+    docker compose -f docker-compose.yml -f docker-compose.nocache.yml up -d
+    python -m benchmarks.bench_http_avatars --user-id <id>
+
+Usage:
+    python -m benchmarks.bench_http_avatars --user-id ID [--base-url URL]
+        [--requests N] [--concurrency N]
+    python -m benchmarks.bench_http_avatars --url URL [--requests N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import UUID
+from collections import Counter
+import httpx
+
+
+async def run(url: str, requests: int, concurrency: int):
+    samples, cache_status = [], Counter()
+    remaining = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(url, headers={"Accept": "image/webp,*/*"})
+            samples.append((time.perf_counter() - start) * 1e3)
+            cache_status[f"{response.status_code} {response.headers.get('x-cache-status', '-')}"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await client.get(url)  # warm up the connection and the cache
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    samples.sort()
+    return requests / elapsed, statistics.median(samples), samples[int(len(samples) * 0.99) - 1], cache_status
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_http_avatars",
+        description="Profile picture throughput through the docker-compose stack.",
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=UUID, help="user whose profile picture is requested")
+    target.add_argument("--url", help="full URL to request instead of a user's profile picture")
+    parser.add_argument("--base-url", default="http://localhost",
+                        help="nginx address published by docker-compose.yml (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=2000, help="total requests (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="keep-alive connections (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error("--requests and --concurrency must be at least 1")
+    if args.url is None:
+        args.url = f"{args.base_url.rstrip('/')}/users/{args.user_id}/profile-picture/"
+    return args
+
+
+def main(url: str, requests: int = 2000, concurrency: int = 32):
+    try:
+        rate, p50, p99, cache_status = asyncio.run(run(url, requests, concurrency))
+    except httpx.TransportError as exc:
+        raise SystemExit(f"cannot reach {url}: {exc!r}; is docker-compose up?")
+    print(f"{'requests/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{rate:>12.0f}{p50:>10.2f}{p99:>10.2f}")
+    for status, count in cache_status.most_common():
+        print(f"  {status}: {count}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.url, args.requests, args.concurrency)
@@ -0,0 +1,108 @@
+"""
+Profile picture processing cost on a corpus of sample images.
+
+The corpus is generated (noise over a gradient, so JPEG cannot compress it
+to nothing) at typical upload sizes, as JPEG and PNG. For each image it
+compares:
+
+- legacy: ``Image.open``, ``convert("RGB")``, ``resize((236, 236))`` and a
+  JPEG ``save``, as the upload handler used to do inline;
+- pipeline: ``process_profile_picture``, which adds the pixel limit check and
+  JPEG ``draft`` mode.
+
+It then uploads the whole corpus concurrently from one event loop and
+reports the longest stall a 1 ms ticker saw, for inline processing versus
+``resize_profile_picture`` on the process pool.
+
+Usage:
+    python -m benchmarks.bench_images [iterations]
+"""
+import asyncio
+import io
+import sys
+import time
+from PIL import Image
+from app.utils import image_processing
+from app.utils.image_processing import process_profile_picture, resize_profile_picture
+
+CORPUS = [
+    ("phone-4000x3000.jpg", (4000, 3000), "JPEG"),
+    ("camera-6000x4000.jpg", (6000, 4000), "JPEG"),
+    ("laptop-1920x1080.jpg", (1920, 1080), "JPEG"),
+    ("avatar-800x800.jpg", (800, 800), "JPEG"),
+    ("screenshot-1280x800.png", (1280, 800), "PNG"),
+    ("icon-256x256.png", (256, 256), "PNG"),
+]
+
+
+def sample_image(size, format: str) -> bytes:
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 48)
+    image = Image.merge("RGB", (gradient, noise, Image.blend(gradient, noise, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=90)
+    return buffer.getvalue()
+
+
+def legacy_process(file_data: bytes) -> bytes:
+    image = Image.open(io.BytesIO(file_data))
+    image = image.convert("RGB")
+    image = image.resize((236, 236))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def per_call_ms(func, file_data: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(file_data)
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+async def longest_stall_ms(process, corpus) -> float:
+    """Process ``corpus`` concurrently while a ticker measures the worst event loop delay."""
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal stall
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - start - 0.001)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.gather(*(process(file_data) for file_data in corpus))
+    done.set()
+    await task
+    return stall * 1e3
+
+
+async def inline(file_data: bytes) -> bytes:
+    return legacy_process(file_data)
+
+
+def main(iterations: int = 5):
+    corpus = {name: sample_image(size, format) for name, size, format in CORPUS}
+    print(f"{'image':<26}{'KiB':>8}{'legacy ms':>12}{'pipeline ms':>14}{'speedup':>10}")
+    for name, file_data in corpus.items():
+        legacy = per_call_ms(legacy_process, file_data, iterations)
+        pipeline = per_call_ms(process_profile_picture, file_data, iterations)
+        print(f"{name:<26}{len(file_data) / 1024:>8.0f}{legacy:>12.1f}{pipeline:>14.1f}{legacy / pipeline:>9.1f}x")
+
+    async def stalls():
+        try:
+            await resize_profile_picture(corpus["icon-256x256.png"])  # start the worker processes
+            return (await longest_stall_ms(inline, corpus.values()),
+                    await longest_stall_ms(resize_profile_picture, corpus.values()))
+        finally:
+            image_processing.shutdown_executor(wait=True)
+
+    blocking, pooled = asyncio.run(stalls())
+    print(f"\nlongest event loop stall processing the corpus concurrently: "
+          f"inline {blocking:.1f} ms, process pool {pooled:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,91 @@
+"""
+Nickname allocation cost as the users table fills up.
+
+Simulates ``UserService`` nickname allocation against an in-memory set of
+existing nicknames at 10k, 100k and 1M users and compares:
+
+- legacy: the original 5 adjectives x 5 animals x 1000 numbers namespace with
+  one ``get_by_nickname`` round trip per candidate;
+- batched: the current word lists with ``nickname_batch_size`` candidates per
+  ``WHERE nickname IN (...)`` query and the id-suffix fallback after
+  ``nickname_max_batches`` misses.
+
+Creation latency is reported as measured Python time plus the number of
+round trips multiplied by an assumed database round-trip time.
+
+Usage:
+    python -m benchmarks.bench_nickname_allocation [rtt_ms] [samples]
+"""
+import random
+import sys
+import time
+from uuid import uuid4
+from app.utils.nickname_gen import generate_nickname, generate_nickname_batch, namespace_size, nickname_with_suffix
+
+LEGACY_ADJECTIVES = ["clever", "jolly", "brave", "sly", "gentle"]
+LEGACY_ANIMALS = ["panda", "fox", "raccoon", "koala", "lion"]
+LEGACY_MAX_NUMBER = 999
+LEGACY_MAX_TRIES = 10_000
+BATCH_SIZE = 8
+MAX_BATCHES = 3
+TABLE_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def legacy_generate() -> str:
+    return generate_nickname(LEGACY_ADJECTIVES, LEGACY_ANIMALS, LEGACY_MAX_NUMBER)
+
+
+def fill(size: int, generate) -> set:
+    existing = set()
+    while len(existing) < size:
+        existing.add(generate())
+    return existing
+
+
+def legacy_allocate(existing: set):
+    for round_trips in range(1, LEGACY_MAX_TRIES + 1):
+        candidate = legacy_generate()
+        if candidate not in existing:
+            return candidate, round_trips
+    return None, LEGACY_MAX_TRIES
+
+
+def batched_allocate(existing: set):
+    for round_trips in range(1, MAX_BATCHES + 1):
+        for candidate in generate_nickname_batch(BATCH_SIZE):
+            if candidate not in existing:
+                return candidate, round_trips
+    return nickname_with_suffix(uuid4()), MAX_BATCHES
+
+
+def measure(allocate, existing: set, samples: int, rtt_ms: float) -> str:
+    round_trips = 0
+    started = time.perf_counter()
+    for _ in range(samples):
+        nickname, trips = allocate(existing)
+        if nickname is None:
+            return f"gave up after {LEGACY_MAX_TRIES} round trips"
+        round_trips += trips
+    python_ms = (time.perf_counter() - started) * 1000 / samples
+    trips = round_trips / samples
+    return f"{trips:6.2f} round trips, {python_ms:7.3f} ms python, ~{python_ms + trips * rtt_ms:8.2f} ms total"
+
+
+def main(rtt_ms: float = 0.5, samples: int = 200):
+    random.seed(0)
+    legacy_namespace = len(LEGACY_ADJECTIVES) * len(LEGACY_ANIMALS) * (LEGACY_MAX_NUMBER + 1)
+    print(f"legacy namespace: {legacy_namespace:,}  current namespace: {namespace_size():,}  rtt: {rtt_ms} ms")
+    for size in TABLE_SIZES:
+        print(f"-- {size:,} existing users")
+        if size < legacy_namespace:
+            print(f"legacy : {measure(legacy_allocate, fill(size, legacy_generate), samples, rtt_ms)}")
+        else:
+            print("legacy : namespace exhausted, allocation never terminates")
+        print(f"batched: {measure(batched_allocate, fill(size, generate_nickname), samples, rtt_ms)}")
+
+
+if __name__ == "__main__":
+    main(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 0.5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
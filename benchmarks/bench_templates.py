@@ -0,0 +1,57 @@
+"""
+Email template rendering cost for every template in ``email_templates/``.
+
+Compares, per rendered message:
+
+- legacy: read header, body and footer from disk, ``str.format`` the body,
+  run ``markdown2`` over the whole document and apply the inline styles;
+- compiled: ``TemplateManager.render_template``, which reuses the cached
+  compiled template (three ``stat`` calls for hot reload, then one join).
+
+Each template is rendered with a placeholder value for every field it uses.
+
+Usage:
+    python -m benchmarks.bench_templates [iterations]
+"""
+import sys
+import time
+from string import Formatter
+import markdown2
+from app.utils.template_manager import TemplateManager
+
+LAYOUT_FILES = {"header.md", "footer.md"}
+
+
+def legacy_render(manager: TemplateManager, template_name: str, **context) -> str:
+    header = manager._read_template('header.md')
+    footer = manager._read_template('footer.md')
+    main_content = manager._read_template(f'{template_name}.md').format(**context)
+    return manager._apply_email_styles(markdown2.markdown(f"{header}\n{main_content}\n{footer}"))
+
+
+def sample_context(manager: TemplateManager, template_name: str) -> dict:
+    body = manager._read_template(f'{template_name}.md')
+    return {field: f"sample-{field}" for _, field, _, _ in Formatter().parse(body) if field}
+
+
+def per_call_us(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int = 2000):
+    manager = TemplateManager()
+    names = sorted(path.stem for path in manager.templates_dir.glob("*.md") if path.name not in LAYOUT_FILES)
+    print(f"{'template':<22}{'legacy µs':>12}{'compiled µs':>14}{'speedup':>10}")
+    for name in names:
+        context = sample_context(manager, name)
+        manager.render_template(name, **context)  # compile outside the timed loop
+        legacy = per_call_us(lambda: legacy_render(manager, name, **context), iterations)
+        compiled = per_call_us(lambda: manager.render_template(name, **context), iterations)
+        print(f"{name:<22}{legacy:>12.1f}{compiled:>14.1f}{legacy / compiled:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,85 @@
+"""
+Per-lookup Python overhead of the UserService read queries.
+
+Compares the original ``select(User).filter_by(**filters)`` construction with
+the cached lambda statements used by ``UserService._fetch_user`` and
+``UserService.list_users``. Three numbers are reported for each variant:
+
+- build: constructing the statement and generating its cache key, which is
+  the work left on the hot path once the compiled form is cached;
+- compile: compiling the statement for the asyncpg dialect, which is what
+  every lookup pays when the compiled cache is cold or too small;
+- end-to-end: executing the lookup against an in-memory SQLite database
+  through a synchronous session, so driver and network latency are excluded.
+
+Usage:
+    python -m benchmarks.bench_user_queries [iterations]
+"""
+import sys
+import timeit
+from sqlalchemy import create_engine, lambda_stmt, select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.user_model import User, UserRole
+
+
+def by_email_filter_by(email: str):
+    return select(User).filter_by(email=email)
+
+
+def by_email_lambda(email: str):
+    column = User.email
+    return lambda_stmt(lambda: select(User).where(column == email))
+
+
+def page_select(skip: int, limit: int):
+    return select(User).offset(skip).limit(limit)
+
+
+def page_lambda(skip: int, limit: int):
+    return lambda_stmt(lambda: select(User).offset(skip).limit(limit))
+
+
+VARIANTS = [
+    ("get_by_email filter_by", lambda: by_email_filter_by("bench_42@example.com")),
+    ("get_by_email lambda   ", lambda: by_email_lambda("bench_42@example.com")),
+    ("list_users   select   ", lambda: page_select(10, 10)),
+    ("list_users   lambda   ", lambda: page_lambda(10, 10)),
+]
+
+
+def _per_call_us(func, iterations: int) -> float:
+    func()  # warm up
+    return timeit.timeit(func, number=iterations) / iterations * 1e6
+
+
+def _seed(session: Session, count: int = 100):
+    for i in range(count):
+        session.add(User(
+            nickname=f"bench_user_{i}",
+            email=f"bench_{i}@example.com",
+            role=UserRole.AUTHENTICATED,
+            hashed_password="not-a-real-hash",
+        ))
+    session.commit()
+
+
+def main(iterations: int = 5000):
+    dialect = asyncpg.dialect()
+    print(f"{'variant':<24}{'build':>10}{'compile':>10}{'end-to-end':>12}   (us per lookup)")
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        _seed(session)
+        for name, build in VARIANTS:
+            build_us = _per_call_us(lambda: build()._generate_cache_key(), iterations)
+            compile_us = _per_call_us(lambda: build().compile(dialect=dialect), max(iterations // 10, 1))
+            execute_us = _per_call_us(lambda: session.execute(build()).scalars().all(), iterations)
+            print(f"{name:<24}{build_us:>10.1f}{compile_us:>10.1f}{execute_us:>12.1f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -36,6 +36,8 @@ from app.utils.security import hash_password
 from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
 from app.services.jwt_service import create_access_token
+from app.storage import MemoryStorage, set_storage
+from app.utils.minio_client import AvatarCache
 
 fake = Faker()
 
@@ -64,6 +66,15 @@ async def async_client(db_session):
         finally:
             app.dependency_overrides.clear()
 
+@pytest.fixture
+def memory_storage(monkeypatch):
+    """Store profile pictures in memory, with an empty avatar cache, for the duration of a test."""
+    storage = MemoryStorage()
+    set_storage(storage)
+    monkeypatch.setattr("app.utils.minio_client.avatar_cache", AvatarCache())
+    yield storage
+    set_storage(None)
+
 @pytest.fixture(scope="session", autouse=True)
 def initialize_database():
     try:
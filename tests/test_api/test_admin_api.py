@@ -0,0 +1,91 @@
+import pytest
+from app.utils.metrics import Metrics
+
+
+@pytest.fixture(autouse=True)
+def background_jobs_enabled(monkeypatch):
+    monkeypatch.setattr("app.routers.admin_routes.settings.broadcast_enabled", True)
+    monkeypatch.setattr("app.routers.admin_routes.settings.storage_gc_enabled", True)
+
+
+@pytest.mark.asyncio
+async def test_metrics_as_admin(async_client, admin_token):
+    Metrics.set_gauge("nickname_pool_depth", 42)
+    response = await async_client.get("/metrics/", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert response.json()["gauges"]["nickname_pool_depth"] == 42
+
+
+@pytest.mark.asyncio
+async def test_metrics_forbidden_for_manager(async_client, manager_token):
+    response = await async_client.get("/metrics/", headers={"Authorization": f"Bearer {manager_token}"})
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_create_and_get_broadcast(async_client, admin_token, locked_user):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    payload = {"segment": "LOCKED", "subject": "Account locked", "body": "Hello {name}, please reset your password."}
+    response = await async_client.post("/broadcasts/", json=payload, headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "PENDING"
+    assert job["total_recipients"] == 1
+
+    response = await async_client.get(f"/broadcasts/{job['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == job["id"]
+
+    response = await async_client.post(f"/broadcasts/{job['id']}/cancel", headers=headers)
+    assert response.json()["status"] == "CANCELLED"
+
+
+@pytest.mark.asyncio
+async def test_create_broadcast_rejects_unknown_placeholder(async_client, admin_token):
+    payload = {"segment": "UNVERIFIED", "subject": "Hi", "body": "Your password is {hashed_password}"}
+    response = await async_client.post("/broadcasts/", json=payload, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_create_broadcast_forbidden_for_manager(async_client, manager_token):
+    payload = {"segment": "UNVERIFIED", "subject": "Hi", "body": "Hello"}
+    response = await async_client.post("/broadcasts/", json=payload, headers={"Authorization": f"Bearer {manager_token}"})
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_create_broadcast_when_disabled(async_client, admin_token, monkeypatch):
+    monkeypatch.setattr("app.routers.admin_routes.settings.broadcast_enabled", False)
+    payload = {"segment": "LOCKED", "subject": "Hi", "body": "Hello {name}"}
+    response = await async_client.post("/broadcasts/", json=payload, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_create_and_cancel_storage_gc(async_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/storage-gc/", json={}, headers=headers)
+    assert response.status_code == 202
+    run = response.json()
+    assert run["status"] == "PENDING"
+    assert run["dry_run"] is True
+
+    response = await async_client.get(f"/storage-gc/{run['id']}", headers=headers)
+    assert response.json()["id"] == run["id"]
+
+    response = await async_client.post(f"/storage-gc/{run['id']}/cancel", headers=headers)
+    assert response.json()["status"] == "CANCELLED"
+
+
+@pytest.mark.asyncio
+async def test_create_storage_gc_when_disabled(async_client, admin_token, monkeypatch):
+    monkeypatch.setattr("app.routers.admin_routes.settings.storage_gc_enabled", False)
+    response = await async_client.post("/storage-gc/", json={}, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_storage_gc_forbidden_for_manager(async_client, manager_token):
+    response = await async_client.post("/storage-gc/", json={"dry_run": False}, headers={"Authorization": f"Bearer {manager_token}"})
+    assert response.status_code == 403
@@ -1,10 +1,17 @@
 from builtins import str
+import hashlib
+import io
+from unittest.mock import MagicMock, patch
+import dns.resolver
+from PIL import Image
 import pytest
 from httpx import AsyncClient
 from app.main import app
 from app.models.user_model import User, UserRole
 from app.utils.nickname_gen import generate_nickname
+from app.utils.minio_client import avatar_blob_name, content_version
 from app.utils.security import hash_password
+from app.utils.validators import EmailValidator, ValidationMode
 from app.services.jwt_service import decode_token  # Import your FastAPI app
 
 # Example of a test function using the async_client fixture
@@ -72,6 +79,21 @@ async def test_create_user_duplicate_email(async_client, verified_user):
     assert response.status_code == 400
     assert "Email already exists" in response.json().get("detail", "")
 
+@pytest.mark.asyncio
+async def test_register_rejects_undeliverable_domain(async_client):
+    resolver = MagicMock()
+    resolver.resolve.side_effect = dns.resolver.NXDOMAIN()
+    validator = EmailValidator(ValidationMode.CACHED, resolver=resolver)
+    user_data = {
+        "email": "someone@no-such-domain.org",
+        "password": "ValidPassword123!",
+        "role": UserRole.AUTHENTICATED.name
+    }
+    with patch("app.routers.user_routes.get_email_validator", return_value=validator):
+        response = await async_client.post("/register/", json=user_data)
+    assert response.status_code == 422
+    assert "Invalid email address" in response.json()["detail"]
+
 @pytest.mark.asyncio
 async def test_create_user_invalid_email(async_client):
     user_data = {
@@ -190,3 +212,143 @@ async def test_list_users_unauthorized(async_client, user_token):
         headers={"Authorization": f"Bearer {user_token}"}
     )
     assert response.status_code == 403  # Forbidden, as expected for regular user
+
+@pytest.mark.asyncio
+async def test_get_user_logins_as_admin(async_client, admin_user, admin_token):
+    response = await async_client.get(
+        f"/users/{admin_user.id}/logins/",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+@pytest.mark.asyncio
+async def test_get_user_logins_as_manager(async_client, admin_user, manager_token):
+    response = await async_client.get(
+        f"/users/{admin_user.id}/logins/",
+        headers={"Authorization": f"Bearer {manager_token}"}
+    )
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_profile_picture_versioned_url_is_immutable(async_client, db_session, verified_user, memory_storage):
+    verified_user.profile_picture_url = avatar_blob_name(hashlib.sha256(b"jpeg").hexdigest())
+    await db_session.commit()
+    info = memory_storage.put(verified_user.profile_picture_url, b"jpeg", "image/jpeg")
+    version = content_version(verified_user.profile_picture_url)
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", params={"v": version})
+    assert response.status_code == 200
+    assert response.content == b"jpeg"
+    assert response.headers["etag"] == f'"{info.etag}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/")
+    assert response.headers["cache-control"] == "public, no-cache"
+
+@pytest.mark.asyncio
+async def test_profile_picture_if_none_match_skips_body(async_client, db_session, verified_user, memory_storage):
+    verified_user.profile_picture_url = avatar_blob_name(hashlib.sha256(b"jpeg").hexdigest())
+    await db_session.commit()
+    info = memory_storage.put(verified_user.profile_picture_url, b"jpeg", "image/jpeg")
+
+    with patch.object(memory_storage, "open") as open_object:
+        response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", headers={"If-None-Match": f'"{info.etag}"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == f'"{info.etag}"'
+    open_object.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_profile_picture_proxy_cache_lifetime(async_client, db_session, verified_user, memory_storage, monkeypatch):
+    monkeypatch.setattr("app.routers.user_routes.settings.avatar_proxy_cache_seconds", 5)
+    verified_user.profile_picture_url = avatar_blob_name(hashlib.sha256(b"jpeg").hexdigest())
+    await db_session.commit()
+    memory_storage.put(verified_user.profile_picture_url, b"jpeg", "image/jpeg")
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/")
+    assert response.headers["x-accel-expires"] == "5"
+
+    version = content_version(verified_user.profile_picture_url)
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", params={"v": version})
+    assert "x-accel-expires" not in response.headers
+
+@pytest.mark.asyncio
+async def test_default_profile_picture_accel_redirect(async_client, db_session, verified_user, memory_storage, monkeypatch):
+    monkeypatch.setattr("app.routers.user_routes.settings.avatar_default_accel_redirect", "/_avatars/DefaultUser.jpg")
+    verified_user.profile_picture_url = "DefaultUser.jpg"
+    await db_session.commit()
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/")
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/_avatars/DefaultUser.jpg"
+    assert response.content == b""
+    assert len(memory_storage) == 0
+
+@pytest.fixture
+def presigning_storage(memory_storage, monkeypatch):
+    monkeypatch.setattr(memory_storage, "can_presign", True, raising=False)
+    monkeypatch.setattr(memory_storage, "presigned_url", lambda name, expires: f"http://minio/{name}?X-Amz-Signature=abc")
+    return memory_storage
+
+@pytest.mark.asyncio
+async def test_profile_picture_redirect_mode(async_client, db_session, verified_user, presigning_storage, monkeypatch):
+    monkeypatch.setattr("app.routers.user_routes.settings.avatar_delivery_mode", "redirect")
+    verified_user.profile_picture_url = avatar_blob_name(hashlib.sha256(b"jpeg").hexdigest())
+    await db_session.commit()
+    presigning_storage.put(verified_user.profile_picture_url, b"jpeg", "image/jpeg")
+
+    # No renditions were stored for this picture, so the original is presigned instead.
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", params={"size": 32})
+    assert response.status_code == 302
+    assert response.headers["location"].startswith(f"http://minio/{verified_user.profile_picture_url}?")
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+@pytest.mark.asyncio
+async def test_list_users_embeds_avatar_urls(async_client, admin_token, verified_user, presigning_storage):
+    presigning_storage.put("DefaultUser.jpg", b"default", "image/jpeg")
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.get("/users/", params={"include_avatar_urls": True}, headers=headers)
+    assert response.status_code == 200
+    assert all("X-Amz-Signature=" in user["profile_picture_href"] for user in response.json()["items"])
+
+@pytest.mark.asyncio
+async def test_profile_picture_rendition_negotiation(async_client, db_session, verified_user, memory_storage):
+    verified_user.profile_picture_url = avatar_blob_name(hashlib.sha256(b"jpeg").hexdigest())
+    await db_session.commit()
+    stem = verified_user.profile_picture_url[:-len(".jpg")]
+    for name, content_type in ((verified_user.profile_picture_url, "image/jpeg"), (f"{stem}_64.webp", "image/webp"),
+                               (f"{stem}_32.jpg", "image/jpeg")):
+        memory_storage.put(name, name.encode(), content_type)
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", params={"size": 40},
+                                      headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept"
+    assert response.content == f"{stem}_64.webp".encode()
+
+    response = await async_client.get(f"/users/{verified_user.id}/profile-picture/", params={"size": 32, "format": "jpeg"})
+    assert response.content == f"{stem}_32.jpg".encode()
+
+@pytest.mark.asyncio
+async def test_upload_profile_picture_rejects_oversized_upload(async_client, verified_user):
+    files = {"file": ("big.jpg", b"\0" * (3 * 1024 * 1024), "image/jpeg")}
+    response = await async_client.post(f"/users/{verified_user.id}/profile-picture/", files=files)
+    assert response.status_code == 413
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), "blue").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.mark.asyncio
+async def test_identical_reupload_skips_processing(async_client, verified_user, memory_storage):
+    files = {"file": ("me.png", _png_bytes(), "image/png")}
+    first = await async_client.post(f"/users/{verified_user.id}/profile-picture/", files=files)
+    assert first.status_code == 200
+    stored = len(memory_storage)
+
+    with patch("app.routers.user_routes.render_profile_picture") as render:
+        second = await async_client.post(f"/users/{verified_user.id}/profile-picture/", files=files)
+    assert second.json() == first.json()
+    render.assert_not_called()
+    assert len(memory_storage) == stored
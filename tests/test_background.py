@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from app.utils.background import PeriodicTask
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_periodic_task_runs_until_stopped():
+    calls = []
+
+    async def job():
+        calls.append(1)
+
+    task = PeriodicTask("test-job", 0.01, job)
+    task.start()
+    await asyncio.sleep(0.05)
+    await task.stop()
+    count = len(calls)
+    assert count >= 2
+    assert not task.running
+    await asyncio.sleep(0.03)
+    assert len(calls) == count
+
+
+async def test_periodic_task_trigger_runs_early():
+    calls = []
+
+    async def job():
+        calls.append(1)
+
+    task = PeriodicTask("test-job", 60, job)
+    task.start()
+    await asyncio.sleep(0.01)
+    task.trigger()
+    await asyncio.sleep(0.01)
+    await task.stop()
+    assert len(calls) == 2
+
+
+async def test_periodic_task_survives_errors():
+    calls = []
+
+    async def job():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    task = PeriodicTask("test-job", 0.01, job)
+    task.start()
+    await asyncio.sleep(0.05)
+    await task.stop()
+    assert len(calls) >= 2
+
+
+async def test_periodic_task_runs_on_stop():
+    calls = []
+
+    async def job():
+        calls.append(1)
+
+    task = PeriodicTask("test-job", 60, job, run_on_stop=True)
+    task.start()
+    await asyncio.sleep(0.01)
+    await task.stop()
+    assert len(calls) == 2
@@ -0,0 +1,64 @@
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from app.container import Container, get_container, set_container
+from app.dependencies import get_email_service, get_settings
+
+
+@pytest.fixture
+def container():
+    return Container(get_settings())
+
+
+def test_get_settings_is_parsed_once():
+    assert get_settings() is get_settings()
+
+
+def test_singletons_are_shared(container):
+    assert container.email_service is container.email_service
+    assert container.email_service.smtp_client is container.smtp_client
+    assert container.email_service.template_manager is container.template_manager
+
+
+def test_get_email_service_uses_container(container):
+    assert get_email_service(container) is container.email_service
+
+
+def test_get_container_returns_installed_container(container):
+    set_container(container)
+    try:
+        assert get_container() is container
+    finally:
+        set_container(None)
+
+
+def test_override_restores_singletons(container):
+    original = container.email_service
+    replacement = MagicMock()
+    with container.override(email_service=replacement):
+        assert container.email_service is replacement
+    assert container.email_service is original
+
+
+def test_override_of_unbuilt_singleton_is_removed(container):
+    with container.override(smtp_client=MagicMock()):
+        pass
+    assert "smtp_client" not in container.__dict__
+
+
+def test_start_warms_caches(container):
+    with patch("app.container.Database") as database, patch.object(container.template_manager, "get_compiled") as get_compiled:
+        container.start()
+    database.initialize.assert_called_once()
+    compiled = {call.args[0] for call in get_compiled.call_args_list}
+    assert "email_verification" in compiled
+    assert "header" not in compiled and "footer" not in compiled
+
+
+@pytest.mark.asyncio
+async def test_close_quits_smtp_sessions_off_the_event_loop(container):
+    closed_on = []
+    smtp_client = MagicMock(close=lambda: closed_on.append(threading.current_thread()))
+    with container.override(smtp_client=smtp_client), patch("app.container.Database.dispose", AsyncMock()):
+        await container.close()
+    assert closed_on and closed_on[0] is not threading.main_thread()
@@ -0,0 +1,60 @@
+import io
+import pytest
+from PIL import Image
+from app.utils import image_processing
+from app.utils.image_processing import (
+    InvalidImageError, process_profile_picture, render_renditions, resize_profile_picture,
+)
+
+
+def _image_bytes(size, format="JPEG"):
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("size, format", [((3000, 2000), "JPEG"), ((100, 400), "PNG")])
+def test_output_is_profile_sized_jpeg(size, format):
+    image = Image.open(io.BytesIO(process_profile_picture(_image_bytes(size, format))))
+    assert image.format == "JPEG"
+    assert image.size == (236, 236)
+    assert image.mode == "RGB"
+
+
+def test_rejects_non_images():
+    with pytest.raises(InvalidImageError):
+        process_profile_picture(b"not an image")
+
+
+def test_rejects_too_many_pixels_before_decoding():
+    with pytest.raises(InvalidImageError, match="pixels"):
+        process_profile_picture(_image_bytes((200, 200)), max_pixels=10_000)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 1])
+async def test_resize_runs_off_the_event_loop(monkeypatch, workers):
+    monkeypatch.setattr("app.utils.image_processing.settings.image_process_workers", workers)
+    try:
+        resized = await resize_profile_picture(_image_bytes((640, 480)))
+        assert Image.open(io.BytesIO(resized)).size == (236, 236)
+        with pytest.raises(InvalidImageError):
+            await resize_profile_picture(b"not an image")
+    finally:
+        image_processing.shutdown_executor()
+
+
+def test_renditions_are_rendered_in_one_pass():
+    renditions = render_renditions(_image_bytes((1200, 900)), [236, 32, 64], ["jpeg", "webp"])
+    assert set(renditions) == {(size, format) for size in (32, 64, 236) for format in ("jpeg", "webp")}
+    for (size, format), data in renditions.items():
+        image = Image.open(io.BytesIO(data))
+        assert image.size == (size, size)
+        assert image.format == format.upper()
+
+
+def test_decodes_from_a_file_path(tmp_path):
+    path = tmp_path / "upload.png"
+    path.write_bytes(_image_bytes((300, 200), "PNG"))
+    renditions = render_renditions(str(path), [64], ["jpeg"])
+    assert Image.open(io.BytesIO(renditions[(64, "jpeg")])).size == (64, 64)
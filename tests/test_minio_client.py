@@ -1,151 +1,262 @@
-import io
 import os
+import threading
 import pytest
 from unittest.mock import patch, MagicMock
-from minio.error import S3Error
+from app.storage import MemoryStorage, StorageError, set_storage
 
 # Import the entire module (to allow proper patching)
 import app.utils.minio_client as minio_module
 
 # Aliases to avoid rebinding and allow patching to take effect
-ensure_bucket = minio_module.ensure_bucket
 save_image = minio_module.save_image
-get_image = minio_module.get_image
 upload_default_image_if_missing = minio_module.upload_default_image_if_missing
 
-BUCKET_NAME = minio_module.BUCKET_NAME
 DEFAULT_IMAGE_NAME = minio_module.DEFAULT_IMAGE_NAME
 DEFAULT_IMAGE_PATH = minio_module.DEFAULT_IMAGE_PATH
 
 
 @pytest.fixture
-def mock_minio_client():
-    """Fixture to patch minio_client inside the actual module under test."""
-    with patch('app.utils.minio_client.minio_client') as mock_client:
-        yield mock_client
+def storage():
+    """Install an in-memory storage backend for the module under test."""
+    storage = MemoryStorage()
+    set_storage(storage)
+    yield storage
+    set_storage(None)
 
 
-class TestMinioStorage:
-    """Test the MinIO storage functionality."""
-
-    def test_ensure_bucket_exists(self, mock_minio_client):
-        mock_minio_client.bucket_exists.return_value = True
-        ensure_bucket()
-        mock_minio_client.bucket_exists.assert_called_once_with(BUCKET_NAME)
-        mock_minio_client.make_bucket.assert_not_called()
-
-    def test_ensure_bucket_not_exists(self, mock_minio_client):
-        mock_minio_client.bucket_exists.return_value = False
-        ensure_bucket()
-        mock_minio_client.bucket_exists.assert_called_once_with(BUCKET_NAME)
-        mock_minio_client.make_bucket.assert_called_once_with(BUCKET_NAME)
+class TestImageStorage:
+    """Test the image functions on top of the storage backend."""
 
     @pytest.mark.asyncio
-    async def test_save_image(self, mock_minio_client):
+    async def test_save_image(self, storage):
         file_data = b"test image data"
         file_name = "test_image.jpg"
 
         result = await save_image(file_data, file_name)
 
-        assert mock_minio_client.put_object.called
-        args, kwargs = mock_minio_client.put_object.call_args
-
-        assert args[0] == BUCKET_NAME
-        assert args[1] == file_name
-        assert isinstance(kwargs["data"], io.BytesIO)
-        assert kwargs["length"] == len(file_data)
-        assert kwargs["content_type"] == "image/jpeg"
         assert result == file_name
+        assert storage.read(file_name) == file_data
+        assert storage.stat(file_name).content_type == "image/jpeg"
 
-    def test_get_image_success(self, mock_minio_client):
-        file_name = "existing_image.jpg"
-        mock_response = MagicMock()
-        mock_response.read.return_value = b"test image data"
-        mock_minio_client.get_object.return_value = mock_response
-
-        result = get_image(file_name)
-        mock_minio_client.get_object.assert_called_once_with(BUCKET_NAME, file_name)
-        assert isinstance(result, io.BytesIO)
-        assert result.getvalue() == b"test image data"
-
-    def test_get_image_not_found(self, mock_minio_client):
-        file_name = "non_existing_image.jpg"
-        mock_error = S3Error(
-            code="NoSuchKey",
-            message="The specified key does not exist",
-            resource=f"{BUCKET_NAME}/{file_name}",
-            request_id="req-id",
-            host_id="host-id",
-            response=MagicMock()
-        )
-        mock_minio_client.get_object.side_effect = mock_error
-
-        with pytest.raises(S3Error):
-            get_image(file_name)
-
-        mock_minio_client.get_object.assert_called_once_with(BUCKET_NAME, file_name)
-
-    def test_upload_default_image_already_exists(self, mock_minio_client):
-        mock_minio_client.stat_object.return_value = MagicMock()
-        upload_default_image_if_missing()
-        mock_minio_client.stat_object.assert_called_once_with(BUCKET_NAME, DEFAULT_IMAGE_NAME)
-        mock_minio_client.fput_object.assert_not_called()
+    @pytest.mark.asyncio
+    async def test_blocking_calls_leave_event_loop(self, storage):
+        loop_thread = threading.get_ident()
+        threads = []
+        with patch.object(storage, "put", side_effect=lambda *args, **kwargs: threads.append(threading.get_ident())):
+            await save_image(b"data", "image.jpg")
+        assert threads and threads[0] != loop_thread
 
-    @patch('os.path.exists')
-    def test_upload_default_image_missing_uploads_file(self, mock_exists, mock_minio_client):
-        mock_error = S3Error(
-            code="NoSuchKey",
-            message="The specified key does not exist",
-            resource=f"{BUCKET_NAME}/{DEFAULT_IMAGE_NAME}",
-            request_id="req-id",
-            host_id="host-id",
-            response=MagicMock()
-        )
-        mock_minio_client.stat_object.side_effect = mock_error
-        mock_exists.return_value = True
+    def test_upload_default_image_already_exists(self, storage):
+        storage.put(DEFAULT_IMAGE_NAME, b"existing", "image/jpeg")
+        upload_default_image_if_missing()
+        assert storage.read(DEFAULT_IMAGE_NAME) == b"existing"
 
+    def test_upload_default_image_missing_uploads_file(self, storage):
         upload_default_image_if_missing()
 
-        mock_minio_client.stat_object.assert_called_once_with(BUCKET_NAME, DEFAULT_IMAGE_NAME)
-        mock_minio_client.fput_object.assert_called_once_with(
-            BUCKET_NAME,
-            DEFAULT_IMAGE_NAME,
-            DEFAULT_IMAGE_PATH,
-            content_type="image/jpeg"
-        )
+        with open(DEFAULT_IMAGE_PATH, "rb") as file:
+            assert storage.read(DEFAULT_IMAGE_NAME) == file.read()
+        assert storage.stat(DEFAULT_IMAGE_NAME).content_type == "image/jpeg"
 
     @patch('os.path.exists')
-    def test_upload_default_image_missing_file_not_found(self, mock_exists, mock_minio_client):
-        mock_error = S3Error(
-            code="NoSuchKey",
-            message="The specified key does not exist",
-            resource=f"{BUCKET_NAME}/{DEFAULT_IMAGE_NAME}",
-            request_id="req-id",
-            host_id="host-id",
-            response=MagicMock()
-        )
-        mock_minio_client.stat_object.side_effect = mock_error
+    def test_upload_default_image_missing_file_not_found(self, mock_exists, storage):
         mock_exists.return_value = False
 
         with pytest.raises(FileNotFoundError):
             upload_default_image_if_missing()
 
-        mock_minio_client.stat_object.assert_called_once_with(BUCKET_NAME, DEFAULT_IMAGE_NAME)
-        mock_minio_client.fput_object.assert_not_called()
-
-    def test_upload_default_image_other_s3_error(self, mock_minio_client):
-        mock_error = S3Error(
-            code="SomeOtherError",
-            message="Some other error occurred",
-            resource=f"{BUCKET_NAME}/{DEFAULT_IMAGE_NAME}",
-            request_id="req-id",
-            host_id="host-id",
-            response=MagicMock()
-        )
-        mock_minio_client.stat_object.side_effect = mock_error
-
-        with pytest.raises(S3Error):
-            upload_default_image_if_missing()
+        assert not storage.exists(DEFAULT_IMAGE_NAME)
+
+    def test_upload_default_image_other_storage_error(self, storage):
+        with patch.object(storage, "stat", side_effect=StorageError("unreachable")), \
+                patch.object(storage, "put_file") as put_file:
+            with pytest.raises(StorageError):
+                upload_default_image_if_missing()
+        put_file.assert_not_called()
+
+
+class TestImageStreaming:
+    @pytest.mark.parametrize("header, expected", [
+        ("bytes=0-99", "bytes=0-99"),
+        ("bytes=100-", "bytes=100-"),
+        ("bytes=-500", "bytes=-500"),
+        ("bytes=0-1,5-9", None),
+        ("items=0-1", None),
+        (None, None),
+    ])
+    def test_single_byte_range(self, header, expected):
+        assert minio_module.single_byte_range(header) == expected
+
+    @pytest.mark.asyncio
+    async def test_open_image_streams_in_chunks_and_releases(self, storage):
+        body = os.urandom(200 * 1024)
+        storage.put("image.jpg", body, "image/jpeg")
+
+        image = await minio_module.open_image("image.jpg")
+        with patch.object(image._reader, "close", wraps=image._reader.close) as close:
+            chunks = [chunk async for chunk in image.chunks()]
+
+        assert b"".join(chunks) == body
+        assert max(len(chunk) for chunk in chunks) == minio_module.STREAM_CHUNK_SIZE
+        assert image.headers["Content-Length"] == str(len(body))
+        close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_open_image_forwards_range(self, storage):
+        storage.put("image.jpg", b"x" * 5000, "image/jpeg")
+
+        image = await minio_module.open_image("image.jpg", "bytes=0-99")
+        response = image.to_response()
+
+        assert response.status_code == 206
+        assert response.headers["content-range"] == "bytes 0-99/5000"
+        assert response.headers["content-length"] == "100"
+        assert response.headers["accept-ranges"] == "bytes"
+        image.close()
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_is_released_once(self):
+        reader = MagicMock(status=200, headers={})
+        with patch("app.utils.minio_client.get_storage") as get_storage:
+            get_storage.return_value.open.return_value = reader
+            image = await minio_module.open_image("image.jpg")
+        image.close()
+        image.close()
+        reader.close.assert_called_once()
+
+
+class TestVersionedNames:
+    def test_per_user_hashed_names_keep_their_version(self):
+        assert minio_module.content_version("user_0123456789abcdef.jpg") == "0123456789abcdef"
+
+    def test_legacy_names_have_no_version(self):
+        assert minio_module.content_version("user_profile_picture.jpg") is None
+        assert minio_module.content_version(DEFAULT_IMAGE_NAME) is None
+        assert minio_module.content_version(None) is None
+
+    @pytest.mark.parametrize("header, matches", [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ("*", True),
+        ('"xyz"', False),
+        (None, False),
+    ])
+    def test_etag_matches(self, header, matches):
+        assert minio_module.etag_matches(header, '"abc"') is matches
+
+
+class TestPresignedUrls:
+    def test_urls_are_reused_until_refresh(self, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr("app.utils.minio_client.time.monotonic", lambda: clock[0])
+        cache = minio_module.PresignedUrlCache(ttl=900, refresh=120)
+        with patch("app.utils.minio_client.get_storage") as get_storage:
+            presigned_url = get_storage.return_value.presigned_url
+            presigned_url.side_effect = lambda name, expires: f"{name}?{clock[0]}"
+
+            url, max_age = cache.get("image.jpg")
+            assert max_age == 780
+            clock[0] += 700
+            assert cache.get("image.jpg") == (url, 80)
+            clock[0] += 80
+            assert cache.get("image.jpg")[0] != url
+            assert presigned_url.call_count == 2
+
+    def test_cache_is_bounded(self):
+        cache = minio_module.PresignedUrlCache(max_size=2)
+        with patch("app.utils.minio_client.get_storage"):
+            for name in ("a.jpg", "b.jpg", "c.jpg"):
+                cache.get(name)
+        assert list(cache._entries) == ["b.jpg", "c.jpg"]
+
+
+class TestFirstExisting:
+    @pytest.mark.asyncio
+    async def test_falls_back_to_an_existing_object(self, storage):
+        storage.put("user_1.jpg", b"jpeg", "image/jpeg")
+        cache = minio_module.PresignedUrlCache()
+        with patch.object(storage, "presigned_url", side_effect=lambda name, expires: f"https://minio/{name}"):
+            found = await cache.first_existing(["user_1_64.webp", "user_1.jpg", DEFAULT_IMAGE_NAME])
+        assert found[:2] == ("user_1.jpg", "https://minio/user_1.jpg")
+
+    @pytest.mark.asyncio
+    async def test_existence_is_looked_up_once(self, storage):
+        storage.put("user_1.jpg", b"jpeg", "image/jpeg")
+        cache = minio_module.PresignedUrlCache()
+        with patch.object(storage, "presigned_url", return_value="https://minio/url"), \
+                patch.object(storage, "exists", wraps=storage.exists) as exists:
+            for _ in range(3):
+                await cache.first_existing(["user_1_64.webp", "user_1.jpg"])
+        assert exists.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_nothing_exists(self, storage):
+        assert await minio_module.PresignedUrlCache().first_existing(["missing.jpg"]) is None
+
+
+def test_rendition_names():
+    name = minio_module.avatar_blob_name("0a" * 32)
+    stem = name[:-len(".jpg")]
+    assert minio_module.rendition_name(name, 236, "jpeg", 236) == name
+    assert minio_module.rendition_name(name, 32, "jpeg", 236) == f"{stem}_32.jpg"
+    assert minio_module.rendition_name(name, 236, "webp", 236) == f"{stem}_236.webp"
+    assert minio_module.content_version(minio_module.rendition_name(name, 32, "jpeg", 236)) is None
+
+
+class TestAvatarCache:
+    def _image(self, size):
+        return minio_module.CachedImage(b"x" * size, '"etag"')
+
+    def test_evicts_least_recently_used_past_byte_budget(self):
+        cache = minio_module.AvatarCache(max_bytes=300, max_item_bytes=200)
+        cache.put("a.jpg", self._image(100))
+        cache.put("b.jpg", self._image(100))
+        cache.get("a.jpg")
+        cache.put("c.jpg", self._image(150))
+        assert list(cache._entries) == ["a.jpg", "c.jpg"]
+        assert cache.size == 250
+
+    def test_large_objects_are_not_cached(self):
+        cache = minio_module.AvatarCache(max_bytes=1000, max_item_bytes=100)
+        cache.put("big.jpg", self._image(101))
+        assert len(cache) == 0
+        assert not cache.fits("101") and cache.fits("100") and not cache.fits(None)
+
+    def test_cached_image_answers_conditional_requests(self):
+        image = self._image(4)
+        assert image.to_response('"etag"').status_code == 304
+        response = image.to_response(None, {"Cache-Control": "public, no-cache"})
+        assert response.body == image.data
+        assert response.headers["etag"] == '"etag"'
+        assert response.headers["cache-control"] == "public, no-cache"
+
+    @pytest.mark.asyncio
+    async def test_small_objects_are_cached_on_first_read(self, storage, monkeypatch):
+        monkeypatch.setattr(minio_module, "avatar_cache", minio_module.AvatarCache())
+        info = storage.put("a.webp", b"webp", "image/webp")
+
+        image = await minio_module.open_cacheable_image("a.webp")
+        assert image == minio_module.CachedImage(b"webp", f'"{info.etag}"', "image/webp")
+        assert minio_module.cached_image("a.webp") is image
+
+
+def test_default_image_is_served_from_memory(monkeypatch):
+    monkeypatch.setattr(minio_module, "default_image", None)
+    image = minio_module.load_default_image()
+    with open(DEFAULT_IMAGE_PATH, "rb") as file:
+        assert image.data == file.read()
+    assert minio_module.cached_image(DEFAULT_IMAGE_NAME) is image
+    assert minio_module.is_default_image(DEFAULT_IMAGE_PATH)
+    assert minio_module.is_default_image(None)
+    assert not minio_module.is_default_image("user_0123456789abcdef.jpg")
+
 
-        mock_minio_client.stat_object.assert_called_once_with(BUCKET_NAME, DEFAULT_IMAGE_NAME)
-        mock_minio_client.fput_object.assert_not_called()
+def test_avatar_blob_names():
+    digest = "0f" * 32
+    name = minio_module.avatar_blob_name(digest)
+    assert minio_module.avatar_blob_digest(name) == digest
+    assert minio_module.content_version(name) == digest
+    assert minio_module.avatar_blob_digest(minio_module.rendition_name(name, 32, "webp", 236)) is None
+    assert minio_module.avatar_blob_digest("user_0123456789abcdef.jpg") is None
+    assert minio_module.avatar_blob_digest(None) is None
@@ -0,0 +1,54 @@
+import re
+from uuid import UUID, uuid4
+import pytest
+from app.utils.nickname_gen import (
+    ADJECTIVES, ANIMALS, MAX_WORD_LENGTH, generate_nickname, generate_nickname_batch,
+    load_word_list, namespace_size, nickname_with_suffix,
+)
+
+NICKNAME_PATTERN = re.compile(r'^[\w-]+$')
+
+
+def test_generate_nickname_format():
+    adjective, animal, number = generate_nickname().split("_")
+    assert adjective in ADJECTIVES
+    assert animal in ANIMALS
+    assert 0 <= int(number) <= 9999
+
+
+def test_namespace_is_large():
+    assert namespace_size() > 100_000_000
+
+
+def test_generate_nickname_batch_is_distinct():
+    batch = generate_nickname_batch(50)
+    assert 0 < len(batch) <= 50
+    assert len(set(batch)) == len(batch)
+
+
+def test_nickname_with_suffix_fits_column():
+    nickname = nickname_with_suffix(UUID(int=2**128 - 1))
+    assert len(nickname) <= 50
+    assert NICKNAME_PATTERN.match(nickname)
+
+
+def test_nickname_with_suffix_is_unique_per_user():
+    suffixes = {nickname_with_suffix(uuid4()).rsplit("_", 1)[1] for _ in range(1000)}
+    assert len(suffixes) == 1000
+
+
+def test_load_word_list_default():
+    assert load_word_list(None, ADJECTIVES) == ADJECTIVES
+
+
+def test_load_word_list_from_file(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("Otter\nbadger\n\notter\n", encoding="utf-8")
+    assert load_word_list(str(path)) == ("otter", "badger")
+
+
+def test_load_word_list_rejects_long_words(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("x" * (MAX_WORD_LENGTH + 1), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_word_list(str(path))
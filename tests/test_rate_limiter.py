@@ -0,0 +1,29 @@
+import time
+import pytest
+from app.utils.rate_limiter import RateLimiter
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_rate_limiter_allows_burst_immediately():
+    limiter = RateLimiter(rate=100, burst=10)
+    start = time.monotonic()
+    for _ in range(10):
+        await limiter.acquire()
+    assert time.monotonic() - start < 0.05
+
+
+async def test_rate_limiter_paces_to_rate():
+    limiter = RateLimiter(rate=100, burst=1)
+    start = time.monotonic()
+    await limiter.acquire(1)
+    await limiter.acquire(10)
+    await limiter.acquire(10)
+    assert time.monotonic() - start >= 0.15
+
+
+async def test_rate_limiter_disabled():
+    limiter = RateLimiter(rate=0)
+    start = time.monotonic()
+    await limiter.acquire(1_000_000)
+    assert time.monotonic() - start < 0.05
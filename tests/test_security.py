@@ -1,7 +1,11 @@
 # test_security.py
 from builtins import RuntimeError, ValueError, isinstance, str
+import uuid
 import pytest
-from app.utils.security import hash_password, verify_password
+from app.utils.security import (
+    RESET_PASSWORD_PURPOSE, VERIFY_EMAIL_PURPOSE, generate_signed_token, hash_password, read_signed_token,
+    verify_password,
+)
 
 def test_hash_password():
     """Test that hashing password returns a bcrypt hashed string."""
@@ -65,3 +69,27 @@ def test_hash_password_internal_error(monkeypatch):
     with pytest.raises(ValueError):
         hash_password("test")
 
+
+def test_signed_token_round_trip():
+    user_id = uuid.uuid4()
+    token = generate_signed_token("key", VERIFY_EMAIL_PURPOSE, user_id, 3, 60)
+    claims = read_signed_token("key", VERIFY_EMAIL_PURPOSE, token)
+    assert claims.user_id == user_id
+    assert claims.version == 3
+
+@pytest.mark.parametrize("secret_key, purpose", [
+    ("other-key", VERIFY_EMAIL_PURPOSE),
+    ("key", RESET_PASSWORD_PURPOSE),
+])
+def test_signed_token_rejects_wrong_key_or_purpose(secret_key, purpose):
+    token = generate_signed_token("key", VERIFY_EMAIL_PURPOSE, uuid.uuid4(), 0, 60)
+    assert read_signed_token(secret_key, purpose, token) is None
+
+def test_signed_token_rejects_tampering_and_expiry():
+    token = generate_signed_token("key", VERIFY_EMAIL_PURPOSE, uuid.uuid4(), 0, 60)
+    payload, signature = token.split(".")
+    forged = generate_signed_token("key", VERIFY_EMAIL_PURPOSE, uuid.uuid4(), 0, 60).split(".")[0]
+    assert read_signed_token("key", VERIFY_EMAIL_PURPOSE, f"{forged}.{signature}") is None
+    assert read_signed_token("key", VERIFY_EMAIL_PURPOSE, "not-a-token") is None
+    expired = generate_signed_token("key", VERIFY_EMAIL_PURPOSE, uuid.uuid4(), 0, -1)
+    assert read_signed_token("key", VERIFY_EMAIL_PURPOSE, expired) is None
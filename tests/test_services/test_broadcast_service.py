@@ -0,0 +1,173 @@
+import pytest
+from html import escape
+from unittest.mock import MagicMock
+from sqlalchemy import update
+from app.models.broadcast_job_model import BroadcastJob, BroadcastSegment, BroadcastStatus
+from app.services.broadcast_service import BroadcastService
+from app.services.email_service import EmailService
+from app.utils.smtp_connection import SMTPBatchError
+from app.utils.template_manager import TemplateManager
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def smtp_client():
+    client = MagicMock(pool_size=4)
+    client.send_emails.return_value = []
+    return client
+
+
+@pytest.fixture
+def broadcast_email_service(smtp_client):
+    return EmailService(template_manager=TemplateManager(), smtp_client=smtp_client)
+
+
+@pytest.fixture(autouse=True)
+def broadcast_settings(monkeypatch):
+    monkeypatch.setattr("app.services.broadcast_service.settings.broadcast_batch_size", 20)
+    monkeypatch.setattr("app.services.broadcast_service.settings.broadcast_concurrency", 3)
+    monkeypatch.setattr("app.services.broadcast_service.settings.broadcast_rate_per_second", 0)
+
+
+def _recipients(smtp_client):
+    return [message[2] for call in smtp_client.send_emails.call_args_list for message in call.args[0]]
+
+
+async def test_create_job_rejects_unknown_placeholder(db_session):
+    with pytest.raises(ValueError):
+        await BroadcastService.create_job(db_session, BroadcastSegment.LOCKED, "Hi", "Hello {password}")
+
+
+async def test_create_job_counts_segment(db_session, locked_user, verified_user):
+    job = await BroadcastService.create_job(db_session, BroadcastSegment.LOCKED, "Hi", "Hello {name}")
+    assert job.status == BroadcastStatus.PENDING
+    assert job.total_recipients == 1
+
+
+async def test_run_job_streams_segment_in_batches(db_session, users_with_same_role_50_users, admin_user,
+                                                   broadcast_email_service, smtp_client):
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name} ({nickname})")
+    job = await BroadcastService.claim_job(db_session)
+    assert job.status == BroadcastStatus.RUNNING
+
+    assert await BroadcastService.run_job(db_session, job, broadcast_email_service) == BroadcastStatus.COMPLETED
+
+    recipients = _recipients(smtp_client)
+    assert sorted(recipients) == sorted(user.email for user in users_with_same_role_50_users)
+    assert smtp_client.send_emails.call_count == 9
+    user = users_with_same_role_50_users[0]
+    html_by_recipient = {message[2]: message[1] for call in smtp_client.send_emails.call_args_list for message in call.args[0]}
+    assert escape(f"Hello {user.first_name} ({user.nickname})") in html_by_recipient[user.email]
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.status == BroadcastStatus.COMPLETED
+    assert job.sent_count == 50
+    assert job.last_user_id == max(user.id for user in users_with_same_role_50_users)
+    assert await BroadcastService.claim_job(db_session) is None
+
+
+async def test_run_job_resumes_from_checkpoint(db_session, users_with_same_role_50_users, broadcast_email_service, smtp_client):
+    created = await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    checkpoint = sorted(user.id for user in users_with_same_role_50_users)[29]
+    await db_session.execute(
+        update(BroadcastJob).where(BroadcastJob.id == created.id)
+        .values(status=BroadcastStatus.RUNNING, last_user_id=checkpoint, sent_count=30)
+    )
+    await db_session.commit()
+
+    job = await BroadcastService.claim_job(db_session)
+    await BroadcastService.run_job(db_session, job, broadcast_email_service)
+
+    assert len(_recipients(smtp_client)) == 20
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.sent_count == 50
+
+
+async def test_refused_recipients_are_counted(db_session, users_with_same_role_50_users, broadcast_email_service, smtp_client):
+    smtp_client.send_emails.side_effect = lambda messages: [(messages[0][2], Exception("refused"))]
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+    await BroadcastService.run_job(db_session, job, broadcast_email_service)
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.failed_count == 9
+    assert job.sent_count == 41
+
+
+async def test_smtp_outage_does_not_skip_recipients(db_session, users_with_same_role_50_users, broadcast_email_service, smtp_client):
+    smtp_client.send_emails.side_effect = ConnectionRefusedError("refused")
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+
+    with pytest.raises(ConnectionRefusedError):
+        await BroadcastService.run_job(db_session, job, broadcast_email_service)
+
+    await db_session.rollback()
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.status == BroadcastStatus.RUNNING
+    assert job.last_user_id is None
+    assert job.failed_count == 0
+
+
+async def test_interrupted_batch_is_not_sent_twice(db_session, users_with_same_role_50_users, broadcast_email_service, smtp_client):
+    interrupted = []
+
+    def send_emails(messages):
+        if not interrupted:
+            interrupted.append(messages)
+            raise SMTPBatchError(ConnectionResetError("dropped"), 3, [])
+        return []
+
+    smtp_client.send_emails.side_effect = send_emails
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+    with pytest.raises(SMTPBatchError):
+        await BroadcastService.run_job(db_session, job, broadcast_email_service)
+    await db_session.execute(update(BroadcastJob).where(BroadcastJob.id == job.id).values(lease_expires_at=None))
+    await db_session.commit()
+
+    job = await BroadcastService.claim_job(db_session)
+    assert await BroadcastService.run_job(db_session, job, broadcast_email_service) == BroadcastStatus.COMPLETED
+
+    delivered = []
+    for call in smtp_client.send_emails.call_args_list:
+        messages = call.args[0]
+        delivered += [message[2] for message in (messages[:3] if messages is interrupted[0] else messages)]
+    assert sorted(delivered) == sorted(user.email for user in users_with_same_role_50_users)
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.sent_count == 50
+    assert job.sent_ahead_user_ids is None
+
+
+async def test_job_fails_after_max_attempts(db_session, locked_user, monkeypatch):
+    monkeypatch.setattr("app.services.broadcast_service.settings.broadcast_max_attempts", 2)
+    await BroadcastService.create_job(db_session, BroadcastSegment.LOCKED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+
+    assert await BroadcastService.record_failure(db_session, job.id, "SMTP is down") == BroadcastStatus.RUNNING
+    assert await BroadcastService.record_failure(db_session, job.id, "SMTP is still down") == BroadcastStatus.FAILED
+
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.status == BroadcastStatus.FAILED
+    assert job.failed_attempts == 2
+    assert job.last_error == "SMTP is still down"
+
+
+async def test_concurrency_leaves_a_session_for_transactional_email(db_session, users_with_same_role_50_users,
+                                                                    broadcast_email_service, smtp_client):
+    smtp_client.pool_size = 2
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+    await BroadcastService.run_job(db_session, job, broadcast_email_service)
+    assert smtp_client.send_emails.call_count == 3
+
+
+async def test_cancelled_job_stops_at_checkpoint(db_session, users_with_same_role_50_users, broadcast_email_service, smtp_client):
+    await BroadcastService.create_job(db_session, BroadcastSegment.AUTHENTICATED, "News", "Hello {name}")
+    job = await BroadcastService.claim_job(db_session)
+    await BroadcastService.cancel_job(db_session, job.id)
+
+    assert await BroadcastService.run_job(db_session, job, broadcast_email_service) == BroadcastStatus.CANCELLED
+    assert len(_recipients(smtp_client)) == 20
+    job = await BroadcastService.get_job(db_session, job.id)
+    assert job.status == BroadcastStatus.CANCELLED
+    assert job.sent_count == 0
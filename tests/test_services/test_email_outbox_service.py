@@ -0,0 +1,130 @@
+import smtplib
+import pytest
+from datetime import timedelta
+from unittest.mock import MagicMock
+from sqlalchemy import select, update
+from app.models.email_outbox_model import EmailOutbox, OutboxStatus
+from app.services.email_outbox_service import EmailOutboxService, retry_delay
+from app.services.email_service import EmailService
+from app.services.user_service import UserService
+from app.utils.metrics import Metrics
+from app.utils.smtp_connection import SMTPBatchError
+from app.utils.template_manager import TemplateManager
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def smtp_client():
+    client = MagicMock()
+    client.send_emails.return_value = []
+    return client
+
+
+@pytest.fixture
+def outbox_email_service(smtp_client):
+    return EmailService(template_manager=TemplateManager(), smtp_client=smtp_client)
+
+
+async def _queue(db_session, email_service, count=1):
+    for number in range(count):
+        user_data = {"name": "Test", "verification_url": "http://testserver/verify", "email": f"outbox{number}@example.com"}
+        await email_service.enqueue_user_email(db_session, user_data, 'email_verification')
+    await db_session.commit()
+
+
+async def _emails(db_session):
+    result = await db_session.execute(select(EmailOutbox).order_by(EmailOutbox.recipient).execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
+def test_retry_delay_doubles_and_caps():
+    assert [retry_delay(attempt, 30, 200) for attempt in range(1, 6)] == [30, 60, 120, 200, 200]
+
+
+async def test_create_user_queues_verification_email(db_session, outbox_email_service, smtp_client, user, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.email_outbox_enabled", True)
+    user_data = {
+        "email": "outbox_signup@example.com",
+        "password": "ValidPassword123!",
+    }
+    new_user = await UserService.create(db_session, user_data, outbox_email_service)
+    smtp_client.send_email.assert_not_called()
+    emails = await _emails(db_session)
+    assert len(emails) == 1
+    assert emails[0].recipient == new_user.email
+    assert emails[0].status == OutboxStatus.PENDING
+    assert new_user.verification_token in emails[0].context["verification_url"]
+
+
+async def test_rollback_discards_queued_email(db_session, outbox_email_service):
+    await outbox_email_service.enqueue_user_email(db_session, {"name": "Test", "verification_url": "x", "email": "gone@example.com"}, 'email_verification')
+    await db_session.rollback()
+    assert await _emails(db_session) == []
+
+
+async def test_deliver_batch_sends_and_marks_sent(db_session, outbox_email_service, smtp_client):
+    await _queue(db_session, outbox_email_service, count=3)
+    assert await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=2) == 2
+    assert await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=2) == 1
+    assert smtp_client.send_emails.call_count == 2
+    emails = await _emails(db_session)
+    assert all(email.status == OutboxStatus.SENT and email.sent_at is not None for email in emails)
+    assert await EmailOutboxService.pending_stats(db_session) == (0, 0.0)
+
+
+async def test_claimed_emails_are_leased(db_session, outbox_email_service):
+    await _queue(db_session, outbox_email_service, count=2)
+    claimed = await EmailOutboxService.claim(db_session, batch_size=10, lease_seconds=60)
+    assert len(claimed) == 2
+    assert await EmailOutboxService.claim(db_session, batch_size=10, lease_seconds=60) == []
+
+
+async def test_refused_recipient_is_retried_with_backoff(db_session, outbox_email_service, smtp_client):
+    await _queue(db_session, outbox_email_service, count=2)
+    smtp_client.send_emails.return_value = [("outbox1@example.com", smtplib.SMTPRecipientsRefused({}))]
+    await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=10)
+    sent, retried = await _emails(db_session)
+    assert sent.status == OutboxStatus.SENT
+    assert retried.status == OutboxStatus.PENDING
+    assert retried.attempts == 1
+    assert retried.last_error is not None
+    assert retried.next_attempt_at >= retried.created_at + timedelta(seconds=29)
+    depth, _ = await EmailOutboxService.pending_stats(db_session)
+    assert depth == 1
+    assert Metrics.snapshot()["gauges"]["email_outbox_depth"] == 1
+
+
+async def test_smtp_outage_dead_letters_after_max_attempts(db_session, outbox_email_service, smtp_client, monkeypatch):
+    monkeypatch.setattr("app.services.email_outbox_service.settings.email_outbox_max_attempts", 2)
+    await _queue(db_session, outbox_email_service)
+    smtp_client.send_emails.side_effect = ConnectionRefusedError("SMTP is down")
+    for _ in range(2):
+        await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=10)
+        await db_session.execute(update(EmailOutbox).values(next_attempt_at=EmailOutbox.created_at))
+        await db_session.commit()
+    email, = await _emails(db_session)
+    assert email.status == OutboxStatus.DEAD
+    assert email.attempts == 2
+    assert "SMTP is down" in email.last_error
+
+
+async def test_interrupted_batch_retries_only_unsent_emails(db_session, outbox_email_service, smtp_client):
+    await _queue(db_session, outbox_email_service, count=3)
+    smtp_client.send_emails.side_effect = SMTPBatchError(ConnectionResetError("SMTP dropped"), 1, [])
+    await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=10)
+    emails = await _emails(db_session)
+    delivered = smtp_client.send_emails.call_args.args[0][0][2]
+    assert [email.recipient for email in emails if email.status == OutboxStatus.SENT] == [delivered]
+    retried = [email for email in emails if email.status == OutboxStatus.PENDING]
+    assert len(retried) == 2
+    assert all("SMTP dropped" in email.last_error for email in retried)
+
+
+async def test_unrenderable_email_is_dead_lettered(db_session, outbox_email_service, smtp_client):
+    db_session.add(EmailOutbox(email_type='email_verification', recipient="broken@example.com", context={"email": "broken@example.com"}))
+    await db_session.commit()
+    await EmailOutboxService.deliver_batch(db_session, outbox_email_service, batch_size=10)
+    email, = await _emails(db_session)
+    assert email.status == OutboxStatus.DEAD
+    smtp_client.send_emails.assert_not_called()
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+import pytest
+from sqlalchemy.exc import OperationalError
+from app.services.last_login_buffer import LastLoginBuffer, last_login_buffer, last_login_flusher
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_buffer_keeps_latest_login():
+    buffer = LastLoginBuffer(max_size=10)
+    user_id = uuid4()
+    now = datetime.now(timezone.utc)
+    buffer.add(user_id, now)
+    buffer.add(user_id, now - timedelta(seconds=5))
+    buffer.add(user_id, now + timedelta(seconds=5))
+    assert buffer.drain() == [(user_id, now + timedelta(seconds=5))]
+    assert len(buffer) == 0
+
+
+def test_buffer_is_bounded():
+    buffer = LastLoginBuffer(max_size=2)
+    now = datetime.now(timezone.utc)
+    first, second = uuid4(), uuid4()
+    assert buffer.add(first, now)
+    assert buffer.add(second, now)
+    assert not buffer.add(uuid4(), now)
+    assert buffer.add(first, now + timedelta(seconds=1))
+    assert len(buffer) == 2
+
+
+async def test_failed_flush_keeps_logins_without_waking_flusher():
+    buffer = LastLoginBuffer(max_size=2)
+    user_id = uuid4()
+    now = datetime.now(timezone.utc)
+    buffer.add(user_id, now)
+    session = MagicMock(execute=AsyncMock(side_effect=OperationalError("UPDATE", {}, Exception("down"))), rollback=AsyncMock())
+    with patch.object(last_login_flusher, "trigger") as trigger:
+        with pytest.raises(OperationalError):
+            await buffer.flush(session)
+    trigger.assert_not_called()
+    assert buffer.drain() == [(user_id, now)]
+
+
+async def test_flush_updates_users(db_session, user, verified_user):
+    buffer = LastLoginBuffer(max_size=10)
+    logged_in_at = datetime.now(timezone.utc).replace(microsecond=0)
+    user_ids = [user.id, verified_user.id]
+    for user_id in user_ids:
+        buffer.add(user_id, logged_in_at)
+    assert await buffer.flush(db_session) == 2
+    db_session.expire_all()
+    for user_id in user_ids:
+        refreshed = await UserService.get_by_id(db_session, user_id)
+        assert refreshed.last_login_at == logged_in_at
+
+
+async def test_login_buffers_last_login(db_session, verified_user, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.last_login_buffered", True)
+    user_id, email = verified_user.id, verified_user.email
+    last_login_flusher.start()
+    try:
+        logged_in = await UserService.login_user(db_session, email, "MySuperPassword$1234")
+        assert logged_in.last_login_at is not None
+        assert user_id in last_login_buffer
+        assert await last_login_buffer.flush(db_session) == 1
+    finally:
+        await last_login_flusher.stop()
+    db_session.expire_all()
+    refreshed = await UserService.get_by_id(db_session, user_id)
+    assert refreshed.last_login_at == logged_in.last_login_at
+
+
+async def test_login_resets_failed_attempts_synchronously(db_session, verified_user, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.last_login_buffered", True)
+    user_id, email = verified_user.id, verified_user.email
+    await UserService.login_user(db_session, email, "wrongpassword")
+    last_login_flusher.start()
+    try:
+        await UserService.login_user(db_session, email, "MySuperPassword$1234")
+        assert user_id not in last_login_buffer
+    finally:
+        await last_login_flusher.stop()
+    db_session.expire_all()
+    refreshed = await UserService.get_by_id(db_session, user_id)
+    assert refreshed.failed_login_attempts == 0
+    assert refreshed.last_login_at is not None
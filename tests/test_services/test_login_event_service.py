@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from sqlalchemy import text
+from app.services.login_event_service import LoginEventRecorder, LoginEventService
+from app.services.user_service import UserService
+from app.utils.metrics import Metrics
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.login_events_enabled", True)
+    recorder = LoginEventRecorder(max_size=100, batch_size=2)
+    monkeypatch.setattr("app.services.user_service.login_event_recorder", recorder)
+    return recorder
+
+
+def test_recorder_is_bounded():
+    recorder = LoginEventRecorder(max_size=2, batch_size=10)
+    for _ in range(3):
+        recorder.record(email="someone@example.com", success=False)
+    assert len(recorder) == 2
+
+
+async def test_login_records_success_and_failure(db_session, verified_user, recorder):
+    await UserService.login_user(db_session, verified_user.email, "wrongpassword", client_ip="203.0.113.7", user_agent="pytest")
+    await UserService.login_user(db_session, verified_user.email, "MySuperPassword$1234", client_ip="203.0.113.7", user_agent="pytest")
+    await UserService.login_user(db_session, "nobody@example.com", "whatever")
+    events = list(recorder._queue)
+    assert [event["success"] for event in events] == [False, True, False]
+    assert events[0]["user_id"] == verified_user.id
+    assert events[0]["ip_address"] == "203.0.113.7"
+    assert events[0]["user_agent"] == "pytest"
+    assert events[2]["user_id"] is None
+
+
+async def test_flush_and_recent_for_user(db_session, recorder):
+    user_id = uuid4()
+    for success in (False, False, True):
+        recorder.record(email="audit@example.com", success=success, user_id=user_id)
+    recorder.record(email="other@example.com", success=True, user_id=uuid4())
+    assert await recorder.flush(db_session) == 4
+    assert len(recorder) == 0
+    events = await LoginEventService.recent_for_user(db_session, user_id, limit=2)
+    assert len(events) == 2
+    assert events[0].success is True
+    assert events[0].occurred_at >= events[1].occurred_at
+
+
+async def test_overlong_username_is_recorded(db_session, recorder):
+    username = "x" * 300 + "@example.com"
+    await UserService.login_user(db_session, username, "whatever")
+    assert len(recorder._queue[0]["email"]) == 255
+    assert await recorder.flush(db_session) == 1
+
+
+async def test_rejected_rows_are_dropped_not_requeued(db_session, recorder):
+    recorder.record(email="audit@example.com", success=True)
+    recorder.record(email="audit@example.com", success=False)
+    recorder._queue[0]["email"] = None
+    recorder.record(email="later@example.com", success=True)
+
+    assert await recorder.flush(db_session) == 2
+    assert len(recorder) == 0
+    assert Metrics.snapshot()["counters"]["login_events_failed"] >= 1
+
+
+async def test_ensure_partitions_routes_rows(db_session, recorder):
+    names = await LoginEventService.ensure_partitions(db_session, months_ahead=1)
+    assert len(names) == 2
+    recorder.record(email="audit@example.com", success=True, user_id=uuid4())
+    await recorder.flush(db_session)
+    result = await db_session.execute(text(f"SELECT count(*) FROM {names[0]}"))
+    assert result.scalar() == 1
+
+
+async def test_ensure_partitions_moves_rows_out_of_default(db_session, recorder):
+    recorder.record(email="early@example.com", success=True)
+    recorder._queue[0]["occurred_at"] = datetime.now(timezone.utc) + timedelta(days=160)
+    await recorder.flush(db_session)
+
+    names = await LoginEventService.ensure_partitions(db_session, months_ahead=6)
+
+    assert len(names) == 7
+    result = await db_session.execute(text("SELECT count(*) FROM login_events WHERE email = 'early@example.com'"))
+    assert result.scalar() == 1
+    result = await db_session.execute(text("SELECT count(*) FROM login_events_default WHERE email = 'early@example.com'"))
+    assert result.scalar() == 0
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from sqlalchemy import select
+from app.models.nickname_pool_model import NicknamePool
+from app.models.user_model import UserRole
+from app.services.nickname_pool_service import NicknamePoolService
+from app.services.user_service import UserService
+from app.utils.metrics import Metrics
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_refill_adds_nicknames(db_session):
+    inserted = await NicknamePoolService.refill(db_session, 20)
+    assert 0 < inserted <= 20
+    assert await NicknamePoolService.depth(db_session) == inserted
+    assert Metrics.snapshot()["gauges"]["nickname_pool_depth"] == inserted
+
+
+async def test_refill_skips_nicknames_taken_by_users(db_session, user):
+    with patch("app.services.nickname_pool_service.generate_nickname_batch", return_value=[user.nickname, "fresh_otter_1"]):
+        inserted = await NicknamePoolService.refill(db_session, 2)
+    assert inserted == 1
+    result = await db_session.execute(select(NicknamePool.nickname))
+    assert result.scalars().all() == ["fresh_otter_1"]
+
+
+async def test_claim_removes_nickname(db_session):
+    db_session.add(NicknamePool(nickname="pooled_panda_1"))
+    await db_session.commit()
+    assert await NicknamePoolService.claim(db_session) == "pooled_panda_1"
+    await db_session.commit()
+    assert await NicknamePoolService.depth(db_session) == 0
+
+
+async def test_claim_from_empty_pool(db_session):
+    assert await NicknamePoolService.claim(db_session) is None
+
+
+async def test_create_user_claims_pooled_nickname(db_session, email_service, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.nickname_pool_enabled", True)
+    db_session.add(NicknamePool(nickname="pooled_koala_7"))
+    await db_session.commit()
+    user_data = {
+        "email": "pooled_nickname@example.com",
+        "password": "ValidPassword123!",
+        "role": UserRole.ADMIN.name
+    }
+    user = await UserService.create(db_session, user_data, email_service)
+    assert user.nickname == "pooled_koala_7"
+    assert await NicknamePoolService.depth(db_session) == 0
+
+
+async def test_create_user_falls_back_when_pool_empty(db_session, email_service, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.nickname_pool_enabled", True)
+    user_data = {
+        "email": "empty_pool@example.com",
+        "password": "ValidPassword123!",
+        "role": UserRole.ADMIN.name
+    }
+    user = await UserService.create(db_session, user_data, email_service)
+    assert user is not None
+    assert user.nickname
+
+
+async def test_claim_skips_nicknames_taken_by_users(db_session, user):
+    db_session.add_all([NicknamePool(nickname=user.nickname), NicknamePool(nickname="free_heron_3")])
+    await db_session.commit()
+    assert await NicknamePoolService.claim(db_session) == "free_heron_3"
+
+
+async def test_purge_taken_removes_nicknames_users_hold(db_session, user):
+    db_session.add_all([NicknamePool(nickname=user.nickname), NicknamePool(nickname="free_heron_3")])
+    await db_session.commit()
+    assert await NicknamePoolService.purge_taken(db_session) == 1
+    assert await NicknamePoolService.depth(db_session) == 1
+
+
+async def test_create_user_when_no_nickname_is_free(db_session, email_service):
+    user_data = {
+        "email": "no_nickname@example.com",
+        "password": "ValidPassword123!",
+        "role": UserRole.ADMIN.name
+    }
+    with patch.object(UserService, "_allocate_nickname", AsyncMock(return_value=None)):
+        with pytest.raises(HTTPException) as excinfo:
+            await UserService.create(db_session, user_data, email_service)
+    assert excinfo.value.status_code == 503
+
+
+async def test_create_user_never_reuses_taken_or_pooled_nickname(db_session, email_service, user):
+    db_session.add(NicknamePool(nickname="pooled_lynx_4"))
+    await db_session.commit()
+    user_data = {
+        "email": "pooled_candidate@example.com",
+        "password": "ValidPassword123!",
+        "role": UserRole.ADMIN.name
+    }
+    with patch("app.services.user_service.generate_nickname_batch", return_value=["pooled_lynx_4"]):
+        with patch("app.services.user_service.nickname_with_suffix", side_effect=[user.nickname, "pooled_lynx_4", "suffixed_lynx_4", "spare_lynx_4", "spare_lynx_5"]):
+            created_user = await UserService.create(db_session, user_data, email_service)
+    assert created_user.nickname == "suffixed_lynx_4"
+    assert await NicknamePoolService.depth(db_session) == 1
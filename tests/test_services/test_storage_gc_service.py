@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import AsyncMock
+from uuid import uuid4
+from app.models.avatar_blob_model import AvatarBlob
+from app.models.storage_gc_model import StorageGCStatus
+from app.services.storage_gc_service import StorageGCService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def storage_gc_settings(monkeypatch):
+    monkeypatch.setattr("app.services.storage_gc_service.settings.storage_gc_batch_size", 2)
+    monkeypatch.setattr("app.services.storage_gc_service.settings.storage_gc_rate_per_second", 0)
+    monkeypatch.setattr("app.services.storage_gc_service.settings.storage_gc_grace_seconds", 0)
+
+
+@pytest.fixture
+async def orphaned_storage(db_session, user, verified_user, memory_storage):
+    """A bucket holding one live blob, one released blob, a deleted user's picture and objects nothing accounts for."""
+    render = AsyncMock(return_value={(236, "jpeg"): b"jpeg", (32, "webp"): b"webp"})
+    await UserService.update_profile_picture(db_session, verified_user.id, "0a" * 32, render)
+    await UserService.update_profile_picture(db_session, user.id, "0b" * 32, render)
+    await UserService.update_profile_picture(db_session, user.id, "0c" * 32, render)
+    memory_storage.put(f"{verified_user.id}_profile_picture.jpg", b"legacy", "image/jpeg")
+    memory_storage.put(f"{uuid4()}_profile_picture.jpg", b"deleted user", "image/jpeg")
+    memory_storage.put(f"avatar_{'0d' * 32}.jpg", b"rolled back", "image/jpeg")
+    memory_storage.put("DefaultUser.jpg", b"default", "image/jpeg")
+    return memory_storage
+
+
+def _names(storage):
+    return {info.name for info in storage.list_objects()}
+
+
+async def test_dry_run_only_counts_orphans(db_session, orphaned_storage):
+    before = _names(orphaned_storage)
+    await StorageGCService.create_run(db_session)
+    run = await StorageGCService.claim_run(db_session)
+    assert run.dry_run
+
+    assert await StorageGCService.run(db_session, run) == StorageGCStatus.COMPLETED
+
+    run = await StorageGCService.get_run(db_session, run.id)
+    assert run.scanned_count == len(before)
+    assert run.orphan_count == 5
+    assert run.deleted_count == 0
+    assert _names(orphaned_storage) == before
+    assert await db_session.get(AvatarBlob, "0b" * 32, populate_existing=True) is not None
+
+
+async def test_sweep_removes_orphans_and_their_rows(db_session, orphaned_storage, user, verified_user):
+    await StorageGCService.create_run(db_session, dry_run=False)
+    run = await StorageGCService.claim_run(db_session)
+
+    assert await StorageGCService.run(db_session, run) == StorageGCStatus.COMPLETED
+
+    run = await StorageGCService.get_run(db_session, run.id)
+    assert run.deleted_count == run.orphan_count == 5
+    assert _names(orphaned_storage) == {
+        "DefaultUser.jpg",
+        f"avatar_{'0a' * 32}.jpg", f"avatar_{'0a' * 32}_32.webp",
+        f"avatar_{'0c' * 32}.jpg", f"avatar_{'0c' * 32}_32.webp",
+    }
+    assert await db_session.get(AvatarBlob, "0b" * 32, populate_existing=True) is None
+    assert (await db_session.get(AvatarBlob, "0c" * 32, populate_existing=True)).refcount == 1
+
+
+async def test_grace_period_protects_recent_objects(db_session, orphaned_storage, monkeypatch):
+    monkeypatch.setattr("app.services.storage_gc_service.settings.storage_gc_grace_seconds", 3600)
+    await StorageGCService.create_run(db_session, dry_run=False)
+    run = await StorageGCService.claim_run(db_session)
+
+    await StorageGCService.run(db_session, run)
+
+    run = await StorageGCService.get_run(db_session, run.id)
+    assert run.orphan_count == 0
+    assert await db_session.get(AvatarBlob, "0b" * 32, populate_existing=True) is not None
+
+
+async def test_run_resumes_from_checkpoint(db_session, orphaned_storage):
+    checkpoint = f"avatar_{'0c' * 32}_32.webp"
+    remaining = len([name for name in _names(orphaned_storage) if name > checkpoint])
+    await StorageGCService.create_run(db_session, dry_run=False)
+    run = await StorageGCService.claim_run(db_session)
+    run.last_key = checkpoint
+
+    await StorageGCService.run(db_session, run)
+
+    run = await StorageGCService.get_run(db_session, run.id)
+    assert run.scanned_count == remaining
+    assert f"avatar_{'0b' * 32}.jpg" in _names(orphaned_storage)
+    assert f"avatar_{'0d' * 32}.jpg" not in _names(orphaned_storage)
+
+
+async def test_cancelled_run_stops_at_checkpoint(db_session, orphaned_storage):
+    await StorageGCService.create_run(db_session)
+    run = await StorageGCService.claim_run(db_session)
+    await StorageGCService.cancel_run(db_session, run.id)
+
+    assert await StorageGCService.run(db_session, run) == StorageGCStatus.CANCELLED
+    run = await StorageGCService.get_run(db_session, run.id)
+    assert run.scanned_count == 0
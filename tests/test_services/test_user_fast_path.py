@@ -0,0 +1,82 @@
+from builtins import range
+import pytest
+from app.dependencies import get_settings
+from app.services import user_fast_path
+from app.services.user_fast_path import UserRecord, fetch_user_record
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+RECORD_FIELDS = [
+    "id", "email", "nickname", "role", "hashed_password", "email_verified",
+    "is_locked", "failed_login_attempts", "last_login_at",
+]
+
+
+@pytest.fixture
+def fast_path(monkeypatch):
+    monkeypatch.setattr("app.services.user_service.settings.user_fast_path_enabled", True)
+
+
+async def _orm_user(db_session, email):
+    db_session.expire_all()
+    return await UserService.get_by_email(db_session, email)
+
+
+async def test_fast_path_available_for_asyncpg(db_session):
+    assert user_fast_path.is_available(db_session)
+
+
+@pytest.mark.parametrize("fixture_name", ["user", "verified_user", "locked_user"])
+async def test_fetch_user_record_matches_orm(db_session, request, fixture_name):
+    user = request.getfixturevalue(fixture_name)
+    record = await fetch_user_record(db_session, user.email)
+    orm_user = await _orm_user(db_session, user.email)
+    for field in RECORD_FIELDS:
+        assert getattr(record, field) == getattr(orm_user, field), field
+
+
+async def test_fetch_user_record_missing_email(db_session):
+    assert await fetch_user_record(db_session, "missing@example.com") is None
+    assert await UserService.get_by_email(db_session, "missing@example.com") is None
+
+
+async def test_login_user_fast_path_success(db_session, verified_user, fast_path):
+    record = await UserService.login_user(db_session, verified_user.email, "MySuperPassword$1234")
+    assert isinstance(record, UserRecord)
+    orm_user = await _orm_user(db_session, verified_user.email)
+    assert record.id == orm_user.id
+    assert record.role == orm_user.role
+    assert orm_user.failed_login_attempts == 0
+    assert orm_user.last_login_at == record.last_login_at
+
+
+@pytest.mark.parametrize("fixture_name", ["user", "locked_user"])
+async def test_login_user_fast_path_rejects_like_orm(db_session, request, fixture_name, fast_path):
+    user = request.getfixturevalue(fixture_name)
+    assert await UserService.login_user(db_session, user.email, "MySuperPassword$1234") is None
+
+
+async def test_login_user_fast_path_wrong_password(db_session, verified_user, fast_path):
+    assert await UserService.login_user(db_session, verified_user.email, "wrongpassword") is None
+    orm_user = await _orm_user(db_session, verified_user.email)
+    assert orm_user.failed_login_attempts == 1
+    assert not orm_user.is_locked
+
+
+async def test_fast_path_locks_after_max_attempts(db_session, verified_user, fast_path):
+    for _ in range(get_settings().max_login_attempts):
+        await UserService.login_user(db_session, verified_user.email, "wrongpassword")
+    assert await UserService.is_account_locked(db_session, verified_user.email)
+    orm_user = await _orm_user(db_session, verified_user.email)
+    assert orm_user.is_locked
+
+
+async def test_is_account_locked_parity(db_session, locked_user, verified_user, monkeypatch):
+    expected = {
+        email: await UserService.is_account_locked(db_session, email)
+        for email in (locked_user.email, verified_user.email, "missing@example.com")
+    }
+    monkeypatch.setattr("app.services.user_service.settings.user_fast_path_enabled", True)
+    for email, locked in expected.items():
+        assert await UserService.is_account_locked(db_session, email) == locked
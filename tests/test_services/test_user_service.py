@@ -6,15 +6,21 @@ from uuid import uuid4
 from fastapi import HTTPException
 from sqlalchemy import select
 from app.dependencies import get_settings
+from app.models.avatar_blob_model import AvatarBlob
 from app.models.user_model import User, UserRole
 from app.services.user_service import UserService
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import Result
-from app.utils.nickname_gen import generate_nickname
-from app.utils.minio_client import save_image, get_image
+from app.utils.nickname_gen import generate_nickname, nickname_with_suffix
+from app.utils.security import verify_password
 
 pytestmark = pytest.mark.asyncio
 
+async def test_fetch_user_with_several_filters(db_session, user, verified_user):
+    found = await UserService._fetch_user(db_session, email=verified_user.email, nickname=verified_user.nickname)
+    assert found.id == verified_user.id
+    assert await UserService._fetch_user(db_session, email=verified_user.email, nickname=user.nickname) is None
+
 # Test creating a user with valid data
 async def test_create_user_with_valid_data(db_session, email_service):
     user_data = {
@@ -27,6 +33,19 @@ async def test_create_user_with_valid_data(db_session, email_service):
     assert user is not None
     assert user.email == user_data["email"]
 
+# Test that nickname allocation falls back to an id suffix when every candidate is taken
+async def test_create_user_nickname_fallback(db_session, email_service, user):
+    user_data = {
+        "email": "nickname_fallback@example.com",
+        "password": "ValidPassword123!",
+        "role": UserRole.ADMIN.name
+    }
+    with patch("app.services.user_service.generate_nickname_batch", return_value=[user.nickname]):
+        created_user = await UserService.create(db_session, user_data, email_service)
+    assert created_user is not None
+    assert created_user.nickname != user.nickname
+    assert created_user.nickname.endswith(nickname_with_suffix(created_user.id).rsplit("_", 1)[1])
+
 # Test creating a user with invalid data
 async def test_create_user_with_invalid_data(db_session, email_service):
     user_data = {
@@ -162,6 +181,25 @@ async def test_verify_email_with_token(db_session, user):
     result = await UserService.verify_email_with_token(db_session, user.id, token)
     assert result is True
 
+async def test_verify_email_with_signed_token(db_session, user, email_service, monkeypatch):
+    monkeypatch.setattr("app.services.email_service.settings.signed_tokens_enabled", True)
+    url = email_service._verification_email_data(user)["verification_url"]
+    token = url.rsplit("/", 1)[1]
+    assert await UserService.verify_email_with_token(db_session, uuid4(), token) is False
+    assert await UserService.verify_email_with_token(db_session, user.id, token) is True
+    # Each token is single use: verifying bumped the user's token version.
+    assert await UserService.verify_email_with_token(db_session, user.id, token) is False
+    await db_session.refresh(user)
+    assert user.email_verified and user.role == UserRole.AUTHENTICATED
+
+async def test_reset_password_with_token(db_session, locked_user):
+    token = UserService.create_password_reset_token(locked_user)
+    assert await UserService.reset_password_with_token(db_session, token, "NewPassword123!") is True
+    assert await UserService.reset_password_with_token(db_session, token, "OtherPassword123!") is False
+    await db_session.refresh(locked_user)
+    assert not locked_user.is_locked
+    assert verify_password("NewPassword123!", locked_user.hashed_password)
+
 # Test unlocking a user's account
 async def test_unlock_user_account(db_session, locked_user):
     unlocked = await UserService.unlock_user_account(db_session, locked_user.id)
@@ -172,9 +210,8 @@ async def test_unlock_user_account(db_session, locked_user):
 @pytest.mark.asyncio
 async def test_update_profile_picture_success():
     user_id = uuid4()
-    file_data = b"fake image bytes"
-    file_name = "test.jpg"
-    fake_url = "test.jpg" 
+    digest = "ab" * 32
+    render = AsyncMock()
     fake_user = User(id=user_id, profile_picture_url=None)
 
     db = AsyncMock(spec=AsyncSession)
@@ -182,16 +219,11 @@ async def test_update_profile_picture_success():
     result_mock.scalar_one_or_none.return_value = fake_user
     db.execute.return_value = result_mock
 
-    patch_save_target = "app.services.user_service.save_image"
+    with patch("app.services.user_service.AvatarService.replace", new=AsyncMock(return_value=f"avatar_{digest}.jpg")) as replace:
+        updated_user = await UserService.update_profile_picture(db, user_id, digest, render)
 
-    with patch(patch_save_target, new=AsyncMock(return_value=fake_url)) as mock_save_image:
-
-        updated_user = await UserService.update_profile_picture(db, user_id, file_data, file_name)
-
-        db.execute.assert_awaited_once()
-        mock_save_image.assert_awaited_once_with(file_data, file_name)
-
-        assert updated_user.profile_picture_url == fake_url
+        replace.assert_awaited_once_with(db, None, digest, render)
+        assert updated_user.profile_picture_url == f"avatar_{digest}.jpg"
         db.commit.assert_awaited_once()
         db.refresh.assert_awaited_once_with(fake_user)
         assert updated_user is fake_user
@@ -205,32 +237,32 @@ async def test_update_profile_picture_user_not_found():
     db.execute.return_value = result_mock
 
     with pytest.raises(HTTPException) as exc_info:
-        await UserService.update_profile_picture(db, user_id, b"data", "file.png")
+        await UserService.update_profile_picture(db, user_id, "ab" * 32, AsyncMock())
 
     assert exc_info.value.status_code == 404
 
-# Test getting profile picture
-@pytest.mark.asyncio
-async def test_get_profile_picture_success():
-    user_id = uuid4()
-    profile_picture_url = "test.jpg"
-    fake_user = User(id=user_id, profile_picture_url=profile_picture_url)
+async def test_identical_uploads_share_one_blob(db_session, user, verified_user, memory_storage):
+    digest = "cd" * 32
+    render = AsyncMock(return_value={(236, "jpeg"): b"large", (32, "webp"): b"small"})
 
-    # Mock the database query
-    scalars_mock = MagicMock()
-    scalars_mock.first.return_value = fake_user
+    first = await UserService.update_profile_picture(db_session, user.id, digest, render)
+    second = await UserService.update_profile_picture(db_session, verified_user.id, digest, render)
 
-    db = AsyncMock(spec=AsyncSession)
-    db.execute.return_value.scalars = MagicMock(return_value=scalars_mock)
+    assert first.profile_picture_url == second.profile_picture_url == f"avatar_{digest}.jpg"
+    render.assert_awaited_once()
+    assert len(memory_storage) == 2
+    blob = await db_session.get(AvatarBlob, digest, populate_existing=True)
+    assert blob.refcount == 2
+    assert blob.size == len(b"large") + len(b"small")
 
-    expected_bytes = b"fake image bytes"
+async def test_new_upload_and_delete_release_the_blob(db_session, user, memory_storage):
+    render = AsyncMock(return_value={(236, "jpeg"): b"jpeg"})
+    await UserService.update_profile_picture(db_session, user.id, "01" * 32, render)
+    await UserService.update_profile_picture(db_session, user.id, "02" * 32, render)
 
-    # Ensure the minio_client.get_image is patched at the correct location
-    with patch("app.services.user_service.get_image", return_value=BytesIO(expected_bytes)) as mock_get_image:
-        image_stream = await UserService.get_profile_picture(db, user_id)
+    first = await db_session.get(AvatarBlob, "01" * 32, populate_existing=True)
+    assert first.refcount == 0 and first.released_at is not None
 
-        # Ensure the mock is called with the correct image URL
-        mock_get_image.assert_called_once_with(profile_picture_url)
-        
-        # Validate the response
-        assert image_stream.read() == expected_bytes
+    await UserService.delete(db_session, user.id)
+    second = await db_session.get(AvatarBlob, "02" * 32, populate_existing=True)
+    assert second.refcount == 0
@@ -1,10 +1,11 @@
 import pytest
+import socket
 from unittest.mock import patch, MagicMock
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging 
-from app.utils.smtp_connection import SMTPClient
+from app.utils.smtp_connection import SMTPBatchError, SMTPClient, SMTPPoolTimeout
 
 TEST_SERVER = "smtp.testserver.com"
 TEST_PORT = 587
@@ -27,8 +28,7 @@ def test_send_email_success(mock_logging, mock_smtp_class, smtp_client_instance)
     Test that send_email successfully sends an email and logs info.
     Mocks smtplib.SMTP and logging.
     """
-    mock_smtp_instance = MagicMock()
-    mock_smtp_class.return_value.__enter__.return_value = mock_smtp_instance
+    mock_smtp_instance = mock_smtp_class.return_value
 
     smtp_client_instance.send_email(
         TEST_SUBJECT,
@@ -36,7 +36,7 @@ def test_send_email_success(mock_logging, mock_smtp_class, smtp_client_instance)
         TEST_RECIPIENT
     )
 
-    mock_smtp_class.assert_called_once_with(TEST_SERVER, TEST_PORT)
+    mock_smtp_class.assert_called_once_with(TEST_SERVER, TEST_PORT, timeout=smtp_client_instance.timeout)
 
     mock_smtp_instance.starttls.assert_called_once()
 
@@ -75,8 +75,7 @@ def test_send_email_logs_error_and_raises(mock_logging, mock_smtp_class, smtp_cl
     Test that send_email logs an error and re-raises the exception if sending fails.
     Mocks smtplib.SMTP to raise an exception and mocks logging.
     """
-    mock_smtp_instance = MagicMock()
-    mock_smtp_class.return_value.__enter__.return_value = mock_smtp_instance
+    mock_smtp_instance = mock_smtp_class.return_value
 
     mock_smtp_instance.starttls.side_effect = smtplib.SMTPException("Simulated SMTP error")
 
@@ -87,7 +86,7 @@ def test_send_email_logs_error_and_raises(mock_logging, mock_smtp_class, smtp_cl
             TEST_RECIPIENT
         )
 
-    mock_smtp_class.assert_called_once_with(TEST_SERVER, TEST_PORT)
+    mock_smtp_class.assert_called_once_with(TEST_SERVER, TEST_PORT, timeout=smtp_client_instance.timeout)
 
     assert "Simulated SMTP error" in str(excinfo.value)
 
@@ -97,5 +96,170 @@ def test_send_email_logs_error_and_raises(mock_logging, mock_smtp_class, smtp_cl
 
     mock_smtp_instance.sendmail.assert_not_called()
 
-    mock_smtp_class.return_value.__enter__.assert_called_once()
-    mock_smtp_class.return_value.__exit__.assert_called_once()
+    mock_smtp_instance.quit.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_send_email_reuses_pooled_session(mock_smtp_class, smtp_client_instance):
+    """Consecutive emails share one connection, STARTTLS and LOGIN."""
+    mock_smtp_instance = mock_smtp_class.return_value
+
+    for _ in range(3):
+        smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+
+    mock_smtp_class.assert_called_once()
+    mock_smtp_instance.starttls.assert_called_once()
+    mock_smtp_instance.login.assert_called_once()
+    assert mock_smtp_instance.sendmail.call_count == 3
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_busy_pool_times_out(mock_smtp_class):
+    client = SMTPClient(TEST_SERVER, TEST_PORT, TEST_USERNAME, TEST_PASSWORD, pool_size=1, timeout=0.05)
+    with client.session():
+        with pytest.raises(SMTPPoolTimeout):
+            with client.session():
+                pass
+    with client.session():
+        pass
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_idle_session_is_checked_with_noop(mock_smtp_class, smtp_client_instance):
+    mock_smtp_instance = mock_smtp_class.return_value
+    mock_smtp_instance.noop.return_value = (250, b"OK")
+
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+    smtp_client_instance._idle.queue[0].last_used -= smtp_client_instance.health_check_interval + 1
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+
+    mock_smtp_instance.noop.assert_called_once()
+    mock_smtp_class.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_failed_health_check_reconnects(mock_smtp_class, smtp_client_instance):
+    stale, fresh = MagicMock(), MagicMock()
+    stale.noop.side_effect = smtplib.SMTPServerDisconnected("gone")
+    mock_smtp_class.side_effect = [stale, fresh]
+
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+    smtp_client_instance._idle.queue[0].last_used -= smtp_client_instance.health_check_interval + 1
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+
+    assert mock_smtp_class.call_count == 2
+    fresh.sendmail.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_idle_timeout_closes_session(mock_smtp_class, smtp_client_instance):
+    old, new = MagicMock(), MagicMock()
+    mock_smtp_class.side_effect = [old, new]
+
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+    smtp_client_instance._idle.queue[0].last_used -= smtp_client_instance.idle_timeout + 1
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+
+    old.quit.assert_called_once()
+    old.noop.assert_not_called()
+    new.sendmail.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_dropped_session_is_replaced_on_send(mock_smtp_class, smtp_client_instance):
+    stale, fresh = MagicMock(), MagicMock()
+    stale.sendmail.side_effect = smtplib.SMTPServerDisconnected("gone")
+    mock_smtp_class.side_effect = [stale, fresh]
+
+    smtp_client_instance.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+
+    fresh.sendmail.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_send_emails_uses_one_session(mock_smtp_class, smtp_client_instance):
+    mock_smtp_instance = mock_smtp_class.return_value
+    refused = smtplib.SMTPRecipientsRefused({"bad@test.com": (550, b"No such user")})
+    mock_smtp_instance.sendmail.side_effect = [None, refused, None]
+    messages = [(TEST_SUBJECT, TEST_HTML_CONTENT, recipient) for recipient in ("a@test.com", "bad@test.com", "c@test.com")]
+
+    failures = smtp_client_instance.send_emails(messages)
+
+    mock_smtp_class.assert_called_once()
+    assert mock_smtp_instance.sendmail.call_count == 3
+    assert [recipient for recipient, _ in failures] == ["bad@test.com"]
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_send_emails_resends_message_in_flight_after_drop(mock_smtp_class, smtp_client_instance):
+    stale, fresh = MagicMock(), MagicMock()
+    stale.sendmail.side_effect = [None, smtplib.SMTPServerDisconnected("gone")]
+    mock_smtp_class.side_effect = [stale, fresh]
+    messages = [(TEST_SUBJECT, TEST_HTML_CONTENT, recipient) for recipient in ("a@test.com", "b@test.com", "c@test.com")]
+
+    assert smtp_client_instance.send_emails(messages) == []
+    assert [call.args[1] for call in fresh.sendmail.call_args_list] == ["b@test.com", "c@test.com"]
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_send_emails_raises_when_server_unreachable(mock_smtp_class, smtp_client_instance):
+    mock_smtp_class.side_effect = ConnectionRefusedError("refused")
+
+    with pytest.raises(SMTPBatchError) as excinfo:
+        smtp_client_instance.send_emails([(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)] * 5)
+
+    assert isinstance(excinfo.value.error, ConnectionRefusedError)
+    assert excinfo.value.completed == 0
+    mock_smtp_class.assert_called_once()
+
+
+@patch('app.utils.smtp_connection.smtplib.SMTP')
+def test_send_emails_reports_progress_when_batch_fails(mock_smtp_class, smtp_client_instance):
+    stale, fresh = MagicMock(), MagicMock()
+    refused = smtplib.SMTPRecipientsRefused({"b@test.com": (550, b"No such user")})
+    stale.sendmail.side_effect = [None, refused, smtplib.SMTPServerDisconnected("gone")]
+    fresh.sendmail.side_effect = smtplib.SMTPServerDisconnected("gone again")
+    mock_smtp_class.side_effect = [stale, fresh]
+    messages = [(TEST_SUBJECT, TEST_HTML_CONTENT, recipient) for recipient in ("a@test.com", "b@test.com", "c@test.com", "d@test.com")]
+
+    with pytest.raises(SMTPBatchError) as excinfo:
+        smtp_client_instance.send_emails(messages)
+
+    assert excinfo.value.completed == 2
+    assert [recipient for recipient, _ in excinfo.value.refused] == ["b@test.com"]
+
+
+def test_send_emails_against_local_smtp_server():
+    """Delivers through a real SMTP conversation with an aiosmtpd stand-in."""
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    from aiosmtpd.handlers import Sink
+    from aiosmtpd.smtp import AuthResult
+
+    class RecordingHandler(Sink):
+        def __init__(self):
+            self.envelopes = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.envelopes.append(envelope)
+            return "250 OK"
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = RecordingHandler()
+    controller = controller_module.Controller(
+        handler, hostname="127.0.0.1", port=port,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False,
+    )
+    controller.start()
+    try:
+        client = SMTPClient("127.0.0.1", port, TEST_USERNAME, TEST_PASSWORD, use_tls=False, pool_size=1)
+        recipients = [f"user{i}@test.com" for i in range(5)]
+        failures = client.send_emails([(TEST_SUBJECT, TEST_HTML_CONTENT, recipient) for recipient in recipients])
+        client.send_email(TEST_SUBJECT, TEST_HTML_CONTENT, TEST_RECIPIENT)
+        client.close()
+    finally:
+        controller.stop()
+
+    assert failures == []
+    assert [envelope.rcpt_tos[0] for envelope in handler.envelopes] == recipients + [TEST_RECIPIENT]
@@ -0,0 +1,236 @@
+import io
+import os
+from datetime import timedelta
+from unittest.mock import MagicMock
+import pytest
+from minio.deleteobjects import DeleteError
+from minio.error import S3Error
+from app.dependencies import get_settings
+from app.storage import (
+    BUCKET_NAME, FilesystemStorage, InvalidRangeError, MemoryStorage, MinioStorage, ObjectNotFoundError, StorageError,
+    create_storage, parse_byte_range,
+)
+
+
+@pytest.fixture(params=["memory", "filesystem"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorage()
+    storage = FilesystemStorage(str(tmp_path / "objects"))
+    storage.setup()
+    return storage
+
+
+class TestBackendContract:
+    def test_put_then_read_and_stat(self, storage):
+        storage.put("user_1.jpg", b"jpeg data", "image/jpeg")
+        assert storage.read("user_1.jpg") == b"jpeg data"
+        info = storage.stat("user_1.jpg")
+        assert (info.name, info.size, info.content_type) == ("user_1.jpg", 9, "image/jpeg")
+        assert info.etag and info.last_modified is not None
+
+    def test_overwrite_changes_etag(self, storage):
+        first = storage.put("user_1.webp", b"one", "image/webp").etag
+        second = storage.put("user_1.webp", b"other", "image/webp").etag
+        assert first != second
+        assert storage.read("user_1.webp") == b"other"
+
+    def test_open_reports_headers(self, storage):
+        storage.put("user_1.jpg", b"jpeg data", "image/jpeg")
+        reader = storage.open("user_1.jpg")
+        try:
+            assert reader.status == 200
+            assert reader.headers["Content-Type"] == "image/jpeg"
+            assert reader.headers["Content-Length"] == "9"
+            assert reader.headers["ETag"] == f'"{storage.stat("user_1.jpg").etag}"'
+            assert reader.read(4) + reader.read() == b"jpeg data"
+        finally:
+            reader.close()
+
+    def test_open_range(self, storage):
+        storage.put("user_1.jpg", b"0123456789", "image/jpeg")
+        reader = storage.open("user_1.jpg", "bytes=2-5")
+        try:
+            assert reader.status == 206
+            assert reader.headers["Content-Range"] == "bytes 2-5/10"
+            assert reader.headers["Content-Length"] == "4"
+            assert reader.read() == b"2345"
+        finally:
+            reader.close()
+
+    def test_unsatisfiable_range(self, storage):
+        storage.put("user_1.jpg", b"0123456789", "image/jpeg")
+        with pytest.raises(InvalidRangeError) as exc_info:
+            storage.open("user_1.jpg", "bytes=10-")
+        assert exc_info.value.size == 10
+
+    def test_missing_object(self, storage):
+        with pytest.raises(ObjectNotFoundError):
+            storage.open("missing.jpg")
+        with pytest.raises(ObjectNotFoundError):
+            storage.stat("missing.jpg")
+        assert not storage.exists("missing.jpg")
+
+    def test_delete(self, storage):
+        storage.put("user_1.jpg", b"data", "image/jpeg")
+        storage.delete("user_1.jpg")
+        storage.delete("user_1.jpg")
+        assert not storage.exists("user_1.jpg")
+
+    def test_list_objects_in_name_order(self, storage):
+        for name in ("b.jpg", "c.jpg", "a.jpg"):
+            storage.put(name, b"data", "image/jpeg")
+        assert [info.name for info in storage.list_objects()] == ["a.jpg", "b.jpg", "c.jpg"]
+        assert [info.name for info in storage.list_objects(start_after="a.jpg")] == ["b.jpg", "c.jpg"]
+        assert all(info.size == 4 and info.last_modified is not None for info in storage.list_objects())
+
+    def test_delete_many(self, storage):
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            storage.put(name, b"data", "image/jpeg")
+        assert storage.delete_many(["a.jpg", "c.jpg", "missing.jpg"]) == []
+        assert [info.name for info in storage.list_objects()] == ["b.jpg"]
+
+    def test_cannot_presign(self, storage):
+        assert not storage.can_presign
+        assert storage.presigned_url("user_1.jpg", timedelta(minutes=15)) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-500", (500, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, "image.jpg", 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-4", "bytes=-", "items=0-1"])
+def test_parse_byte_range_rejects(header):
+    with pytest.raises(InvalidRangeError):
+        parse_byte_range(header, "image.jpg", 1000)
+
+
+class TestFilesystemStorage:
+    def test_objects_are_sharded(self, tmp_path):
+        storage = FilesystemStorage(str(tmp_path))
+        path = storage.path("user_1.jpg")
+        shard = os.path.relpath(os.path.dirname(path), str(tmp_path))
+        assert len(shard.split(os.sep)) == 2
+        assert os.path.basename(path) == "user_1.jpg"
+
+    def test_writes_leave_no_temporary_files(self, tmp_path):
+        storage = FilesystemStorage(str(tmp_path))
+        storage.put("user_1.jpg", b"data")
+        directory = os.path.dirname(storage.path("user_1.jpg"))
+        assert os.listdir(directory) == ["user_1.jpg"]
+
+    @pytest.mark.parametrize("name", ["../escape.jpg", "a/b.jpg", ".hidden", ""])
+    def test_rejects_names_outside_the_root(self, tmp_path, name):
+        with pytest.raises(StorageError):
+            FilesystemStorage(str(tmp_path)).put(name, b"data")
+
+
+def _s3_error(code):
+    return S3Error(code=code, message=code, resource=BUCKET_NAME, request_id="req-id", host_id="host-id",
+                   response=MagicMock())
+
+
+@pytest.fixture
+def minio_storage():
+    storage = MinioStorage(get_settings())
+    storage.client = MagicMock()
+    return storage
+
+
+class TestMinioStorage:
+    def test_client_is_created_lazily(self):
+        storage = MinioStorage(get_settings())
+        assert "client" not in storage.__dict__
+
+    def test_setup_creates_missing_bucket(self, minio_storage):
+        minio_storage.client.bucket_exists.return_value = False
+        minio_storage.setup()
+        minio_storage.client.make_bucket.assert_called_once_with(BUCKET_NAME)
+
+    def test_setup_keeps_existing_bucket(self, minio_storage):
+        minio_storage.client.bucket_exists.return_value = True
+        minio_storage.setup()
+        minio_storage.client.make_bucket.assert_not_called()
+
+    def test_put(self, minio_storage):
+        minio_storage.put("image.jpg", b"test image data", "image/jpeg")
+
+        args, kwargs = minio_storage.client.put_object.call_args
+        assert args == (BUCKET_NAME, "image.jpg")
+        assert isinstance(kwargs["data"], io.BytesIO)
+        assert kwargs["length"] == len(b"test image data")
+        assert kwargs["content_type"] == "image/jpeg"
+        minio_storage.client.bucket_exists.assert_not_called()
+
+    def test_put_creates_missing_bucket(self, minio_storage):
+        minio_storage.client.put_object.side_effect = [_s3_error("NoSuchBucket"), MagicMock(etag="abc")]
+        minio_storage.client.bucket_exists.return_value = False
+
+        assert minio_storage.put("image.jpg", b"data").etag == "abc"
+        minio_storage.client.make_bucket.assert_called_once_with(BUCKET_NAME)
+        assert minio_storage.client.put_object.call_count == 2
+
+    def test_open_forwards_range_and_releases(self, minio_storage):
+        response = MagicMock(status=206, headers={"Content-Range": "bytes 0-99/5000", "Content-Length": "100"})
+        minio_storage.client.get_object.return_value = response
+
+        reader = minio_storage.open("image.jpg", "bytes=0-99")
+        reader.close()
+
+        minio_storage.client.get_object.assert_called_once_with(BUCKET_NAME, "image.jpg", request_headers={"Range": "bytes=0-99"})
+        assert reader.status == 206
+        assert reader.headers == {"Content-Range": "bytes 0-99/5000", "Content-Length": "100"}
+        response.release_conn.assert_called_once()
+
+    def test_errors_are_translated(self, minio_storage):
+        minio_storage.client.get_object.side_effect = _s3_error("NoSuchKey")
+        with pytest.raises(ObjectNotFoundError):
+            minio_storage.open("image.jpg")
+
+        minio_storage.client.get_object.side_effect = _s3_error("InvalidRange")
+        minio_storage.client.stat_object.return_value = MagicMock(size=5000)
+        with pytest.raises(InvalidRangeError) as exc_info:
+            minio_storage.open("image.jpg", "bytes=9000-")
+        assert exc_info.value.size == 5000
+
+        minio_storage.client.stat_object.side_effect = _s3_error("AccessDenied")
+        with pytest.raises(S3Error):
+            minio_storage.stat("image.jpg")
+
+    def test_delete_many_uses_one_bulk_request(self, minio_storage):
+        minio_storage.client.remove_objects.return_value = iter([DeleteError("AccessDenied", "denied", "b.jpg", None)])
+
+        assert minio_storage.delete_many(["a.jpg", "b.jpg"]) == ["b.jpg"]
+        bucket, objects = minio_storage.client.remove_objects.call_args.args
+        assert bucket == BUCKET_NAME
+        assert [item.name for item in objects] == ["a.jpg", "b.jpg"]
+
+    def test_list_objects_resumes_after_key(self, minio_storage):
+        minio_storage.client.list_objects.return_value = iter([MagicMock(object_name="b.jpg", size=4, etag='"abc"')])
+
+        infos = list(minio_storage.list_objects(start_after="a.jpg"))
+
+        minio_storage.client.list_objects.assert_called_once_with(BUCKET_NAME, recursive=True, start_after="a.jpg")
+        assert (infos[0].name, infos[0].size, infos[0].etag) == ("b.jpg", 4, "abc")
+
+    def test_presigning_needs_no_connection(self):
+        url = MinioStorage(get_settings()).presigned_url("image.jpg", timedelta(minutes=15))
+        assert f"/{BUCKET_NAME}/image.jpg?" in url
+        assert "X-Amz-Signature=" in url
+
+
+def test_create_storage_from_settings(tmp_path):
+    settings = get_settings()
+    assert isinstance(create_storage(settings.model_copy(update={"storage_backend": "memory"})), MemoryStorage)
+    filesystem = create_storage(settings.model_copy(update={"storage_backend": "filesystem", "storage_root": str(tmp_path)}))
+    assert isinstance(filesystem, FilesystemStorage) and filesystem.root == str(tmp_path)
+    assert isinstance(create_storage(settings.model_copy(update={"storage_backend": "minio"})), MinioStorage)
+    with pytest.raises(ValueError):
+        create_storage(settings.model_copy(update={"storage_backend": "s3fs"}))
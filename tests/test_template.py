@@ -1,5 +1,6 @@
 import pytest
 import io
+import os
 from pathlib import Path
 import markdown2
 from unittest.mock import Mock
@@ -125,3 +126,67 @@ def test_read_template_file_not_found(template_manager, mock_open):
         template_manager._read_template(filename)
 
     template_manager._read_template.assert_called_once_with(filename)
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    (tmp_path / 'header.md').write_text("# Header\n", encoding='utf-8')
+    (tmp_path / 'footer.md').write_text("Footer text\n", encoding='utf-8')
+    (tmp_path / 'greeting.md').write_text("Hello {name},\n\n[Open]({url})\n\n- {name}\n", encoding='utf-8')
+    return tmp_path
+
+
+@pytest.fixture
+def real_template_manager(templates_dir):
+    manager = TemplateManager()
+    manager.templates_dir = templates_dir
+    return manager
+
+
+def test_render_template_matches_uncompiled_output(real_template_manager):
+    """Precompiled rendering produces the same HTML as formatting the markdown before conversion."""
+    context = {"name": "Ada", "url": "http://example.com/verify"}
+    header = real_template_manager._read_template('header.md')
+    body = real_template_manager._read_template('greeting.md').format(**context)
+    footer = real_template_manager._read_template('footer.md')
+    expected = real_template_manager._apply_email_styles(markdown2.markdown(f"{header}\n{body}\n{footer}"))
+
+    assert real_template_manager.render_template('greeting', **context) == expected
+
+
+def test_render_template_compiles_once(real_template_manager, mocker):
+    spy = mocker.spy(markdown2, 'markdown')
+
+    first = real_template_manager.render_template('greeting', name="Ada", url="http://a")
+    second = TemplateManager()
+    second.templates_dir = real_template_manager.templates_dir
+    html = second.render_template('greeting', name="Bob", url="http://b")
+
+    assert spy.call_count == 1
+    assert "Ada" in first and "Bob" in html and "Ada" not in html
+
+
+def test_render_template_escapes_values(real_template_manager):
+    html = real_template_manager.render_template('greeting', name="<script>x</script>", url='http://a/?q="1"&r=2')
+
+    assert "<script>" not in html
+    assert "&lt;script&gt;x&lt;/script&gt;" in html
+    assert 'href="http://a/?q=&quot;1&quot;&amp;r=2"' in html
+
+
+def test_render_template_reloads_changed_file(real_template_manager, templates_dir):
+    assert "Hello" in real_template_manager.render_template('greeting', name="Ada", url="http://a")
+
+    template_path = templates_dir / 'greeting.md'
+    template_path.write_text("Goodbye {name}\n", encoding='utf-8')
+    stat = template_path.stat()
+    os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    html = real_template_manager.render_template('greeting', name="Ada")
+    assert "Goodbye Ada" in html
+    assert "Hello" not in html
+
+
+def test_render_template_missing_value_raises(real_template_manager):
+    with pytest.raises(KeyError):
+        real_template_manager.render_template('greeting', name="Ada")
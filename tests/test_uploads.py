@@ -0,0 +1,77 @@
+import hashlib
+import os
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from app.utils.uploads import MULTIPART_OVERHEAD, InvalidUploadError, UploadTooLargeError, receive_file
+
+MAX_SIZE = 1024
+app = FastAPI()
+received = {}
+
+
+@app.post("/upload")
+async def upload(request: Request):
+    try:
+        upload = await receive_file(request, "file", MAX_SIZE)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413)
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        with open(upload.path, "rb") as file:
+            received.update(data=file.read(), filename=upload.filename, content_type=upload.content_type,
+                            sha256=upload.sha256)
+    finally:
+        upload.close()
+    received["exists_after_close"] = os.path.exists(upload.path)
+    return {"size": upload.size}
+
+
+client = TestClient(app)
+
+
+def test_file_is_written_to_a_temporary_file():
+    data = os.urandom(MAX_SIZE)
+    response = client.post("/upload", data={"note": "x" * 100}, files={"file": ("me.png", data, "image/png")})
+    assert response.status_code == 200
+    assert response.json() == {"size": MAX_SIZE}
+    assert received["data"] == data
+    assert received["filename"] == "me.png"
+    assert received["content_type"] == "image/png"
+    assert received["sha256"] == hashlib.sha256(data).hexdigest()
+    assert received["exists_after_close"] is False
+
+
+@pytest.mark.asyncio
+async def test_declared_content_length_is_rejected_before_reading():
+    async def receive():
+        raise AssertionError("the body should not be read")
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=x"),
+               (b"content-length", str(MAX_SIZE + MULTIPART_OVERHEAD + 1).encode())]
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    with pytest.raises(UploadTooLargeError):
+        await receive_file(request, "file", MAX_SIZE)
+
+
+def test_running_cap_aborts_a_chunked_upload():
+    def body():
+        # No Content-Length: only the running cap can stop this one.
+        yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n\r\n"
+        for _ in range(100):
+            yield b"\0" * 512
+
+    response = client.post("/upload", content=body(), headers={"Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+
+
+def test_missing_file_field():
+    response = client.post("/upload", files={"other": ("a.jpg", b"data")})
+    assert response.status_code == 422
+    assert "file" in response.json()["detail"]
+
+
+def test_rejects_non_multipart_body():
+    response = client.post("/upload", content=b"plain", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 422
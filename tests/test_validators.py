@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+from types import SimpleNamespace
+import dns.resolver
+import pytest
+from app.utils.validators import EmailValidator, MXCache, ValidationMode, validate_email_address
+
+
+class StubResolver:
+    """Answers MX queries from a dict; any other domain does not exist."""
+
+    def __init__(self, mx):
+        self.mx = mx
+        self.queries = Counter()
+
+    def resolve(self, domain, rdtype):
+        self.queries[domain] += 1
+        if domain not in self.mx:
+            raise dns.resolver.NXDOMAIN()
+        return [SimpleNamespace(preference=10, exchange=f"{host}.") for host in self.mx[domain]]
+
+
+@pytest.fixture
+def resolver():
+    return StubResolver({"mail.org": ["mx1.mail.org"], "corp.com": ["mx.corp.com"]})
+
+
+@pytest.fixture
+def validator(resolver):
+    return EmailValidator(ValidationMode.CACHED, resolver=resolver)
+
+
+def test_offline_mode_checks_syntax_only(resolver):
+    validator = EmailValidator(ValidationMode.OFFLINE, resolver=resolver)
+    assert validator.is_valid("user@nowhere.org")
+    assert not validator.is_valid("not-an-email")
+    assert not resolver.queries
+
+
+def test_cached_mode_resolves_each_domain_once(validator, resolver):
+    assert validator.is_valid("a@mail.org")
+    assert validator.is_valid("b@mail.org")
+    assert resolver.queries["mail.org"] == 1
+    assert validator.lookup_domain("mail.org").mx == ("mx1.mail.org",)
+
+
+def test_undeliverable_domain_is_negatively_cached(validator, resolver):
+    check = validator.validate("user@nowhere.org")
+    assert not check.valid
+    assert "does not exist" in check.error
+    assert not validator.is_valid("other@nowhere.org")
+    assert resolver.queries["nowhere.org"] == 1
+
+
+def test_batch_validates_domains_once(validator, resolver):
+    emails = [f"user{i}@mail.org" for i in range(20)] + ["x@corp.com", "y@nowhere.org", "broken"]
+    checks = validator.validate_many(emails)
+    assert [check.valid for check in checks] == [True] * 21 + [False, False]
+    assert checks[0].normalized == "user0@mail.org"
+    assert resolver.queries == Counter({"mail.org": 1, "corp.com": 1, "nowhere.org": 1})
+
+
+def test_inconclusive_lookup_is_accepted_and_not_cached(validator, resolver):
+    def timeout(domain, rdtype):
+        resolver.queries[domain] += 1
+        raise dns.exception.Timeout()
+
+    resolver.resolve = timeout
+    assert validator.is_valid("user@slow.org")
+    assert validator.is_valid("user@slow.org")
+    assert resolver.queries["slow.org"] == 2
+
+
+def test_cache_expires_and_evicts(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("app.utils.validators.time.monotonic", lambda: clock[0])
+    cache = MXCache(max_size=2, ttl=60, negative_ttl=5)
+    validator = EmailValidator(resolver=StubResolver({"a.org": ["mx.a.org"], "b.org": ["mx.b.org"]}), cache=cache)
+    validator.lookup_domain("a.org")
+    validator.lookup_domain("c.org")
+    clock[0] = 10
+    assert cache.get("a.org") is not None
+    assert cache.get("c.org") is None
+    validator.lookup_domain("b.org")
+    validator.lookup_domain("c.org")
+    assert cache.get("a.org") is None
+    assert len(cache) == 2
+
+
+def test_validate_email_address(validator):
+    assert validate_email_address("a@mail.org", validator)
+    assert not validate_email_address("a@nowhere.org", validator)
+
+
+@pytest.mark.asyncio
+async def test_validate_async_resolves_off_the_event_loop(validator, resolver):
+    threads = []
+    resolve = resolver.resolve
+    resolver.resolve = lambda domain, rdtype: threads.append(threading.current_thread()) or resolve(domain, rdtype)
+    checks = await validator.validate_many_async(["a@mail.org", "b@nowhere.org"])
+    assert [check.valid for check in checks] == [True, False]
+    assert threads and threading.main_thread() not in threads